@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Accuracy and throughput of domain classification and subcategory suggestion.
+
+Accuracy is measured on the labeled example corpus (classifier_corpus.py):
+domain accuracy with a per-domain confusion matrix, and subcategory accuracy
+given the true domain (suggest_subcategory on its own) and end to end.
+Throughput is prompts/second of classify_with_confidence and of the fused
+PromptAnalyzer.analyze on synthetic prompts of several lengths, plus
+classify_many when NumPy is installed.
+
+Usage:
+    python benchmarks/bench_classifier.py
+    python benchmarks/bench_classifier.py --model models/domain.npz   # learned classifier
+    python benchmarks/bench_classifier.py --json > before.json        # for comparisons
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from classifier_corpus import load_corpus, synthetic_prompts  # noqa: E402
+from domain_classifier import DomainClassifier  # noqa: E402
+from keyword_matcher import np  # noqa: E402
+from prompt_analyzer import PromptAnalyzer  # noqa: E402
+from template_engine import TemplateEngine  # noqa: E402
+
+LENGTHS = [64, 256, 1024, 4096, 16384]
+
+
+def accuracy(classifier, engine, corpus):
+    domains = list(engine.templates)
+    confusion = {truth: {predicted: 0 for predicted in domains} for truth in domains}
+    domain_correct = 0
+    subcategory_given_domain = [0, 0]
+    subcategory_end_to_end = [0, 0]
+    misses = []
+
+    for item in corpus:
+        predicted, _ = classifier.classify_with_confidence(item["prompt"])
+        confusion[item["domain"]][predicted] += 1
+        domain_correct += predicted == item["domain"]
+        if predicted != item["domain"]:
+            misses.append({"source": item["source"], "domain": item["domain"], "predicted": predicted})
+
+        if item["subcategory"] is not None:
+            given = engine.suggest_subcategory(item["prompt"], item["domain"])
+            subcategory_given_domain[0] += given == item["subcategory"]
+            subcategory_given_domain[1] += 1
+            end_to_end = engine.suggest_subcategory(item["prompt"], predicted)
+            subcategory_end_to_end[0] += (predicted, end_to_end) == (item["domain"], item["subcategory"])
+            subcategory_end_to_end[1] += 1
+
+    return {
+        "prompts": len(corpus),
+        "domain_accuracy": domain_correct / len(corpus),
+        "subcategory_accuracy_given_domain": subcategory_given_domain[0] / subcategory_given_domain[1],
+        "subcategory_accuracy_end_to_end": subcategory_end_to_end[0] / subcategory_end_to_end[1],
+        "confusion": confusion,
+        "misses": misses
+    }
+
+
+def throughput(fn, prompts, min_seconds=0.2):
+    """Prompts/second, repeating the set until min_seconds have passed."""
+    done = 0
+    start = time.perf_counter()
+    while True:
+        fn(prompts)
+        done += len(prompts)
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            return done / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--model", help="HashedClassifier .npz to evaluate instead of keywords")
+    parser.add_argument("--lengths", type=int, nargs="+", default=LENGTHS)
+    parser.add_argument("--count", type=int, default=200, help="synthetic prompts per length")
+    parser.add_argument("--json", action="store_true", help="print one JSON report")
+    args = parser.parse_args()
+
+    model = None
+    if args.model:
+        from hashed_classifier import HashedClassifier
+        model = HashedClassifier.load(args.model)
+    classifier = DomainClassifier(model=model)
+    engine = TemplateEngine()
+    analyzer = PromptAnalyzer(classifier, engine)
+
+    corpus = load_corpus()
+    report = {"corpus": accuracy(classifier, engine, corpus), "lengths": []}
+
+    for length in args.lengths:
+        synthetic = synthetic_prompts(corpus, length, args.count)
+        prompts = [item["prompt"] for item in synthetic]
+        row = {
+            "length": length,
+            "domain_accuracy": accuracy(classifier, engine, synthetic)["domain_accuracy"],
+            "classify_per_second": throughput(
+                lambda ps: [classifier.classify_with_confidence(p) for p in ps], prompts
+            ),
+            "analyze_per_second": throughput(lambda ps: [analyzer.analyze(p) for p in ps], prompts)
+        }
+        if np is not None:
+            row["classify_many_per_second"] = throughput(classifier.classify_many, prompts)
+        report["lengths"].append(row)
+
+    if args.json:
+        print(json.dumps(report, indent=1))
+        return
+
+    result = report["corpus"]
+    print(f"Corpus: {result['prompts']} labeled prompts"
+          + (f" (model {args.model})" if args.model else " (keyword matching)"))
+    print(f"  domain accuracy:                  {result['domain_accuracy']:.1%}")
+    print(f"  subcategory accuracy (true domain): {result['subcategory_accuracy_given_domain']:.1%}")
+    print(f"  subcategory accuracy (end to end):  {result['subcategory_accuracy_end_to_end']:.1%}")
+
+    domains = list(result["confusion"])
+    print("\n  confusion (rows = true, columns = predicted)")
+    print("  " + " " * 12 + "".join(f"{d[:11]:>12}" for d in domains))
+    for truth in domains:
+        print(f"  {truth:<12}" + "".join(f"{result['confusion'][truth][d]:>12}" for d in domains))
+    for miss in result["misses"]:
+        print(f"  miss: {miss['source']}: {miss['domain']} -> {miss['predicted']}")
+
+    print(f"\n{'chars':>7} {'accuracy':>9} {'classify/s':>11} {'analyze/s':>10}"
+          + (f" {'classify_many/s':>16}" if np is not None else ""))
+    for row in report["lengths"]:
+        line = (f"{row['length']:>7} {row['domain_accuracy']:>9.1%} "
+                f"{row['classify_per_second']:>11,.0f} {row['analyze_per_second']:>10,.0f}")
+        if np is not None:
+            line += f" {row['classify_many_per_second']:>16,.0f}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
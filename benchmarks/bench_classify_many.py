@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Compare classifying prompts one call at a time against
+DomainClassifier.classify_many (NumPy lockstep automaton).
+
+Prompts are synthetic mixes of domain keywords and filler words, 4-20 words
+each, plus a row of catalog-length prompts (--long-chars, default 4096)
+where classify_many falls back to the per-prompt loop. Results are checked
+to be identical before timings are reported.
+
+Usage:
+    python benchmarks/bench_classify_many.py [--sizes 10000 100000] [--long-chars 4096]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from domain_classifier import DomainClassifier  # noqa: E402
+
+FILLER = ["the", "a", "of", "with", "in", "modern", "soft", "light", "city", "red", "bicycle"]
+
+
+def make_prompts(count, seed=1, min_chars=0):
+    rng = random.Random(seed)
+    vocabulary = [kw for kws in DomainClassifier.DOMAIN_KEYWORDS.values() for kw in kws]
+    vocabulary += FILLER * 3
+    prompts = []
+    for _ in range(count):
+        words = [rng.choice(vocabulary) for _ in range(rng.randint(4, 20))]
+        while sum(len(word) + 1 for word in words) < min_chars:
+            words.append(rng.choice(FILLER))
+        prompts.append(" ".join(words))
+    return prompts
+
+
+def best_of(fn, repeat):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--long-chars", type=int, default=4096,
+                        help="length of the long-prompt row (2000 prompts; 0 skips it)")
+    args = parser.parse_args()
+
+    classifier = DomainClassifier()
+    classifier.classify_many(make_prompts(10))  # build NumPy tables once
+
+    rows = [(size, make_prompts(size)) for size in args.sizes]
+    if args.long_chars:
+        rows.append((2000, make_prompts(2000, min_chars=args.long_chars)))
+
+    print(f"{'prompts':>8} {'chars':>6} {'one-by-one':>12} {'classify_many':>14} "
+          f"{'speedup':>8} {'prompts/s':>11}")
+    for size, prompts in rows:
+        chars = sum(map(len, prompts)) // size
+        scalar, expected = best_of(
+            lambda: [classifier.classify_with_confidence(p) for p in prompts], args.repeat
+        )
+        batched, results = best_of(lambda: classifier.classify_many(prompts), args.repeat)
+        assert results == expected, "classify_many disagrees with classify_with_confidence"
+        print(f"{size:>8} {chars:>6} {scalar * 1000:>10.0f}ms {batched * 1000:>12.0f}ms "
+              f"{scalar / batched:>7.1f}x {size / batched:>11,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Compare response.json() + b64decode against the streaming inlineData extractor.
+
+Reports time and peak Python heap (tracemalloc) per image for each size,
+using the fake server's PNG payloads fed in 64 KB chunks like httpx does.
+
+Usage:
+    python benchmarks/bench_inline_decode.py
+"""
+
+import base64
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from fake_gemini_server import DEFAULT_IMAGE_BYTES, build_png, image_dimensions  # noqa: E402
+from gemini_client import _InlineDataExtractor  # noqa: E402
+
+CHUNK = 64 * 1024
+
+
+def response_body(image_size):
+    png = build_png(*image_dimensions(image_size, "1:1"), DEFAULT_IMAGE_BYTES[image_size])
+    return json.dumps({
+        "candidates": [{"content": {"parts": [
+            {"text": "Here is the image you requested."},
+            {"inlineData": {"mimeType": "image/png", "data": base64.b64encode(png).decode()}}
+        ]}}]
+    }).encode()
+
+
+def json_path(body):
+    # What generate_image used to do: buffer body, parse, decode
+    buffered = b"".join(body[i:i + CHUNK] for i in range(0, len(body), CHUNK))
+    data = json.loads(buffered)
+    part = data["candidates"][0]["content"]["parts"][1]
+    return base64.b64decode(part["inlineData"]["data"])
+
+
+def streaming_path(body):
+    out = bytearray()
+    extractor = _InlineDataExtractor(lambda index: out.extend)
+    for i in range(0, len(body), CHUNK):
+        extractor.feed(body[i:i + CHUNK])
+    extractor.finish()
+    return out
+
+
+def measure(fn, body):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn(body)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, len(result)
+
+
+def main():
+    print(f"{'size':<5} {'path':<10} {'time':>9} {'peak heap':>11} {'image':>9}")
+    for image_size in ("1K", "2K", "4K"):
+        body = response_body(image_size)
+        for name, fn in (("json", json_path), ("streaming", streaming_path)):
+            elapsed, peak, size = measure(fn, body)
+            print(f"{image_size:<5} {name:<10} {elapsed * 1000:>7.1f}ms "
+                  f"{peak / 1e6:>9.1f}MB {size / 1e6:>7.1f}MB")
+
+
+if __name__ == "__main__":
+    main()
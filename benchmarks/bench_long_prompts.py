@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Prompt preparation time against prompt length, from 1 KB up to 1 MB.
+
+Times each step a prompt goes through before the upstream call - whitespace
+normalization and cache key, keyword analysis, template expansion and
+subject substitution, brand profile - plus the keyword automaton with the
+scan cap lifted, and reports nanoseconds per character. Linear steps keep
+a flat ns/char as prompts grow; the capped analysis gets cheaper per
+character once prompts pass MAX_SCAN_CHARS. The last column is ns/char at
+the largest size over ns/char at the smallest (about 1 or below = linear).
+
+Prompts are the ASCII example prompts repeated to length, so every size
+has the same mix of text and keywords keep occurring throughout (the
+worst case for the automaton's output handling). Non-ASCII text costs more
+per character (accent folding) but scales the same way.
+
+Usage:
+    python benchmarks/bench_long_prompts.py
+    python benchmarks/bench_long_prompts.py --sizes 1024 1048576 --check   # exit 1 if superlinear
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from brand_profile_manager import BrandProfileManager  # noqa: E402
+from classifier_corpus import load_corpus  # noqa: E402
+from domain_classifier import DomainClassifier  # noqa: E402
+from keyword_matcher import MAX_SCAN_CHARS, KeywordMatcher  # noqa: E402
+from prompt_analyzer import PromptAnalyzer  # noqa: E402
+from prompt_cache import SUBJECT, PromptCache, normalize  # noqa: E402
+from template_engine import TemplateEngine  # noqa: E402
+
+SIZES = [1 << 10, 1 << 12, 1 << 14, 1 << 16, 1 << 18, 1 << 20]
+
+# Largest/smallest ns per char above which --check fails
+LINEAR_TOLERANCE = 2.5
+
+
+def make_prompt(corpus, length):
+    text = " ".join(item["prompt"] for item in corpus if item["prompt"].isascii())
+    return (text * (length // len(text) + 1))[:length]
+
+
+def best_of(fn, prompt, min_seconds=0.2, repeat=5):
+    """Fastest single call out of at least repeat calls and min_seconds."""
+    best = float("inf")
+    calls = 0
+    start = time.perf_counter()
+    while calls < repeat or time.perf_counter() - start < min_seconds:
+        began = time.perf_counter()
+        fn(prompt)
+        best = min(best, time.perf_counter() - began)
+        calls += 1
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--check", action="store_true",
+                        help=f"exit 1 if a step's ns/char grows more than {LINEAR_TOLERANCE}x")
+    args = parser.parse_args()
+
+    classifier = DomainClassifier()
+    engine = TemplateEngine()
+    analyzer = PromptAnalyzer(classifier, engine)
+    # The analyzer's keywords, scanned to the end of even the largest prompt
+    uncapped = KeywordMatcher(
+        {**classifier.keywords, **engine.subcategory_keywords}, max_scan_chars=max(args.sizes)
+    )
+    brands = BrandProfileManager()
+    brand = brands.list_profiles()[0]
+    template = engine.enhance(SUBJECT, domain="diagrams", quality="expert")
+
+    steps = {
+        "normalize+key": lambda p: PromptCache.key(normalize(p), "expert", brand),
+        "analyze": analyzer.analyze,
+        "scan uncapped": uncapped.matched,
+        "template": lambda p: template.replace(SUBJECT, p),
+        "brand": lambda p: brands.apply(p, brand),
+    }
+
+    corpus = load_corpus()
+    timings = {name: [] for name in steps}
+    print(f"MAX_SCAN_CHARS = {MAX_SCAN_CHARS:,}; ns per character (ms per call)")
+    print(f"{'chars':>9}" + "".join(f"{name:>20}" for name in steps))
+    for size in args.sizes:
+        prompt = make_prompt(corpus, size)
+        line = f"{size:>9,}"
+        for name, fn in steps.items():
+            seconds = best_of(fn, prompt)
+            timings[name].append(seconds / size)
+            line += f"{seconds / size * 1e9:>9.1f} ({seconds * 1e3:>7.2f})"
+        print(line)
+
+    growth = {name: per_char[-1] / per_char[0] for name, per_char in timings.items()}
+    print(f"{'growth':>9}" + "".join(f"{growth[name]:>19.2f}x" for name in steps))
+
+    superlinear = [name for name, ratio in growth.items() if ratio > LINEAR_TOLERANCE]
+    if superlinear:
+        print(f"Superlinear: {', '.join(superlinear)}")
+        if args.check:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
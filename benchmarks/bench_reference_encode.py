@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Compare building a request body with an inline reference image the naive way
+(read + b64encode + json.dumps) against the streamed ReferenceImage body.
+
+Reports time and peak Python heap (tracemalloc) per body for each size.
+
+Usage:
+    python benchmarks/bench_reference_encode.py
+"""
+
+import asyncio
+import base64
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from fake_gemini_server import build_png  # noqa: E402
+from gemini_client import ReferenceImage, _request_body  # noqa: E402
+
+
+def payload_for(image):
+    return {"contents": [{"parts": [{"text": "same style"}, {"inlineData": image}]}]}
+
+
+def naive_path(path):
+    with open(path, "rb") as f:
+        data = base64.b64encode(f.read()).decode("ascii")
+    body = json.dumps(payload_for({"mimeType": "image/png", "data": data})).encode()
+    return len(body)
+
+
+def streaming_path(path):
+    kwargs = _request_body(payload_for(ReferenceImage(path)))
+
+    async def drain():
+        total = 0
+        async for chunk in kwargs["content"]:
+            total += len(chunk)
+        return total
+
+    return asyncio.run(drain())
+
+
+def measure(fn, path):
+    tracemalloc.start()
+    start = time.perf_counter()
+    size = fn(path)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, size
+
+
+def main():
+    print(f"{'image':>7} {'path':<10} {'time':>9} {'peak heap':>11} {'body':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for megabytes in (1, 5, 15):
+            path = os.path.join(tmp, f"ref-{megabytes}.png")
+            with open(path, "wb") as f:
+                f.write(build_png(512, 512, megabytes * 1024 * 1024))
+            for name, fn in (("naive", naive_path), ("streaming", streaming_path)):
+                elapsed, peak, size = measure(fn, path)
+                print(f"{megabytes:>5}MB {name:<10} {elapsed * 1000:>7.1f}ms "
+                      f"{peak / 1e6:>9.1f}MB {size / 1e6:>7.1f}MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Labeled prompt corpus for classifier benchmarks, built from the example libraries.
+
+Prompts are read (with ast, nothing is imported or executed) from:
+    examples/context_engineering_prompts.py      CONTEXT_ENGINEERING_PROMPTS
+    examples/context_engineering_prompts_pro.py  CONTEXT_ENGINEERING_PROMPTS_PRO
+    examples/symbolic_concepts_prompts.py        SYMBOLIC_CONCEPTS_PROMPTS
+    examples/generate_examples.py                EXAMPLES
+    examples/generate_advanced.py                ADVANCED_EXAMPLES
+
+and labeled by hand below (domain, and the template subcategory where one
+clearly fits; None means the subcategory is not scored). Changing the
+example libraries without updating LABELS fails loudly.
+
+The Spanish series (examples/Conceptos */*-prompt.txt) are labeled per
+directory in DIRECTORY_LABELS: every prompt there is a symbolic diagram
+visualization, like the English symbolic concepts above.
+
+synthetic_prompts() stretches the labeled prompts to a target length with
+domain-neutral filler, for accuracy and throughput at long lengths.
+
+Usage:
+    python benchmarks/classifier_corpus.py > corpus.jsonl   # {"prompt", "domain", ...} per line
+"""
+
+import ast
+import json
+import random
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+EXAMPLES_DIR = Path(__file__).parent.parent / "examples"
+
+# (file, variable) -> [(domain, subcategory)] in list order
+LABELS: Dict[Tuple[str, str], List[Tuple[str, Optional[str]]]] = {
+    ("context_engineering_prompts.py", "CONTEXT_ENGINEERING_PROMPTS"): [
+        ("diagrams", "architecture"),   # context engineering stack
+        ("diagrams", "flowchart"),      # RAG 2.0 pipeline
+        ("diagrams", "technical"),      # context window comparison
+        ("diagrams", "architecture"),   # MCP architecture
+        ("diagrams", "technical"),      # lost in the middle heatmap
+        ("diagrams", "technical"),      # memory strategies grid
+        ("diagrams", "flowchart"),      # adaptive retrieval
+        ("diagrams", "technical"),      # attack / defense layers
+        ("diagrams", "wireframe"),      # metrics dashboard
+        ("diagrams", "flowchart"),      # tool chain workflow
+    ],
+    ("context_engineering_prompts_pro.py", "CONTEXT_ENGINEERING_PROMPTS_PRO"): [
+        ("diagrams", "architecture"),
+        ("diagrams", "flowchart"),
+        ("diagrams", "technical"),
+        ("diagrams", "architecture"),
+        ("diagrams", "technical"),
+        ("diagrams", "technical"),
+        ("diagrams", "flowchart"),
+        ("diagrams", "technical"),
+        ("diagrams", "wireframe"),
+        ("diagrams", "flowchart"),
+    ],
+    ("symbolic_concepts_prompts.py", "SYMBOLIC_CONCEPTS_PROMPTS"): [
+        ("art", "abstract"),            # Fourier kinesthetics
+        ("art", "digital_art"),         # tactile sensing
+        ("art", "digital_art"),         # nanobot regimen
+        ("diagrams", "technical"),      # register machine
+        ("diagrams", "flowchart"),      # cohobation cycle
+        ("diagrams", "technical"),      # proportion proof
+        ("diagrams", "technical"),      # genetic crossover
+        ("diagrams", "technical"),      # human/AI Venn diagram
+    ],
+    ("generate_examples.py", "EXAMPLES"): [
+        ("photography", "portrait"),
+        ("photography", "landscape"),
+        ("products", "ecommerce"),
+        ("art", "painting"),
+        ("diagrams", "architecture"),
+        ("diagrams", "flowchart"),
+        ("diagrams", "wireframe"),
+        ("art", "3d_render"),
+        ("products", "lifestyle"),
+        ("diagrams", "architecture"),
+    ],
+    ("generate_advanced.py", "ADVANCED_EXAMPLES"): [
+        ("photography", None),          # food photography
+        ("diagrams", "architecture"),
+        ("photography", None),          # architectural photography
+        ("diagrams", "flowchart"),      # sequence diagram
+        ("art", "digital_art"),
+    ],
+}
+
+# directory -> (domain, subcategory) for every *-prompt.txt inside
+DIRECTORY_LABELS: Dict[str, Tuple[str, Optional[str]]] = {
+    "Conceptos Filosófico-Matemáticos": ("diagrams", None),
+    "Conceptos Herméticos-Científicos": ("diagrams", None),
+}
+
+# Neutral padding for synthetic long prompts (no domain or subcategory keywords)
+FILLER = [
+    "with careful attention to every small element",
+    "the overall mood is calm and balanced",
+    "colors stay consistent from edge to edge",
+    "keep the main subject clearly readable",
+    "there is plenty of room around the edges",
+    "every label is spelled exactly as written",
+    "the scene feels coherent and deliberate",
+    "small touches reward a closer look",
+]
+
+
+def _literal(file_name: str, variable: str) -> list:
+    tree = ast.parse((EXAMPLES_DIR / file_name).read_text(encoding="utf-8"))
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(
+            isinstance(target, ast.Name) and target.id == variable for target in node.targets
+        ):
+            return ast.literal_eval(node.value)
+    raise ValueError(f"{variable} not found in {file_name}")
+
+
+def load_corpus() -> List[Dict]:
+    """[{"source", "prompt", "domain", "subcategory"}] for every labeled example prompt."""
+    corpus = []
+    for (file_name, variable), labels in LABELS.items():
+        items = _literal(file_name, variable)
+        if len(items) != len(labels):
+            raise ValueError(
+                f"{file_name}:{variable} has {len(items)} prompts but {len(labels)} labels"
+            )
+        for index, (item, (domain, subcategory)) in enumerate(zip(items, labels)):
+            prompt = item["prompt"] if isinstance(item, dict) else item
+            corpus.append({
+                "source": f"{file_name}:{variable}[{index}]",
+                "prompt": " ".join(prompt.split()),
+                "domain": domain,
+                "subcategory": subcategory
+            })
+    for directory, (domain, subcategory) in DIRECTORY_LABELS.items():
+        paths = sorted((EXAMPLES_DIR / directory).glob("*-prompt.txt"))
+        if not paths:
+            raise ValueError(f"No *-prompt.txt files in examples/{directory}")
+        for path in paths:
+            corpus.append({
+                "source": f"{directory}/{path.name}",
+                "prompt": " ".join(path.read_text(encoding="utf-8").split()),
+                "domain": domain,
+                "subcategory": subcategory
+            })
+    return corpus
+
+
+def synthetic_prompts(corpus: List[Dict], length: int, count: int, seed: int = 1) -> List[Dict]:
+    """
+    count labeled prompts of about length characters.
+
+    Each starts from a corpus prompt (cut to length if longer) and is padded
+    with shuffled FILLER sentences, so its label still holds.
+    """
+    rng = random.Random(seed)
+    prompts = []
+    for _ in range(count):
+        item = rng.choice(corpus)
+        parts = [item["prompt"][:length]]
+        size = len(parts[0])
+        while size < length:
+            sentence = rng.choice(FILLER)
+            parts.append(sentence)
+            size += len(sentence) + 2
+        prompts.append({**item, "source": f"synthetic/{length}", "prompt": ", ".join(parts)[:length]})
+    return prompts
+
+
+if __name__ == "__main__":
+    for item in load_corpus():
+        print(json.dumps(item, ensure_ascii=False))
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Offline load test for GeminiClient against the fake Gemini server.
+
+Runs N image generations at a fixed concurrency and reports throughput,
+latency percentiles and error counts. No network access or API spend.
+
+Usage:
+    # In-process fake server (default)
+    python benchmarks/load_test.py --requests 200 --concurrency 20 \\
+        --latency lognormal:4,0.35 --error-rate-429 0.02 --image-size 2K
+
+    # Against an already running server (fake or a staging proxy)
+    python benchmarks/load_test.py --base-url http://127.0.0.1:8090/v1beta/models
+
+    # Record a run once, then replay it (no server, recorded latencies x 0.5)
+    python benchmarks/load_test.py --record run.cassette
+    python benchmarks/load_test.py --replay run.cassette --latency-scale 0.5
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import httpx  # noqa: E402
+from cassette import Cassette  # noqa: E402
+from fake_gemini_server import FakeGeminiServer  # noqa: E402
+from gemini_client import GeminiClient  # noqa: E402
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run_load(base_url, args, cassette=None):
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies = []
+    outcomes = Counter()
+    total_bytes = 0
+
+    async with GeminiClient(
+        api_key=os.getenv("GOOGLE_API_KEY", "fake"), base_url=base_url,
+        timeout=args.timeout, cassette=cassette
+    ) as client:
+        async def one(i):
+            nonlocal total_bytes
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    result = await client.generate_image(
+                        f"load test prompt {i}",
+                        model=args.model,
+                        image_size=args.image_size,
+                        aspect_ratio=args.aspect_ratio,
+                        max_retries=args.max_retries
+                    )
+                    total_bytes += len(result["image_data"])
+                    outcomes["ok"] += 1
+                except httpx.HTTPStatusError as e:
+                    outcomes[f"http_{e.response.status_code}"] += 1
+                except Exception as e:
+                    outcomes[type(e).__name__] += 1
+                latencies.append(time.perf_counter() - start)
+
+        wall_start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(args.requests)))
+        wall = time.perf_counter() - wall_start
+
+    return wall, latencies, outcomes, total_bytes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GeminiClient offline load test")
+    parser.add_argument("--base-url", help="Use a running server instead of an in-process fake")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--model", default="flash", choices=["flash", "pro"])
+    parser.add_argument("--image-size", default="1K", choices=["1K", "2K", "4K"])
+    parser.add_argument("--aspect-ratio", default="1:1")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--max-retries", type=int, default=1)
+    parser.add_argument("--latency", default="lognormal:0.5,0.3")
+    parser.add_argument("--error-rate-429", type=float, default=0.0)
+    parser.add_argument("--error-rate-503", type=float, default=0.0)
+    parser.add_argument("--empty-image-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--record", metavar="CASSETTE", help="Record upstream responses to a cassette")
+    parser.add_argument("--replay", metavar="CASSETTE", help="Replay a cassette instead of calling a server")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="Replay latency factor")
+    args = parser.parse_args()
+
+    cassette = None
+    if args.record:
+        cassette = Cassette(args.record, mode="record")
+    elif args.replay:
+        cassette = Cassette(args.replay, mode="replay", latency_scale=args.latency_scale)
+
+    server = None
+    base_url = args.base_url or (GeminiClient.BASE_URL if args.replay else None)
+    if not base_url:
+        fake = FakeGeminiServer(
+            latency=args.latency,
+            error_rate_429=args.error_rate_429,
+            error_rate_503=args.error_rate_503,
+            empty_image_rate=args.empty_image_rate,
+            seed=args.seed
+        )
+        server, base_url = fake.start_in_thread()
+
+    try:
+        wall, latencies, outcomes, total_bytes = asyncio.run(run_load(base_url, args, cassette))
+    finally:
+        if server:
+            server.shutdown()
+
+    print(f"Requests:     {args.requests} @ concurrency {args.concurrency}")
+    print(f"Wall time:    {wall:.2f}s")
+    print(f"Throughput:   {args.requests / wall:.2f} req/s, "
+          f"{total_bytes / wall / (1024 * 1024):.1f} MB/s decoded")
+    print(f"Latency p50:  {percentile(latencies, 50):.3f}s")
+    print(f"Latency p95:  {percentile(latencies, 95):.3f}s")
+    print(f"Latency p99:  {percentile(latencies, 99):.3f}s")
+    print(f"Outcomes:     {dict(outcomes)}")
+    if cassette is not None:
+        print(f"Cassette:     {cassette.stats()}")
+
+
+if __name__ == "__main__":
+    main()
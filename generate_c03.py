@@ -1,14 +1,13 @@
 #!/usr/bin/env python3
 """Generate C03: Token Budget Management"""
-import asyncio
 import sys
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent))
 
-from src.gemini_client import GeminiClient
+from src.gemini_client import SyncGeminiClient
 
-async def main():
+def main():
     # Read prompt
     prompt_path = Path('/Users/manu/Documents/LUXOR/docs/images/context-engineering/batch-1/C03-prompt.txt')
     prompt = prompt_path.read_text()
@@ -17,9 +16,9 @@ async def main():
     print("Model: Gemini 3 Pro Image (gemini-3-pro-image-preview)")
     print()
 
-    async with GeminiClient() as client:
+    with SyncGeminiClient() as client:
         try:
-            result = await client.generate_image(prompt, model="pro")
+            result = client.generate_image(prompt, model="pro")
 
             # Save image
             output_path = Path('/Users/manu/Documents/LUXOR/docs/images/context-engineering/batch-1/C03-token-budget.png')
@@ -35,4 +34,4 @@ async def main():
             sys.exit(1)
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    main()
@@ -1,14 +1,13 @@
 #!/usr/bin/env python3
 """Generate C07: Intelligent Chunking Strategies"""
-import asyncio
 import sys
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent))
 
-from src.gemini_client import GeminiClient
+from src.gemini_client import SyncGeminiClient
 
-async def main():
+def main():
     prompt_path = Path('/Users/manu/Documents/LUXOR/docs/images/context-engineering/batch-2/C07-prompt.txt')
     prompt = prompt_path.read_text()
 
@@ -17,9 +16,9 @@ async def main():
     print("Color palette: Purple monochromatic for accessibility")
     print()
 
-    async with GeminiClient() as client:
+    with SyncGeminiClient() as client:
         try:
-            result = await client.generate_image(prompt, model="pro")
+            result = client.generate_image(prompt, model="pro")
 
             output_path = Path('/Users/manu/Documents/LUXOR/docs/images/context-engineering/batch-2/C07-chunking-strategies.png')
             with open(output_path, 'wb') as f:
@@ -34,4 +33,4 @@ async def main():
             sys.exit(1)
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    main()
@@ -1,14 +1,13 @@
 #!/usr/bin/env python3
 """Generate C08: Hybrid Search Architecture"""
-import asyncio
 import sys
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent))
 
-from src.gemini_client import GeminiClient
+from src.gemini_client import SyncGeminiClient
 
-async def main():
+def main():
     prompt_path = Path('/Users/manu/Documents/LUXOR/docs/images/context-engineering/batch-2/C08-prompt.txt')
     prompt = prompt_path.read_text()
 
@@ -16,9 +15,9 @@ async def main():
     print("Model: Gemini 3 Pro Image")
     print()
 
-    async with GeminiClient() as client:
+    with SyncGeminiClient() as client:
         try:
-            result = await client.generate_image(prompt, model="pro")
+            result = client.generate_image(prompt, model="pro")
 
             output_path = Path('/Users/manu/Documents/LUXOR/docs/images/context-engineering/batch-2/C08-hybrid-search.png')
             with open(output_path, 'wb') as f:
@@ -33,4 +32,4 @@ async def main():
             sys.exit(1)
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    main()
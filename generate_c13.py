@@ -1,18 +1,17 @@
 #!/usr/bin/env python3
 """Generate C13: Context Pruning Strategies"""
-import asyncio
 import sys
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent))
-from src.gemini_client import GeminiClient
+from src.gemini_client import SyncGeminiClient
 
-async def main():
+def main():
     prompt_path = Path('/Users/manu/Documents/LUXOR/docs/images/context-engineering/batch-4/C13-prompt.txt')
     prompt = prompt_path.read_text()
 
-    async with GeminiClient() as client:
-        result = await client.generate_image(prompt, model="pro")
+    with SyncGeminiClient() as client:
+        result = client.generate_image(prompt, model="pro")
         output_path = Path('/Users/manu/Documents/LUXOR/docs/images/context-engineering/batch-4/C13-context-pruning.png')
         output_path.parent.mkdir(parents=True, exist_ok=True)
         with open(output_path, 'wb') as f:
@@ -22,4 +21,4 @@ async def main():
         print(f"✅ C13 generated: {file_size_mb:.2f} MB")
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    main()
@@ -4,52 +4,26 @@ Generate a proof-of-concept image to demonstrate the API actually works.
 """
 
 import os
-import httpx
-import base64
+import sys
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).parent))
 
-def generate_banana_image(prompt: str, api_key: str) -> bytes:
-    """Generate an image using Gemini 2.5 Flash Image (Nano Banana)."""
+from src.gemini_client import GeminiClient, SyncGeminiClient
 
-    endpoint = "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash-image:generateContent"
 
-    request_body = {
-        "contents": [{
-            "parts": [{
-                "text": prompt
-            }]
-        }]
-    }
+def generate_banana_image(prompt: str, api_key: str) -> bytes:
+    """Generate an image using Gemini 2.5 Flash Image (Nano Banana)."""
 
     print(f"Generating image with prompt: '{prompt}'")
-    print(f"Using endpoint: {endpoint}")
+    print(f"Using model: {GeminiClient.MODELS['flash']}")
     print()
 
-    with httpx.Client(timeout=30.0) as client:
-        response = client.post(
-            f"{endpoint}?key={api_key}",
-            json=request_body,
-            headers={"Content-Type": "application/json"}
-        )
-
-        print(f"Response status: {response.status_code}")
-
-        if response.status_code == 200:
-            data = response.json()
-
-            # Extract image data from response
-            for part in data["candidates"][0]["content"]["parts"]:
-                if "inlineData" in part:
-                    image_b64 = part["inlineData"]["data"]
-                    image_mime = part["inlineData"]["mimeType"]
-                    print(f"Image MIME type: {image_mime}")
-                    print(f"Base64 length: {len(image_b64)} chars")
-                    return base64.b64decode(image_b64)
-
-            raise ValueError("No image data in response")
-        else:
-            raise Exception(f"API error: {response.status_code} - {response.text}")
+    with SyncGeminiClient(api_key=api_key) as client:
+        result = client.generate_image(prompt, model="flash")
+
+    print(f"Image MIME type: {result['mime_type']}")
+    return result["image_data"]
 
 
 def main():
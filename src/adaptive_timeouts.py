@@ -0,0 +1,218 @@
+"""
+Adaptive Timeouts - Per-(model, size, aspect) upstream timeouts from observed latency
+
+One fixed timeout is wrong for every model/size: flash at 1K answers in a
+few seconds, pro at 4K can take a minute. This keeps a rolling window of
+how long each class of call waited for data and derives its read timeout:
+
+    timeout = clamp(p99, floor_multiplier x p50, ceiling_multiplier x p50)
+
+bounded by min_seconds/max_seconds. Stuck fast calls are then abandoned
+(and retried) after seconds, while slow classes get the time they need.
+
+A call that times out only says its latency was above the timeout, and
+the clamp to ceiling_multiplier x p50 means the timeout can't rise until
+the median does. So a timed-out call is recorded at backoff x the timeout
+it hit, and each one in a row also multiplies the class timeout by backoff
+(up to max_seconds). The boost steps back down each time a call finishes
+within the unboosted timeout. A class whose latency shifts upward then
+loses a few calls, not every call until the old samples age out.
+
+A cold class (fewer than min_samples) that has already timed out gets the
+longest wait recorded for it, which doubles with each further timeout. A
+class that always outlasts the client default then times out once or twice
+instead of on every call until it has min_samples.
+
+Example:
+    timeouts = AdaptiveTimeouts(floor_multiplier=2.0, ceiling_multiplier=5.0)
+    client = GeminiClient(timeouts=timeouts)
+    timeouts.timeout_for(("gemini-2.5-flash-image", "1K", "1:1"))  # e.g. 9.8
+"""
+
+import math
+import os
+import threading
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+TimeoutKey = Tuple[str, Optional[str], Optional[str]]
+
+# Pools every aspect ratio of a (model, size) until a ratio has its own samples
+ANY_ASPECT = "*"
+
+
+def percentile(sorted_samples: List[float], q: float) -> float:
+    """Nearest-rank percentile of an ascending list (q in 0..1)."""
+    rank = max(1, math.ceil(q * len(sorted_samples)))
+    return sorted_samples[rank - 1]
+
+
+class _Window:
+    def __init__(self, size: int):
+        self.samples: Deque[float] = deque(maxlen=size)
+        self.timeouts = 0
+        self.boost = 1.0                        # backoff after timeouts
+        self._base: Optional[float] = None      # unboosted timeout, cached until the next sample
+
+    def add(self, seconds: float):
+        self.samples.append(seconds)
+        self._base = None
+
+
+class AdaptiveTimeouts:
+    """Thread-safe rolling latency windows and the read timeouts derived from them."""
+
+    def __init__(
+        self,
+        percentile: float = 0.99,
+        floor_multiplier: float = 2.0,
+        ceiling_multiplier: float = 5.0,
+        min_seconds: float = 5.0,
+        max_seconds: float = 300.0,
+        cold_seconds: Optional[float] = None,
+        window: int = 256,
+        min_samples: int = 10,
+        backoff: float = 2.0
+    ):
+        """
+        Initialize adaptive timeouts.
+
+        Args:
+            percentile: Latency percentile the timeout tracks
+            floor_multiplier: Timeout is at least this many medians
+            ceiling_multiplier: Timeout is at most this many medians
+            min_seconds: Absolute lower bound
+            max_seconds: Absolute upper bound
+            cold_seconds: Timeout while a class has fewer than min_samples
+                          (None = leave the HTTP client's own timeout)
+            window: Samples kept per class
+            min_samples: Samples needed before a class gets its own timeout
+            backoff: Timed-out calls are recorded at backoff x their timeout,
+                     and each one multiplies the class timeout by it
+        """
+        if not 0 < percentile <= 1:
+            raise ValueError(f"Invalid percentile: {percentile}. Must be in (0, 1]")
+        if not 0 < floor_multiplier <= ceiling_multiplier:
+            raise ValueError("Need 0 < floor_multiplier <= ceiling_multiplier")
+        if backoff < 1:
+            raise ValueError(f"Invalid backoff: {backoff}. Must be >= 1")
+
+        self.percentile = percentile
+        self.floor_multiplier = floor_multiplier
+        self.ceiling_multiplier = ceiling_multiplier
+        self.min_seconds = min_seconds
+        self.max_seconds = max_seconds
+        self.cold_seconds = cold_seconds
+        self.window = window
+        self.min_samples = min_samples
+        self.backoff = backoff
+        # Boost limit: enough to climb from min_seconds to max_seconds
+        self._max_boost = max(1.0, max_seconds / max(min_seconds, 0.1))
+
+        self._windows: Dict[TimeoutKey, _Window] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> Optional["AdaptiveTimeouts"]:
+        """
+        Build from ADAPTIVE_TIMEOUTS_* settings; ADAPTIVE_TIMEOUTS=off disables.
+
+        ADAPTIVE_TIMEOUTS_FLOOR / _CEILING set the multipliers and
+        ADAPTIVE_TIMEOUTS_PERCENTILE the tracked percentile.
+        """
+        if os.getenv("ADAPTIVE_TIMEOUTS", "on").lower() in ("off", "0", "false"):
+            return None
+        return cls(
+            percentile=float(os.getenv("ADAPTIVE_TIMEOUTS_PERCENTILE", "0.99")),
+            floor_multiplier=float(os.getenv("ADAPTIVE_TIMEOUTS_FLOOR", "2.0")),
+            ceiling_multiplier=float(os.getenv("ADAPTIVE_TIMEOUTS_CEILING", "5.0"))
+        )
+
+    def _window(self, key: TimeoutKey) -> _Window:
+        window = self._windows.get(key)
+        if window is None:
+            window = self._windows[key] = _Window(self.window)
+        return window
+
+    def observe(self, key: TimeoutKey, seconds: float, timed_out: bool = False):
+        """
+        Record the longest wait for data of one finished call.
+
+        Args:
+            key: (model_id, image_size, aspect_ratio)
+            seconds: Longest time the call waited for response data
+            timed_out: The call hit its timeout (seconds is then the timeout)
+        """
+        model_id, image_size, _ = key
+        with self._lock:
+            for window_key in (key, (model_id, image_size, ANY_ASPECT)):
+                window = self._window(window_key)
+                if timed_out:
+                    # Censored: the real latency is somewhere above the timeout
+                    if len(window.samples) >= self.min_samples:
+                        window.boost = min(window.boost * self.backoff, self._max_boost)
+                    window.add(seconds * self.backoff)
+                    window.timeouts += 1
+                else:
+                    window.add(seconds)
+                    if window.boost > 1.0 and seconds <= self._base_timeout(window):
+                        window.boost = max(1.0, window.boost / self.backoff)
+
+    def _base_timeout(self, window: _Window) -> float:
+        """Timeout from the samples alone (no backoff boost)."""
+        if window._base is None:
+            ordered = sorted(window.samples)
+            median = percentile(ordered, 0.5)
+            timeout = min(
+                max(percentile(ordered, self.percentile), median * self.floor_multiplier),
+                median * self.ceiling_multiplier
+            )
+            window._base = min(max(timeout, self.min_seconds), self.max_seconds)
+        return window._base
+
+    def timeout_for(self, key: TimeoutKey) -> Optional[float]:
+        """
+        Read timeout for a call class.
+
+        cold_seconds until it has enough samples, unless it has already
+        timed out: then the longest wait seen (timeouts count at backoff x).
+        """
+        model_id, image_size, _ = key
+        with self._lock:
+            windows = [
+                self._windows[window_key]
+                for window_key in (key, (model_id, image_size, ANY_ASPECT))
+                if window_key in self._windows
+            ]
+            for window in windows:
+                if len(window.samples) >= self.min_samples:
+                    return min(self._base_timeout(window) * window.boost, self.max_seconds)
+            for window in windows:
+                if window.timeouts:
+                    return min(max(max(window.samples), self.min_seconds), self.max_seconds)
+        return self.cold_seconds
+
+    def stats(self) -> List[Dict]:
+        """Samples, p50/p99 and current timeout per (model, size, aspect)."""
+        with self._lock:
+            keys = [key for key in self._windows if key[2] != ANY_ASPECT]
+        result = []
+        for key in sorted(keys, key=lambda k: tuple(part or "" for part in k)):
+            timeout = self.timeout_for(key)
+            with self._lock:
+                window = self._windows[key]
+                ordered = sorted(window.samples)
+                timeouts = window.timeouts
+                boost = window.boost
+            result.append({
+                "model": key[0],
+                "image_size": key[1],
+                "aspect_ratio": key[2],
+                "samples": len(ordered),
+                "p50_seconds": round(percentile(ordered, 0.5), 3),
+                "p99_seconds": round(percentile(ordered, 0.99), 3),
+                "timeout_seconds": round(timeout, 3) if timeout is not None else None,
+                "timeouts": timeouts,
+                "backoff": boost
+            })
+        return result
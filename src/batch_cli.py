@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Batch CLI - Overnight catalog jobs through the Gemini Batch API
+
+Reads a prompt file, submits one asynchronous batch job (half the price of
+synchronous calls, no per-minute rate limits), waits for it, and writes the
+images to an output directory in input order.
+
+Prompt file: one prompt per line (blank lines and # comments skipped), or
+.jsonl with {"prompt": "..."} per line.
+
+Usage:
+    python src/batch_cli.py run prompts.txt --out-dir catalog/ --model flash
+    python src/batch_cli.py submit prompts.txt --out-dir catalog/
+    python src/batch_cli.py status --out-dir catalog/
+    python src/batch_cli.py fetch --out-dir catalog/
+
+`submit` records the batch in <out-dir>/batch.json so `status` and `fetch`
+can pick it up later (e.g. from a cron job the next morning).
+"""
+
+import argparse
+import asyncio
+import json
+import mimetypes
+import sys
+from pathlib import Path
+from typing import List
+
+from gemini_client import GeminiClient
+
+
+def read_prompts(path: str) -> List[str]:
+    prompts = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if path.endswith(".jsonl"):
+                line = json.loads(line)["prompt"]
+            prompts.append(line)
+    return prompts
+
+
+def enhance_prompts(prompts: List[str], quality: str) -> List[str]:
+    """Run prompts through the same classify + template step as /generate."""
+    from domain_classifier import DomainClassifier
+    from template_engine import TemplateEngine
+
+    classifier = DomainClassifier()
+    engine = TemplateEngine()
+    enhanced = []
+    for prompt, (domain, _) in zip(prompts, classifier.classify_many(prompts)):
+        subcategory = engine.suggest_subcategory(prompt, domain)
+        enhanced.append(engine.enhance(prompt, domain, quality, subcategory))
+    return enhanced
+
+
+def _state_path(out_dir: str) -> Path:
+    return Path(out_dir) / "batch.json"
+
+
+def _load_state(out_dir: str) -> dict:
+    path = _state_path(out_dir)
+    if not path.exists():
+        sys.exit(f"No batch.json in {out_dir} - run `submit` first")
+    return json.loads(path.read_text())
+
+
+async def submit(args) -> dict:
+    prompts = read_prompts(args.prompts)
+    if not prompts:
+        sys.exit(f"No prompts in {args.prompts}")
+    if args.enhance:
+        prompts = enhance_prompts(prompts, args.enhance)
+
+    async with GeminiClient() as client:
+        batch = await client.submit_batch(
+            prompts,
+            model=args.model,
+            aspect_ratio=args.aspect_ratio,
+            image_size=args.image_size,
+            display_name=Path(args.prompts).stem
+        )
+
+    Path(args.out_dir).mkdir(parents=True, exist_ok=True)
+    state = {"batch": batch["name"], "prompts": prompts}
+    _state_path(args.out_dir).write_text(json.dumps(state, indent=2))
+    print(f"Submitted {len(prompts)} prompts as {batch['name']}")
+    return state
+
+
+async def status(args):
+    state = _load_state(args.out_dir)
+    async with GeminiClient() as client:
+        batch = await client.get_batch(state["batch"])
+    print(f"{state['batch']}: {GeminiClient.batch_state(batch)}")
+
+
+async def fetch(args, wait: bool = True):
+    state = _load_state(args.out_dir)
+    out_dir = Path(args.out_dir)
+    width = len(str(len(state["prompts"])))
+
+    async with GeminiClient() as client:
+        if wait:
+            batch = await client.wait_for_batch(
+                state["batch"],
+                poll_interval=args.poll_interval,
+                max_poll_interval=args.max_poll_interval
+            )
+        else:
+            batch = await client.get_batch(state["batch"])
+
+        batch_state = GeminiClient.batch_state(batch)
+        if batch_state != "SUCCEEDED":
+            sys.exit(f"{state['batch']} finished as {batch_state}")
+
+        manifest = [
+            {"index": i, "prompt": prompt, "file": None, "error": "missing from batch results"}
+            for i, prompt in enumerate(state["prompts"])
+        ]
+        async for index, result in client.iter_batch_results(batch):
+            if not 0 <= index < len(manifest):
+                continue
+            if "error" in result:
+                manifest[index]["error"] = result["error"]
+                continue
+            extension = mimetypes.guess_extension(result["mime_type"] or "") or ".png"
+            filename = f"{index:0{width}d}{extension}"
+            (out_dir / filename).write_bytes(result["image_data"])
+            manifest[index].update(file=filename, error=None)
+
+    (out_dir / "manifest.json").write_text(json.dumps(manifest, indent=2))
+    failed = sum(1 for item in manifest if item["error"])
+    print(f"Wrote {len(manifest) - failed} images to {out_dir} ({failed} failed)")
+
+
+async def run(args):
+    await submit(args)
+    await fetch(args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gemini Batch API image jobs")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def add_submit_options(p):
+        p.add_argument("prompts", help="Prompt file (.txt one per line, or .jsonl)")
+        p.add_argument("--model", default="flash", choices=sorted(GeminiClient.MODELS))
+        p.add_argument("--aspect-ratio", choices=sorted(GeminiClient.ASPECT_RATIOS))
+        p.add_argument("--image-size", choices=sorted(GeminiClient.IMAGE_SIZES))
+        p.add_argument("--enhance", choices=["basic", "detailed", "expert"],
+                       help="Enhance prompts with domain templates first")
+
+    def add_fetch_options(p):
+        p.add_argument("--poll-interval", type=float, default=30.0)
+        p.add_argument("--max-poll-interval", type=float, default=600.0)
+
+    for name in ("run", "submit", "status", "fetch"):
+        p = sub.add_parser(name)
+        if name in ("run", "submit"):
+            add_submit_options(p)
+        p.add_argument("--out-dir", required=True)
+        if name in ("run", "fetch"):
+            add_fetch_options(p)
+
+    args = parser.parse_args()
+    command = {"run": run, "submit": submit, "status": status, "fetch": fetch}[args.command]
+    asyncio.run(command(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+"""
+Cassette - Record and replay upstream Gemini traffic
+
+Record mode passes calls through to the real API and stores each response
+(status, headers, raw body, time to first byte and total time) in a
+compact zip file, keyed by a request fingerprint. Replay mode serves those
+responses back without network access, sleeping for the recorded (or
+scaled) latencies, so pipeline benchmarks in CI are reproducible and free.
+
+API keys never reach the cassette: fingerprints and stored URLs drop the
+key parameter, and request headers are not recorded.
+
+Example:
+    # Record once against the live API
+    client = GeminiClient(cassette=Cassette("bench.cassette", mode="record"))
+
+    # Replay in CI, at real speed or faster
+    client = GeminiClient(cassette=Cassette("bench.cassette", latency_scale=0.1))
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+import zipfile
+from typing import Dict, List, Optional
+
+import httpx
+
+MODES = ("record", "replay")
+
+# Query parameters that vary per run or are secret
+IGNORED_PARAMS = {"key", "upload_id"}
+
+REPLAY_CHUNK = 64 * 1024
+
+
+class CassetteMiss(LookupError):
+    """Replay found no recording for a request."""
+
+
+def fingerprint(method: str, url: httpx.URL, body: bytes) -> str:
+    """Stable id for a request: method, path, non-secret query and body hash."""
+    params = sorted(
+        (name, value) for name, value in url.params.multi_items() if name not in IGNORED_PARAMS
+    )
+    digest = hashlib.sha256()
+    digest.update(method.upper().encode())
+    digest.update(b"\0" + url.path.encode() + b"\0")
+    digest.update(json.dumps(params).encode())
+    digest.update(b"\0" + hashlib.sha256(body).digest())
+    return digest.hexdigest()[:32]
+
+
+class Cassette:
+    """
+    Recorded interactions in one zip file.
+
+    Layout: interactions/<n>.json (metadata) and bodies/<sha256> (raw
+    response bodies, stored once however often they recur).
+    """
+
+    def __init__(self, path: str, mode: str = "replay", latency_scale: float = 1.0):
+        """
+        Initialize cassette.
+
+        Args:
+            path: Cassette file (record mode starts it afresh)
+            mode: "record" or "replay"
+            latency_scale: Replay speed factor for recorded latencies
+                           (1.0 = as recorded, 0 = instant)
+        """
+        if mode not in MODES:
+            raise ValueError(f"Invalid cassette mode: {mode}. Must be one of {MODES}")
+
+        self.path = path
+        self.mode = mode
+        self.latency_scale = latency_scale
+        self.recorded = 0
+        self.replayed = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._interactions: Dict[str, List[Dict]] = {}
+        self._next_replay: Dict[str, int] = {}
+        self._bodies: Dict[str, bytes] = {}
+        self._stored_bodies = set()
+
+        if mode == "record":
+            if os.path.exists(path):
+                os.remove(path)
+        else:
+            self._load()
+
+    @classmethod
+    def from_env(cls) -> Optional["Cassette"]:
+        """
+        Build a cassette from GEMINI_CASSETTE, if set.
+
+        GEMINI_CASSETTE_MODE picks record/replay (default replay) and
+        GEMINI_CASSETTE_LATENCY_SCALE the replay speed.
+        """
+        path = os.getenv("GEMINI_CASSETTE")
+        if not path:
+            return None
+        return cls(
+            path,
+            mode=os.getenv("GEMINI_CASSETTE_MODE", "replay"),
+            latency_scale=float(os.getenv("GEMINI_CASSETTE_LATENCY_SCALE", "1.0"))
+        )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(items) for items in self._interactions.values())
+
+    def transport(self, inner: Optional[httpx.AsyncBaseTransport] = None) -> "CassetteTransport":
+        """httpx transport that records through inner, or replays from this cassette."""
+        return CassetteTransport(self, inner)
+
+    def stats(self) -> Dict:
+        return {
+            "mode": self.mode,
+            "interactions": len(self),
+            "recorded": self.recorded,
+            "replayed": self.replayed,
+            "misses": self.misses
+        }
+
+    def _load(self):
+        with zipfile.ZipFile(self.path) as archive:
+            for name in sorted(archive.namelist()):
+                if name.startswith("interactions/"):
+                    meta = json.loads(archive.read(name))
+                    self._interactions.setdefault(meta["fingerprint"], []).append(meta)
+
+    def record(self, meta: Dict, body: bytes):
+        body_sha = hashlib.sha256(body).hexdigest()
+        meta = {**meta, "body": body_sha}
+        with self._lock:
+            self.recorded += 1
+            number = self.recorded
+            self._interactions.setdefault(meta["fingerprint"], []).append(meta)
+            with zipfile.ZipFile(self.path, "a", compression=zipfile.ZIP_DEFLATED) as archive:
+                if body_sha not in self._stored_bodies:
+                    archive.writestr(f"bodies/{body_sha}", body)
+                    self._stored_bodies.add(body_sha)
+                archive.writestr(f"interactions/{number:06d}.json", json.dumps(meta))
+
+    def lookup(self, key: str) -> Optional[Dict]:
+        """Next recording for a fingerprint (cycling when a request repeats more often)."""
+        with self._lock:
+            items = self._interactions.get(key)
+            if not items:
+                self.misses += 1
+                return None
+            index = self._next_replay.get(key, 0)
+            self._next_replay[key] = index + 1
+            self.replayed += 1
+            return items[index % len(items)]
+
+    def body(self, body_sha: str) -> bytes:
+        with self._lock:
+            body = self._bodies.get(body_sha)
+            if body is None:
+                with zipfile.ZipFile(self.path) as archive:
+                    body = archive.read(f"bodies/{body_sha}")
+                self._bodies[body_sha] = body
+            return body
+
+
+class _ReplayStream(httpx.AsyncByteStream):
+    """Recorded body, spread over the recorded transfer time."""
+
+    def __init__(self, body: bytes, duration: float):
+        self.body = body
+        self.duration = duration
+
+    async def __aiter__(self):
+        chunks = max(1, -(-len(self.body) // REPLAY_CHUNK))
+        pause = self.duration / chunks
+        for start in range(0, len(self.body), REPLAY_CHUNK):
+            if pause > 0:
+                await asyncio.sleep(pause)
+            yield self.body[start:start + REPLAY_CHUNK]
+
+
+class CassetteTransport(httpx.AsyncBaseTransport):
+    """
+    Record or replay at the transport layer, below GeminiClient.
+
+    Everything above (retries, key pool, hooks, inlineData streaming) runs
+    unchanged. Recording buffers each request and response body to store
+    it, so memory use in record mode is not representative.
+    """
+
+    def __init__(self, cassette: Cassette, inner: Optional[httpx.AsyncBaseTransport] = None):
+        self.cassette = cassette
+        self.inner = inner or httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        body = await request.aread()
+        key = fingerprint(request.method, request.url, body)
+
+        if self.cassette.mode == "replay":
+            return await self._replay(request, key)
+
+        start = time.perf_counter()
+        response = await self.inner.handle_async_request(request)
+        ttfb = time.perf_counter() - start
+        raw = b"".join([chunk async for chunk in response.aiter_raw()])
+        await response.aclose()
+        elapsed = time.perf_counter() - start
+
+        headers = [
+            (name, value) for name, value in response.headers.multi_items()
+            if name.lower() != "transfer-encoding"
+        ]
+        self.cassette.record({
+            "fingerprint": key,
+            "method": request.method,
+            "path": request.url.path,
+            "status": response.status_code,
+            "headers": headers,
+            "ttfb": round(ttfb, 4),
+            "elapsed": round(elapsed, 4)
+        }, raw)
+
+        return httpx.Response(
+            response.status_code,
+            headers=headers,
+            stream=httpx.ByteStream(raw),
+            request=request,
+            extensions=response.extensions
+        )
+
+    async def _replay(self, request: httpx.Request, key: str) -> httpx.Response:
+        meta = self.cassette.lookup(key)
+        if meta is None:
+            raise CassetteMiss(
+                f"No recording for {request.method} {request.url.path} "
+                f"(fingerprint {key}) in {self.cassette.path}"
+            )
+
+        scale = self.cassette.latency_scale
+        if meta["ttfb"] * scale > 0:
+            await asyncio.sleep(meta["ttfb"] * scale)
+
+        return httpx.Response(
+            meta["status"],
+            headers=meta["headers"],
+            stream=_ReplayStream(
+                self.cassette.body(meta["body"]),
+                max(0.0, meta["elapsed"] - meta["ttfb"]) * scale
+            ),
+            request=request
+        )
+
+    async def aclose(self):
+        await self.inner.aclose()
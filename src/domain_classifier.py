@@ -6,9 +6,20 @@ Classifies user prompts into one of four domains:
 - diagrams (architecture, flowcharts, wireframes)
 - art (paintings, illustrations, digital art)
 - products (e-commerce, catalog shots)
+
+Keywords are compiled once into an Aho-Corasick automaton (keyword_matcher),
+so each classification is a single case-insensitive pass over the prompt.
+With a trained HashedClassifier (hashed_classifier) the domain decision is
+the model's instead; keyword scores are still reported for debugging.
 """
 
-from typing import Dict, List
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence
+
+from keyword_config import load_keywords
+from keyword_matcher import KeywordMatcher, np
+
+if TYPE_CHECKING:
+    from hashed_classifier import HashedClassifier
 
 
 class DomainClassifier:
@@ -21,37 +32,25 @@ class DomainClassifier:
         # Returns: "photography"
     """
 
-    # Domain keywords - simple and effective
-    DOMAIN_KEYWORDS: Dict[str, List[str]] = {
-        "photography": [
-            "photo", "photograph", "portrait", "headshot", "selfie",
-            "picture", "shot", "camera", "lens", "lighting",
-            "bokeh", "focus", "exposure", "ISO", "aperture",
-            "landscape", "cityscape", "sunset", "golden hour",
-            "Canon", "Nikon", "Sony", "Phase One"
-        ],
-        "diagrams": [
-            "diagram", "chart", "graph", "flowchart", "wireframe",
-            "architecture", "schematic", "blueprint", "layout",
-            "infographic", "visualization", "flow", "process",
-            "UML", "ERD", "sequence", "component", "network",
-            "AWS", "GCP", "Azure", "microservices", "infrastructure"
-        ],
-        "art": [
-            "art", "artwork", "painting", "drawing", "illustration",
-            "sketch", "watercolor", "oil painting", "acrylic",
-            "impressionist", "abstract", "surreal", "realistic",
-            "digital art", "concept art", "character design",
-            "style of", "inspired by", "artistic", "creative"
-        ],
-        "products": [
-            "product", "e-commerce", "catalog", "merchandise",
-            "item", "package", "packaging", "unboxing",
-            "advertising", "commercial", "marketing", "promotional",
-            "studio shot", "white background", "lifestyle",
-            "Amazon", "Shopify", "store", "retail"
-        ]
-    }
+    # Domain keywords - tuned in templates/keywords.json (hot-reloadable, see keyword_reloader)
+    DOMAIN_KEYWORDS: Dict[str, List[str]] = load_keywords()["domains"]
+
+    def __init__(
+        self,
+        keywords: Optional[Dict[str, List[str]]] = None,
+        model: Optional["HashedClassifier"] = None
+    ):
+        """
+        Initialize classifier.
+
+        Args:
+            keywords: Domain -> keywords (defaults to DOMAIN_KEYWORDS)
+            model: Learned classifier that decides the domain instead of
+                   keyword counts (None = keyword matching)
+        """
+        self.keywords = keywords if keywords is not None else self.DOMAIN_KEYWORDS
+        self.matcher = KeywordMatcher(self.keywords)
+        self.model = model
 
     def classify(self, user_input: str) -> str:
         """
@@ -64,18 +63,14 @@ class DomainClassifier:
             Domain name: "photography", "diagrams", "art", or "products"
 
         Algorithm:
-            1. Convert input to lowercase
-            2. Count keyword matches for each domain
-            3. Return domain with most matches
-            4. Default to "photography" if no matches
+            1. Count keyword matches for each domain (one case-folded pass)
+            2. Return domain with most matches
+            3. Default to "photography" if no matches
         """
-        user_input_lower = user_input.lower()
+        if self.model is not None:
+            return self.model.classify_with_confidence(user_input)[0]
 
-        # Count keyword matches per domain
-        scores = {}
-        for domain, keywords in self.DOMAIN_KEYWORDS.items():
-            score = sum(1 for keyword in keywords if keyword in user_input_lower)
-            scores[domain] = score
+        scores = self.matcher.scores(user_input)
 
         # Return domain with highest score
         max_score = max(scores.values())
@@ -102,14 +97,56 @@ class DomainClassifier:
             domain, confidence = classifier.classify_with_confidence("AWS architecture diagram")
             # Returns: ("diagrams", 0.8)
         """
-        user_input_lower = user_input.lower()
+        if self.model is not None:
+            return self.model.classify_with_confidence(user_input)
+        return self.decide(self.matcher.scores(user_input))
+
+    def classify_many(self, prompts: Sequence[str]) -> List[tuple[str, float]]:
+        """
+        Classify many prompts at once (offline catalog jobs, batches).
+
+        Keyword hits become a sparse prompt x keyword matrix (matched_many),
+        reduced to per-domain scores, argmax and confidences with NumPy.
+        Results equal classify_with_confidence() for every prompt, ties and
+        the no-match default included. Small batches, long prompts (where
+        the per-prompt loop is faster, see KeywordMatcher.prefers_batch)
+        and missing NumPy loop instead.
+
+        Args:
+            prompts: User prompts
+
+        Returns:
+            [(domain, confidence), ...] in input order
 
-        # Count keyword matches per domain
-        scores = {}
-        for domain, keywords in self.DOMAIN_KEYWORDS.items():
-            score = sum(1 for keyword in keywords if keyword in user_input_lower)
-            scores[domain] = score
+        Example:
+            classifier.classify_many(["headshot of a CEO", "AWS diagram"])
+            # Returns: [("photography", 1.0), ("diagrams", 1.0)]
+        """
+        if self.model is not None:
+            return self.model.classify_many(prompts) if prompts else []
+        if not self.matcher.prefers_batch(prompts):
+            return [self.classify_with_confidence(prompt) for prompt in prompts]
+
+        scores = self.matcher.scores_many(prompts)
+        totals = scores.sum(axis=1)
+        best = scores.argmax(axis=1)  # first maximum, like max() over the dict
+        top = scores[np.arange(len(prompts)), best]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            confidence = top / totals
+
+        names = np.array(self.matcher.groups, dtype=object)[best]
+        names[totals == 0] = "photography"
+        confidence[totals == 0] = 0.5
+        return list(zip(names.tolist(), confidence.tolist()))
+
+    @staticmethod
+    def decide(scores: Dict[str, int]) -> tuple[str, float]:
+        """
+        (domain, confidence) from per-domain keyword scores.
 
+        Shared by classify_with_confidence and PromptAnalyzer, so a prompt
+        scanned once gets exactly the same answer.
+        """
         total_matches = sum(scores.values())
 
         if total_matches == 0:
@@ -120,6 +157,16 @@ class DomainClassifier:
 
         return best_domain, confidence
 
+    def decide_for(self, user_input: str, scores: Dict[str, int]) -> tuple[str, float]:
+        """
+        classify_with_confidence() given the prompt's already-computed keyword scores.
+
+        Lets PromptAnalyzer reuse its scan; with a model the prompt decides.
+        """
+        if self.model is not None:
+            return self.model.classify_with_confidence(user_input)
+        return self.decide(scores)
+
     def get_all_scores(self, user_input: str) -> Dict[str, int]:
         """
         Get keyword match scores for all domains (useful for debugging).
@@ -134,14 +181,10 @@ class DomainClassifier:
             scores = classifier.get_all_scores("architecture diagram")
             # Returns: {"photography": 0, "diagrams": 2, "art": 0, "products": 0}
         """
-        user_input_lower = user_input.lower()
+        return self.matcher.scores(user_input)
 
-        scores = {}
-        for domain, keywords in self.DOMAIN_KEYWORDS.items():
-            score = sum(1 for keyword in keywords if keyword in user_input_lower)
-            scores[domain] = score
 
-        return scores
+_default_classifier: Optional[DomainClassifier] = None
 
 
 # Convenience function for simple usage
@@ -159,8 +202,11 @@ def classify_domain(user_input: str) -> str:
         domain = classify_domain("portrait of a woman")
         # Returns: "photography"
     """
-    classifier = DomainClassifier()
-    return classifier.classify(user_input)
+    global _default_classifier
+    if _default_classifier is None:
+        # Compiling the automaton takes a few ms; do it once
+        _default_classifier = DomainClassifier()
+    return _default_classifier.classify(user_input)
 
 
 if __name__ == "__main__":
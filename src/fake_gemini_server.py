@@ -0,0 +1,872 @@
+"""
+Fake Gemini Server - Local stand-in for the :generateContent and :predict endpoints
+
+Serves realistic Gemini image responses on localhost so load tests, capacity
+planning and CI runs never touch the real API (or spend real money). Also
+emulates the Files API upload and the Batch API job lifecycle.
+
+Point the client at it:
+    python src/fake_gemini_server.py --port 8090 --latency lognormal:4,0.35
+
+    export GEMINI_BASE_URL=http://127.0.0.1:8090/v1beta/models
+    client = GeminiClient(api_key="fake")   # any key works
+
+Or from Python (tests, benchmarks):
+    server = FakeGeminiServer(latency="fixed:0.05", error_rate_503=0.1)
+    httpd, base_url = server.start_in_thread()
+    client = GeminiClient(api_key="fake", base_url=base_url)
+"""
+
+import argparse
+import base64
+import json
+import math
+import random
+import struct
+import threading
+import time
+import zlib
+from collections import deque
+from typing import Callable, Dict, List, Optional, Tuple
+
+from flask import Flask, Response, jsonify, request
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+
+# Approximate PNG sizes the real API returns for each image_size
+DEFAULT_IMAGE_BYTES = {
+    "1K": 1_400_000,
+    "2K": 5_000_000,
+    "4K": 18_000_000
+}
+
+# Longest edge (in pixels) for each image_size
+SIZE_PIXELS = {"1K": 1024, "2K": 2048, "4K": 4096}
+
+ASPECT_RATIOS = {"1:1", "16:9", "9:16", "4:3", "3:4"}
+
+MODEL_VERSIONS = {
+    "gemini-2.5-flash-image": "gemini-2.5-flash-image",
+    "gemini-3-pro-image-preview": "gemini-3-pro-image-preview"
+}
+
+# Imagen models behind :predict, with the sizes each accepts
+IMAGEN_SIZES = {
+    "imagen-4.0-fast-generate-001": {"1K"},
+    "imagen-4.0-generate-001": {"1K", "2K"},
+    "imagen-4.0-ultra-generate-001": {"1K", "2K"}
+}
+MAX_IMAGEN_SAMPLES = 4
+
+IMAGE_PLACEHOLDER = "__FAKE_GEMINI_IMAGE__"
+
+ERROR_BODIES = {
+    429: ("RESOURCE_EXHAUSTED", "Resource has been exhausted (e.g. check quota)."),
+    503: ("UNAVAILABLE", "The model is overloaded. Please try again later."),
+    400: ("INVALID_ARGUMENT", "Request contains an invalid argument."),
+    403: ("PERMISSION_DENIED", "Method doesn't allow unregistered callers."),
+    404: ("NOT_FOUND", "Requested entity was not found.")
+}
+
+
+class _QuietRequestHandler(WSGIRequestHandler):
+    """Request handler that skips per-request access logging (load tests)."""
+
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """
+    Parse a latency distribution spec into a sampler (seconds).
+
+    Supported specs:
+        fixed:2.5              always 2.5s
+        uniform:1,4            uniformly between 1s and 4s
+        normal:3,0.5           mean 3s, stddev 0.5s (clamped at 0)
+        lognormal:3,0.4        median 3s, log-space sigma 0.4 (long right tail)
+
+    Example:
+        sample = parse_latency("lognormal:3,0.4")
+        delay = sample(random.Random(42))
+    """
+    kind, _, args = spec.partition(":")
+    try:
+        values = [float(v) for v in args.split(",")] if args else []
+    except ValueError:
+        raise ValueError(f"Invalid latency spec: {spec}")
+
+    if kind == "fixed" and len(values) == 1:
+        return lambda rng: values[0]
+    if kind == "uniform" and len(values) == 2:
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "normal" and len(values) == 2:
+        return lambda rng: max(0.0, rng.gauss(values[0], values[1]))
+    if kind == "lognormal" and len(values) == 2:
+        mu = math.log(values[0]) if values[0] > 0 else 0.0
+        return lambda rng: rng.lognormvariate(mu, values[1])
+
+    raise ValueError(
+        f"Invalid latency spec: {spec}. "
+        f"Use fixed:S, uniform:A,B, normal:MEAN,STD or lognormal:MEDIAN,SIGMA"
+    )
+
+
+def _rfc3339(timestamp: float) -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(timestamp))
+
+
+def image_dimensions(image_size: str, aspect_ratio: str) -> Tuple[int, int]:
+    """Pixel dimensions for an image_size/aspect_ratio pair (longest edge = size)."""
+    longest = SIZE_PIXELS[image_size]
+    w_ratio, h_ratio = (int(v) for v in aspect_ratio.split(":"))
+    if w_ratio >= h_ratio:
+        return longest, longest * h_ratio // w_ratio
+    return longest * w_ratio // h_ratio, longest
+
+
+def _png_chunk(chunk_type: bytes, data: bytes) -> bytes:
+    crc = zlib.crc32(chunk_type + data) & 0xFFFFFFFF
+    return struct.pack(">I", len(data)) + chunk_type + data + struct.pack(">I", crc)
+
+
+def build_png(width: int, height: int, target_bytes: int, seed: int = 0) -> bytes:
+    """
+    Build a structurally valid PNG with real dimensions, padded to ~target_bytes.
+
+    The pixels are a tiny solid-color IDAT; the bulk is a private ancillary
+    chunk of random bytes so the base64 payload has realistic entropy.
+    """
+    header = b"\x89PNG\r\n\x1a\n"
+    ihdr = _png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+    # One filter byte + RGB per row, all zero -> compresses to almost nothing
+    compressor = zlib.compressobj(9)
+    row = b"\x00" * (1 + width * 3)
+    idat_data = b"".join(compressor.compress(row) for _ in range(height))
+    idat = _png_chunk(b"IDAT", idat_data + compressor.flush())
+    iend = _png_chunk(b"IEND", b"")
+
+    filler_len = max(0, target_bytes - len(header) - len(ihdr) - len(idat) - len(iend) - 12)
+    filler = _png_chunk(b"fkGm", random.Random(seed).randbytes(filler_len))
+
+    return header + ihdr + filler + idat + iend
+
+
+class FakeGeminiServer:
+    """
+    Configurable stand-in for the Gemini :generateContent endpoint.
+
+    Example:
+        server = FakeGeminiServer(
+            latency="lognormal:4,0.35",
+            latency_overrides={"gemini-3-pro-image-preview/4K": "lognormal:25,0.3"},
+            error_rate_429=0.02,
+            error_rate_503=0.01,
+            empty_image_rate=0.01
+        )
+        server.serve(port=8090)
+    """
+
+    def __init__(
+        self,
+        latency: str = "fixed:0",
+        latency_overrides: Optional[Dict[str, str]] = None,
+        error_rate_429: float = 0.0,
+        error_rate_503: float = 0.0,
+        empty_image_rate: float = 0.0,
+        image_bytes: Optional[Dict[str, int]] = None,
+        require_key: bool = True,
+        first_event_fraction: float = 0.3,
+        max_candidates: int = 1,
+        batch_pending_seconds: float = 0.5,
+        batch_run_seconds: float = 2.0,
+        batch_error_rate: float = 0.0,
+        file_ttl_seconds: float = 48 * 3600,
+        key_requests_per_minute: Optional[int] = None,
+        revoked_keys: Optional[List[str]] = None,
+        hidden_models: Optional[List[str]] = None,
+        seed: Optional[int] = None
+    ):
+        """
+        Initialize fake server behaviour.
+
+        Args:
+            latency: Default latency spec (see parse_latency)
+            latency_overrides: Specs keyed by "model", "model/size" or "size"
+                               (most specific wins)
+            error_rate_429: Probability of a 429 RESOURCE_EXHAUSTED response
+            error_rate_503: Probability of a 503 UNAVAILABLE response
+            empty_image_rate: Probability of a 200 with text parts only
+            image_bytes: PNG size per image_size (defaults to DEFAULT_IMAGE_BYTES)
+            require_key: Reject requests without ?key= (like the real API)
+            first_event_fraction: Share of the latency before the first
+                                  :streamGenerateContent event
+            max_candidates: Largest candidateCount accepted (the real image
+                            models reject anything above 1)
+            batch_pending_seconds: Time a batch stays BATCH_STATE_PENDING
+            batch_run_seconds: Time a batch then stays BATCH_STATE_RUNNING
+            batch_error_rate: Probability a batch item comes back as an error
+            file_ttl_seconds: Lifetime of uploaded files (real API: 48h)
+            key_requests_per_minute: Per-key generation quota; calls over it
+                                     get a 429 (None = unlimited)
+            revoked_keys: Keys answered with 403 PERMISSION_DENIED
+            hidden_models: Model ids left out of GET /models (a key without
+                           access to them)
+            seed: RNG seed for reproducible runs
+        """
+        self.default_latency = parse_latency(latency)
+        self.latency_overrides = {
+            key: parse_latency(spec)
+            for key, spec in (latency_overrides or {}).items()
+        }
+        self.error_rate_429 = error_rate_429
+        self.error_rate_503 = error_rate_503
+        self.empty_image_rate = empty_image_rate
+        self.image_bytes = {**DEFAULT_IMAGE_BYTES, **(image_bytes or {})}
+        self.require_key = require_key
+        self.first_event_fraction = first_event_fraction
+        self.max_candidates = max_candidates
+        self.batch_pending_seconds = batch_pending_seconds
+        self.batch_run_seconds = batch_run_seconds
+        self.batch_error_rate = batch_error_rate
+        self.file_ttl_seconds = file_ttl_seconds
+        self.key_requests_per_minute = key_requests_per_minute
+        self.revoked_keys = set(revoked_keys or [])
+        self.hidden_models = set(hidden_models or [])
+
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self._image_cache: Dict[Tuple[str, str], str] = {}
+        self._cache_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        # Files API / Batch API state
+        self._store_lock = threading.Lock()
+        self._ids = 0
+        self._uploads: Dict[str, Dict] = {}
+        self._files: Dict[str, Dict] = {}
+        self._batches: Dict[str, Dict] = {}
+        self.input_images: List[Tuple[Optional[str], int]] = []
+        # Per-key generation calls: totals and start times in the last minute
+        self.key_requests: Dict[str, int] = {}
+        self._key_windows: Dict[str, deque] = {}
+        self.stats: Dict[str, int] = {
+            "requests": 0, "images": 0, "empty": 0,
+            "status_429": 0, "status_503": 0, "status_400": 0, "status_403": 0
+        }
+
+    def _count(self, key: str, amount: int = 1):
+        with self._stats_lock:
+            self.stats[key] = self.stats.get(key, 0) + amount
+
+    def _random(self) -> float:
+        with self._rng_lock:
+            return self._rng.random()
+
+    def _sample_latency(self, model_id: str, image_size: str) -> float:
+        sampler = (
+            self.latency_overrides.get(f"{model_id}/{image_size}")
+            or self.latency_overrides.get(model_id)
+            or self.latency_overrides.get(image_size)
+            or self.default_latency
+        )
+        with self._rng_lock:
+            return sampler(self._rng)
+
+    def image_b64(self, image_size: str, aspect_ratio: str) -> str:
+        """Base64 PNG for a size/aspect pair (built once, then cached)."""
+        key = (image_size, aspect_ratio)
+        with self._cache_lock:
+            if key not in self._image_cache:
+                width, height = image_dimensions(image_size, aspect_ratio)
+                png = build_png(width, height, self.image_bytes[image_size])
+                self._image_cache[key] = base64.b64encode(png).decode("ascii")
+            return self._image_cache[key]
+
+    def error_response(self, status: int, message: Optional[str] = None) -> Response:
+        reason, default_message = ERROR_BODIES[status]
+        self._count(f"status_{status}")
+        response = jsonify({
+            "error": {"code": status, "message": message or default_message, "status": reason}
+        })
+        response.status_code = status
+        return response
+
+    def _request_key(self) -> Optional[str]:
+        return request.args.get("key") or request.headers.get("x-goog-api-key")
+
+    def _check_key(self) -> Optional[Response]:
+        key = self._request_key()
+        if self.require_key and not key:
+            return self.error_response(403)
+        if key in self.revoked_keys:
+            return self.error_response(403, "API key not valid. Please pass a valid API key.")
+        return None
+
+    def _check_key_quota(self) -> Optional[Response]:
+        key = self._request_key() or ""
+        with self._stats_lock:
+            self.key_requests[key] = self.key_requests.get(key, 0) + 1
+            if self.key_requests_per_minute is None:
+                return None
+            now = time.monotonic()
+            window = self._key_windows.setdefault(key, deque())
+            while window and window[0] <= now - 60:
+                window.popleft()
+            if len(window) >= self.key_requests_per_minute:
+                exhausted = True
+            else:
+                window.append(now)
+                exhausted = False
+        return self.error_response(429) if exhausted else None
+
+    def _inject_failure(self) -> Optional[Response]:
+        roll = self._random()
+        if roll < self.error_rate_429:
+            return self.error_response(429)
+        if roll < self.error_rate_429 + self.error_rate_503:
+            return self.error_response(503)
+        return None
+
+    def _parse_generation(self, body: Dict) -> Tuple[str, str, int]:
+        config = body.get("generation_config") or body.get("generationConfig") or {}
+        image_config = config.get("imageConfig", {})
+        image_size = image_config.get("imageSize", "1K")
+        aspect_ratio = image_config.get("aspectRatio", "1:1")
+        candidate_count = config.get("candidateCount", 1)
+        if image_size not in self.image_bytes or aspect_ratio not in ASPECT_RATIOS:
+            raise ValueError(f"Unsupported imageConfig: {image_config}")
+        if not 1 <= candidate_count <= self.max_candidates:
+            raise ValueError("Multiple candidates is not enabled for this model")
+        self._check_inputs(body)
+        return image_size, aspect_ratio, candidate_count
+
+    def _check_inputs(self, body: Dict):
+        """Validate input images and record (mime_type, size) for each."""
+        for content in body.get("contents", []):
+            for part in content.get("parts", []):
+                file_data = part.get("fileData") or part.get("file_data")
+                if file_data is not None:
+                    uri = file_data.get("fileUri", "")
+                    file = self._get_file("files/" + uri.rsplit("/files/", 1)[-1]) if "/files/" in uri else None
+                    if file is None:
+                        raise PermissionError(
+                            f"You do not have permission to access the File {uri} or it may not exist."
+                        )
+                    with self._stats_lock:
+                        self.input_images.append((file["meta"]["mimeType"], len(file["data"])))
+                    self._count("file_references")
+                    continue
+
+                inline = part.get("inlineData") or part.get("inline_data")
+                if inline is None:
+                    continue
+                try:
+                    size = len(base64.b64decode(inline["data"], validate=True))
+                except (KeyError, TypeError, ValueError):
+                    raise ValueError("Invalid inlineData: base64 data required")
+                with self._stats_lock:
+                    self.input_images.append((inline.get("mimeType"), size))
+                self._count("input_images")
+
+    def _content(self, image_size: str, aspect_ratio: str, index: int = 0) -> Tuple[Dict, Optional[str]]:
+        """
+        Build one candidate.
+
+        Returns:
+            (candidate, image_b64) - the candidate's inlineData.data holds
+            IMAGE_PLACEHOLDER so the multi-MB string is spliced in once,
+            without going through json.dumps
+        """
+        parts = [{"text": "Here is the image you requested."}]
+        if self._random() < self.empty_image_rate:
+            self._count("empty")
+            parts = [{"text": "I can't generate that image. Try rephrasing the prompt."}]
+            image_b64 = None
+        else:
+            self._count("images")
+            parts.append({
+                "inlineData": {"mimeType": "image/png", "data": IMAGE_PLACEHOLDER}
+            })
+            image_b64 = self.image_b64(image_size, aspect_ratio)
+        candidate = {"content": {"parts": parts, "role": "model"}, "finishReason": "STOP", "index": index}
+        return candidate, image_b64
+
+    def _prepare(self, model_id: str):
+        """Shared request checks. Returns (error_response, (image_size, aspect_ratio, candidate_count))."""
+        self._count("requests")
+
+        rejected = self._check_key() or self._check_key_quota()
+        if rejected is not None:
+            return rejected, None
+
+        body = request.get_json(silent=True) or {}
+        try:
+            options = self._parse_generation(body)
+        except PermissionError as e:
+            return self.error_response(403, str(e)), None
+        except ValueError as e:
+            return self.error_response(400, str(e)), None
+
+        return None, options
+
+    def _response_json(self, model_id: str, candidates: List[Dict], image_b64: Optional[str]) -> str:
+        body = json.dumps({
+            "candidates": candidates,
+            "usageMetadata": {
+                "promptTokenCount": 12,
+                "candidatesTokenCount": 1290,
+                "totalTokenCount": 1302
+            },
+            "modelVersion": MODEL_VERSIONS.get(model_id, model_id)
+        })
+        if image_b64 is not None:
+            body = body.replace(IMAGE_PLACEHOLDER, image_b64)
+        return body
+
+    def generate_content(self, model_id: str) -> Response:
+        """Handle POST {model}:generateContent."""
+        rejected, options = self._prepare(model_id)
+        if rejected is not None:
+            return rejected
+        image_size, aspect_ratio, candidate_count = options
+
+        time.sleep(self._sample_latency(model_id, image_size))
+
+        failure = self._inject_failure()
+        if failure is not None:
+            return failure
+
+        candidates = []
+        image_b64 = None
+        for index in range(candidate_count):
+            candidate, candidate_b64 = self._content(image_size, aspect_ratio, index)
+            candidates.append(candidate)
+            image_b64 = image_b64 or candidate_b64
+        return Response(self._response_json(model_id, candidates, image_b64), mimetype="application/json")
+
+    def list_models(self) -> Response:
+        """Handle GET /v1beta/models (paged like the real API)."""
+        rejected = self._check_key()
+        if rejected is not None:
+            return rejected
+
+        models = [
+            {
+                "name": f"models/{model_id}",
+                "displayName": model_id,
+                "supportedGenerationMethods": (
+                    ["generateContent", "batchGenerateContent", "countTokens"]
+                    if model_id in MODEL_VERSIONS else ["predict"]
+                )
+            }
+            for model_id in [*MODEL_VERSIONS, *IMAGEN_SIZES]
+            if model_id not in self.hidden_models
+        ]
+        page_size = max(1, int(request.args.get("pageSize", 50)))
+        start = int(request.args.get("pageToken") or 0)
+        body = {"models": models[start:start + page_size]}
+        if start + page_size < len(models):
+            body["nextPageToken"] = str(start + page_size)
+        self._count("list_models")
+        return jsonify(body)
+
+    def predict(self, model_id: str) -> Response:
+        """
+        Handle POST {imagen model}:predict.
+
+        Imagen takes {"instances": [{"prompt"}], "parameters": {...}} and
+        returns predictions[].bytesBase64Encoded; filtered samples are left
+        out of the list (with empty_image_rate), as the real API does.
+        """
+        self._count("requests")
+        rejected = self._check_key() or self._check_key_quota()
+        if rejected is not None:
+            return rejected
+
+        body = request.get_json(silent=True) or {}
+        parameters = body.get("parameters") or {}
+        image_size = parameters.get("imageSize", "1K")
+        aspect_ratio = parameters.get("aspectRatio", "1:1")
+        sample_count = parameters.get("sampleCount", 1)
+        if model_id not in IMAGEN_SIZES:
+            return self.error_response(404, f"models/{model_id} is not found for predict")
+        if not body.get("instances") or not body["instances"][0].get("prompt"):
+            return self.error_response(400, "instances[0].prompt is required")
+        if image_size not in IMAGEN_SIZES[model_id] or aspect_ratio not in ASPECT_RATIOS:
+            return self.error_response(400, f"Unsupported parameters: {parameters}")
+        if not 1 <= sample_count <= MAX_IMAGEN_SAMPLES:
+            return self.error_response(400, f"sampleCount must be between 1 and {MAX_IMAGEN_SAMPLES}")
+
+        time.sleep(self._sample_latency(model_id, image_size))
+
+        failure = self._inject_failure()
+        if failure is not None:
+            return failure
+
+        predictions = []
+        for _ in range(sample_count):
+            if self._random() < self.empty_image_rate:
+                self._count("empty")
+                continue
+            self._count("images")
+            predictions.append({"mimeType": "image/png", "bytesBase64Encoded": IMAGE_PLACEHOLDER})
+        response = json.dumps({"predictions": predictions})
+        if predictions:
+            response = response.replace(IMAGE_PLACEHOLDER, self.image_b64(image_size, aspect_ratio))
+        return Response(response, mimetype="application/json")
+
+    def stream_generate_content(self, model_id: str) -> Response:
+        """
+        Handle POST {model}:streamGenerateContent?alt=sse.
+
+        The text part is sent after first_event_fraction of the sampled
+        latency, the image part after the rest - like the real API, which
+        streams commentary before the finished image.
+        """
+        rejected, options = self._prepare(model_id)
+        if rejected is not None:
+            return rejected
+        image_size, aspect_ratio, _ = options
+
+        latency = self._sample_latency(model_id, image_size)
+        time.sleep(latency * self.first_event_fraction)
+
+        failure = self._inject_failure()
+        if failure is not None:
+            return failure
+
+        candidate, image_b64 = self._content(image_size, aspect_ratio)
+        parts = candidate["content"]["parts"]
+
+        def events():
+            for index, part in enumerate(parts):
+                if index == len(parts) - 1:
+                    time.sleep(latency * (1 - self.first_event_fraction))
+                event = {**candidate, "content": {"parts": [part], "role": "model"}}
+                has_image = "inlineData" in part
+                body = self._response_json(model_id, [event], image_b64 if has_image else None)
+                yield f"data: {body}\r\n\r\n"
+
+        return Response(events(), mimetype="text/event-stream")
+
+    # ------------------------------------------------------------------
+    # Files API (resumable upload) and Batch API lifecycle
+    # ------------------------------------------------------------------
+
+    def _next_id(self, prefix: str) -> str:
+        with self._store_lock:
+            self._ids += 1
+            return f"{prefix}{self._ids:06d}"
+
+    def _store_file(self, data: bytes, mime_type: str, display_name: str, host: str) -> Dict:
+        name = f"files/{self._next_id('fake')}"
+        now = time.time()
+        meta = {
+            "name": name,
+            "displayName": display_name,
+            "mimeType": mime_type,
+            "sizeBytes": str(len(data)),
+            "createTime": _rfc3339(now),
+            "expirationTime": _rfc3339(now + self.file_ttl_seconds),
+            "uri": f"{host}/v1beta/{name}",
+            "state": "ACTIVE"
+        }
+        with self._store_lock:
+            self._files[name] = {"meta": meta, "data": data, "expires": now + self.file_ttl_seconds}
+        self._count("files_uploaded")
+        return meta
+
+    def _get_file(self, name: str) -> Optional[Dict]:
+        with self._store_lock:
+            file = self._files.get(name)
+            if file is not None and file["expires"] <= time.time():
+                del self._files[name]
+                file = None
+        return file
+
+    def upload_file(self, host: str) -> Response:
+        """Resumable upload: "start" hands out an upload URL, "upload, finalize" stores bytes."""
+        command = request.headers.get("X-Goog-Upload-Command", "")
+        upload_id = request.args.get("upload_id")
+
+        if command == "start":
+            # The upload URL itself authorizes the finalize call
+            rejected = self._check_key()
+            if rejected is not None:
+                return rejected
+
+            upload_id = self._next_id("upload")
+            with self._store_lock:
+                self._uploads[upload_id] = {
+                    "mime_type": request.headers.get(
+                        "X-Goog-Upload-Header-Content-Type", "application/octet-stream"
+                    ),
+                    "display_name": (request.get_json(silent=True) or {}).get("file", {}).get(
+                        "display_name", ""
+                    )
+                }
+            response = Response(status=200)
+            response.headers["X-Goog-Upload-URL"] = (
+                f"{host}/upload/v1beta/files?upload_id={upload_id}&upload_protocol=resumable"
+            )
+            response.headers["X-Goog-Upload-Status"] = "active"
+            return response
+
+        if "finalize" in command and upload_id:
+            with self._store_lock:
+                upload = self._uploads.pop(upload_id, None)
+            if upload is None:
+                return self.error_response(404, f"Unknown upload session: {upload_id}")
+            meta = self._store_file(request.get_data(), upload["mime_type"], upload["display_name"], host)
+            return jsonify({"file": meta})
+
+        return self.error_response(400, f"Unsupported X-Goog-Upload-Command: {command}")
+
+    def create_batch(self, model_id: str) -> Response:
+        """Handle POST {model}:batchGenerateContent with a JSONL input file."""
+        rejected = self._check_key()
+        if rejected is not None:
+            return rejected
+
+        batch = (request.get_json(silent=True) or {}).get("batch", {})
+        file_name = batch.get("input_config", {}).get("file_name")
+        file = self._get_file(file_name) if file_name else None
+        if file is None:
+            return self.error_response(400, f"Input file not found: {file_name}")
+
+        name = f"batches/{self._next_id('batch')}"
+        with self._store_lock:
+            self._batches[name] = {
+                "name": name,
+                "model": f"models/{model_id}",
+                "display_name": batch.get("display_name", ""),
+                "input": file["data"],
+                "created": time.monotonic(),
+                "cancelled": False,
+                "output": None,
+                "lock": threading.Lock()
+            }
+        self._count("batches")
+        return jsonify(self._batch_resource(name, request.host_url.rstrip("/")))
+
+    def _batch_output(self, batch: Dict, host: str) -> str:
+        """Run every request of a batch (once) and store a shuffled JSONL results file."""
+        with batch["lock"]:
+            return self._run_batch_once(batch, host)
+
+    def _run_batch_once(self, batch: Dict, host: str) -> str:
+        if batch["output"] is None:
+            lines = []
+            for raw in batch["input"].splitlines():
+                if not raw.strip():
+                    continue
+                item = json.loads(raw)
+                key = item.get("key")
+                if self._random() < self.batch_error_rate:
+                    lines.append(json.dumps({
+                        "key": key,
+                        "error": {"code": 500, "message": "Internal error encountered.", "status": "INTERNAL"}
+                    }))
+                    continue
+                try:
+                    image_size, aspect_ratio, _ = self._parse_generation(item.get("request", {}))
+                except ValueError as e:
+                    lines.append(json.dumps({"key": key, "error": {"code": 400, "message": str(e)}}))
+                    continue
+                candidate, image_b64 = self._content(image_size, aspect_ratio)
+                line = json.dumps({"key": key, "response": {"candidates": [candidate]}})
+                if image_b64 is not None:
+                    line = line.replace(IMAGE_PLACEHOLDER, image_b64)
+                lines.append(line)
+
+            with self._rng_lock:
+                self._rng.shuffle(lines)
+            output = self._store_file(
+                ("\n".join(lines) + "\n").encode("utf-8"), "application/jsonl",
+                f"{batch['name']}-output", host
+            )
+            batch["output"] = output["name"]
+        return batch["output"]
+
+    def _batch_resource(self, name: str, host: str) -> Dict:
+        with self._store_lock:
+            batch = self._batches.get(name)
+        if batch is None:
+            return {}
+
+        elapsed = time.monotonic() - batch["created"]
+        if batch["cancelled"]:
+            state = "BATCH_STATE_CANCELLED"
+        elif elapsed < self.batch_pending_seconds:
+            state = "BATCH_STATE_PENDING"
+        elif elapsed < self.batch_pending_seconds + self.batch_run_seconds:
+            state = "BATCH_STATE_RUNNING"
+        else:
+            state = "BATCH_STATE_SUCCEEDED"
+
+        resource = {
+            "name": name,
+            "metadata": {
+                "@type": "type.googleapis.com/google.ai.generativelanguage.v1main.GenerateContentBatch",
+                "model": batch["model"],
+                "displayName": batch["display_name"],
+                "state": state,
+                "name": name
+            },
+            "done": state in {"BATCH_STATE_SUCCEEDED", "BATCH_STATE_CANCELLED"}
+        }
+        if state == "BATCH_STATE_SUCCEEDED":
+            responses_file = self._batch_output(batch, host)
+            resource["metadata"]["output"] = {"responsesFile": responses_file}
+            resource["response"] = {
+                "@type": "type.googleapis.com/google.ai.generativelanguage.v1main.GenerateContentBatchOutput",
+                "responsesFile": responses_file
+            }
+        return resource
+
+    def get_batch(self, name: str) -> Response:
+        rejected = self._check_key()
+        if rejected is not None:
+            return rejected
+        resource = self._batch_resource(name, request.host_url.rstrip("/"))
+        if not resource:
+            return self.error_response(404, f"Batch {name} not found")
+        return jsonify(resource)
+
+    def cancel_batch(self, name: str) -> Response:
+        with self._store_lock:
+            batch = self._batches.get(name)
+            if batch is not None and batch["output"] is None:
+                batch["cancelled"] = True
+        if batch is None:
+            return self.error_response(404, f"Batch {name} not found")
+        return jsonify({})
+
+    def create_app(self) -> Flask:
+        """Build the Flask app serving the fake API."""
+        app = Flask(__name__)
+
+        @app.route("/v1beta/models/<path:model_action>", methods=["POST"])
+        def model_action(model_action: str):
+            model_id, _, action = model_action.partition(":")
+            if action == "generateContent":
+                return self.generate_content(model_id)
+            if action == "streamGenerateContent":
+                return self.stream_generate_content(model_id)
+            if action == "batchGenerateContent":
+                return self.create_batch(model_id)
+            if action == "predict":
+                return self.predict(model_id)
+            return self.error_response(404, f"Unknown action: {action}")
+
+        @app.route("/v1beta/models", methods=["GET"])
+        def list_models():
+            return self.list_models()
+
+        @app.route("/upload/v1beta/files", methods=["POST"])
+        def upload_file():
+            return self.upload_file(request.host_url.rstrip("/"))
+
+        @app.route("/v1beta/files/<file_id>", methods=["GET"])
+        def get_file(file_id: str):
+            file = self._get_file(f"files/{file_id}")
+            if file is None:
+                return self.error_response(404, f"File files/{file_id} not found or expired")
+            return jsonify(file["meta"])
+
+        @app.route("/download/v1beta/files/<path:file_action>", methods=["GET"])
+        def download_file(file_action: str):
+            file_id, _, _ = file_action.partition(":")
+            file = self._get_file(f"files/{file_id}")
+            if file is None:
+                return self.error_response(404, f"File files/{file_id} not found or expired")
+            return Response(file["data"], mimetype=file["meta"]["mimeType"])
+
+        @app.route("/v1beta/batches/<path:batch_action>", methods=["GET", "POST"])
+        def batch_action(batch_action: str):
+            batch_id, _, action = batch_action.partition(":")
+            if request.method == "POST" and action == "cancel":
+                return self.cancel_batch(f"batches/{batch_id}")
+            return self.get_batch(f"batches/{batch_id}")
+
+        @app.route("/_fake/stats", methods=["GET"])
+        def fake_stats():
+            with self._stats_lock:
+                return jsonify(dict(self.stats))
+
+        return app
+
+    def start_in_thread(self, host: str = "127.0.0.1", port: int = 0):
+        """
+        Serve in a daemon thread (for tests and benchmarks).
+
+        Returns:
+            (server, base_url) - call server.shutdown() when done
+        """
+        server = make_server(
+            host, port, self.create_app(), threaded=True, request_handler=_QuietRequestHandler
+        )
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        return server, f"http://{host}:{server.server_port}/v1beta/models"
+
+    def serve(self, host: str = "127.0.0.1", port: int = 8090, access_log: bool = False):
+        """Serve in the foreground until interrupted."""
+        handler = WSGIRequestHandler if access_log else _QuietRequestHandler
+        server = make_server(host, port, self.create_app(), threaded=True, request_handler=handler)
+        print(f"Fake Gemini API on http://{host}:{server.server_port}/v1beta/models")
+        server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local fake Gemini image API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency", default="lognormal:4,0.35",
+                        help="Default latency spec (fixed:S, uniform:A,B, normal:M,S, lognormal:MEDIAN,SIGMA)")
+    parser.add_argument("--latency-override", action="append", default=[],
+                        metavar="KEY=SPEC",
+                        help="Per model, model/size or size latency, e.g. gemini-3-pro-image-preview/4K=lognormal:25,0.3")
+    parser.add_argument("--error-rate-429", type=float, default=0.0)
+    parser.add_argument("--error-rate-503", type=float, default=0.0)
+    parser.add_argument("--empty-image-rate", type=float, default=0.0)
+    parser.add_argument("--image-bytes", action="append", default=[], metavar="SIZE=BYTES",
+                        help="PNG size per image_size, e.g. 4K=20000000")
+    parser.add_argument("--max-candidates", type=int, default=1,
+                        help="Largest candidateCount accepted (real image models: 1)")
+    parser.add_argument("--batch-pending-seconds", type=float, default=5.0)
+    parser.add_argument("--batch-run-seconds", type=float, default=30.0)
+    parser.add_argument("--batch-error-rate", type=float, default=0.0)
+    parser.add_argument("--file-ttl-seconds", type=float, default=48 * 3600,
+                        help="Lifetime of uploaded files (real API: 48h)")
+    parser.add_argument("--key-rpm", type=int,
+                        help="Per-key requests per minute before 429 (default: unlimited)")
+    parser.add_argument("--revoked-key", action="append", default=[],
+                        help="Key to answer with 403 (repeatable)")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--access-log", action="store_true", help="Log every request")
+    args = parser.parse_args()
+
+    overrides = dict(item.split("=", 1) for item in args.latency_override)
+    image_bytes = {size: int(n) for size, n in (item.split("=", 1) for item in args.image_bytes)}
+
+    FakeGeminiServer(
+        latency=args.latency,
+        latency_overrides=overrides,
+        error_rate_429=args.error_rate_429,
+        error_rate_503=args.error_rate_503,
+        empty_image_rate=args.empty_image_rate,
+        image_bytes=image_bytes,
+        max_candidates=args.max_candidates,
+        batch_pending_seconds=args.batch_pending_seconds,
+        batch_run_seconds=args.batch_run_seconds,
+        batch_error_rate=args.batch_error_rate,
+        file_ttl_seconds=args.file_ttl_seconds,
+        key_requests_per_minute=args.key_rpm,
+        revoked_keys=args.revoked_key,
+        seed=args.seed
+    ).serve(args.host, args.port, access_log=args.access_log)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,9 +6,18 @@ This is just httpx.post() - no "functorial abstraction" jargon needed!
 """
 
 import asyncio
-import base64
+import binascii
+import contextlib
+import hashlib
+import json
+import mmap
 import os
-from typing import Optional, Dict
+import re
+import tempfile
+import threading
+import time
+from datetime import datetime
+from typing import Any, AsyncIterator, Awaitable, Dict, Iterator, List, Optional, Tuple
 import httpx
 
 
@@ -34,58 +43,118 @@ class GeminiClient:
     ASPECT_RATIOS = {"1:1", "16:9", "9:16", "4:3", "3:4"}
     IMAGE_SIZES = {"1K", "2K", "4K"}
 
-    def __init__(self, api_key: Optional[str] = None, timeout: float = 30.0):
+    # Largest candidateCount each model accepts in one call.
+    # The image models currently reject >1, so variations fall back to
+    # bounded parallel calls; raise these when a model gains support.
+    MAX_CANDIDATES = {
+        "flash": 1,
+        "pro": 1
+    }
+
+    # Imagen 4 models, served by :predict with an instances/parameters payload
+    IMAGEN_MODELS = {
+        "imagen-fast": "imagen-4.0-fast-generate-001",
+        "imagen": "imagen-4.0-generate-001",
+        "imagen-ultra": "imagen-4.0-ultra-generate-001"
+    }
+    IMAGEN_ASPECT_RATIOS = {"1:1", "3:4", "4:3", "9:16", "16:9"}
+    IMAGEN_IMAGE_SIZES = {
+        "imagen-fast": {"1K"},
+        "imagen": {"1K", "2K"},
+        "imagen-ultra": {"1K", "2K"}
+    }
+    MAX_IMAGEN_SAMPLES = 4
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        timeout: float = 30.0,
+        base_url: Optional[str] = None,
+        key_pool=None,
+        http_client: Optional[httpx.AsyncClient] = None,
+        file_cache: Optional["UploadedFileCache"] = None,
+        hooks: Optional[List] = None,
+        cassette=None,
+        catalog=None,
+        timeouts=None
+    ):
         """
         Initialize Gemini client.
 
         Args:
             api_key: Google API key (defaults to GOOGLE_API_KEY env var)
             timeout: Request timeout in seconds (default: 30.0)
+            base_url: Models endpoint root (defaults to GEMINI_BASE_URL env var,
+                      then BASE_URL). Point at src/fake_gemini_server.py for
+                      offline load testing.
+            key_pool: Optional KeyPool (see key_pool.py). Generation calls
+                      are routed to the key with the most headroom; 403/429
+                      keys are benched and the call retried on another key.
+                      Files/Batch calls stay on api_key (or the pool's first
+                      key), because those resources belong to one project.
+            http_client: Shared httpx.AsyncClient to reuse connections across
+                         GeminiClient instances (timeout is then the shared
+                         client's). It is left open by close().
+            file_cache: Optional UploadedFileCache. Reference images at or
+                        above its min_bytes are uploaded once through the
+                        Files API and sent as fileData URIs afterwards.
+                        Such calls use api_key, not the key pool (uploaded
+                        files belong to one project).
+            hooks: Objects with any of on_request/on_response/on_retry/
+                   on_error (see ClientHooks), called for every upstream
+                   attempt. With none registered, nothing extra runs.
+            cassette: Optional Cassette (see cassette.py) to record upstream
+                      responses or replay them offline with recorded timing.
+                      Not combinable with http_client.
+            catalog: Optional ModelCatalog (see model_catalog.py). Once it
+                     holds a discovered model list, calls for unavailable
+                     models or unsupported options fail locally with
+                     ValueError instead of an upstream 400/404.
+            timeouts: Optional AdaptiveTimeouts (see adaptive_timeouts.py).
+                      Image calls then get a read timeout derived from the
+                      observed latency of their (model, size, aspect) class
+                      instead of the fixed timeout, and feed it back.
         """
+        self.key_pool = key_pool
         self.api_key = api_key or os.getenv("GOOGLE_API_KEY")
+        if not self.api_key and key_pool is not None:
+            self.api_key = key_pool.keys[0]
         if not self.api_key:
             raise ValueError(
                 "API key required. Set GOOGLE_API_KEY environment variable "
                 "or pass api_key parameter."
             )
 
+        self.base_url = (base_url or os.getenv("GEMINI_BASE_URL") or self.BASE_URL).rstrip("/")
         self.timeout = timeout
-        self.client = httpx.AsyncClient(timeout=timeout)
+        if cassette is not None and http_client is not None:
+            raise ValueError("Pass either http_client or cassette, not both")
 
-    async def generate_image(
+        self._owns_client = http_client is None
+        if cassette is not None:
+            self.client = httpx.AsyncClient(timeout=timeout, transport=cassette.transport())
+        else:
+            self.client = http_client or httpx.AsyncClient(timeout=timeout)
+        self.file_cache = file_cache
+        self.hooks: List = list(hooks or [])
+        self.catalog = catalog
+        self.timeouts = timeouts
+
+    def _build_request(
         self,
         prompt: str,
-        model: str = "flash",
-        aspect_ratio: Optional[str] = None,
-        image_size: Optional[str] = None,
-        max_retries: int = 3
-    ) -> Dict:
+        model: str,
+        aspect_ratio: Optional[str],
+        image_size: Optional[str],
+        action: str = "generateContent",
+        candidate_count: int = 1,
+        reference_images: Optional[List] = None
+    ) -> Tuple[str, Dict]:
         """
-        Generate image from text prompt.
-
-        Args:
-            prompt: Text description of image to generate
-            model: "flash" (fast) or "pro" (high quality)
-            max_retries: Number of retries on failure
-
-        Returns:
-            Dictionary with:
-                - image_data: bytes (PNG image data)
-                - mime_type: str (e.g., "image/png")
-                - model: str (model used)
-                - prompt: str (original prompt)
-
-        Raises:
-            ValueError: If model is invalid
-            httpx.HTTPError: If API call fails after retries
+        Validate options and build (endpoint, payload) for one call.
 
-        Example:
-            result = await client.generate_image(
-                "professional headshot of a CEO",
-                model="flash"
-            )
-            with open("output.png", "wb") as f:
-                f.write(result["image_data"])
+        Reference images stay ReferenceImage objects inside the payload; they
+        are base64-encoded only while the body is sent (see _request_body).
         """
         # Validate model
         if model not in self.MODELS:
@@ -105,8 +174,16 @@ class GeminiClient:
                 f"Must be one of {sorted(self.IMAGE_SIZES)}"
             )
 
+        if candidate_count > self.MAX_CANDIDATES.get(model, 1):
+            raise ValueError(
+                f"Invalid candidate_count: {candidate_count}. "
+                f"Model {model} supports at most {self.MAX_CANDIDATES.get(model, 1)}"
+            )
+
         model_id = self.MODELS[model]
-        endpoint = f"{self.BASE_URL}/{model_id}:generateContent"
+        if self.catalog is not None:
+            self.catalog.validate(model_id, action, aspect_ratio, image_size, candidate_count)
+        endpoint = f"{self.base_url}/{model_id}:{action}"
 
         # Request payload
         # CRITICAL: Explicitly request IMAGE response to avoid text-only responses
@@ -121,52 +198,405 @@ class GeminiClient:
             if image_size:
                 generation_config["imageConfig"]["imageSize"] = image_size
 
+        if candidate_count > 1:
+            generation_config["candidateCount"] = candidate_count
+
+        parts = [{"text": prompt}]
+        for image in reference_images or []:
+            parts.append({"inlineData": ReferenceImage.coerce(image)})
+
         payload = {
             "contents": [{
-                "parts": [{"text": prompt}]
+                "parts": parts
             }],
             "generation_config": generation_config
         }
 
-        # Retry loop with exponential backoff
-        for attempt in range(max_retries):
+        return endpoint, payload
+
+    async def _post_streaming(
+        self,
+        endpoint: str,
+        payload: Dict,
+        sink_for,
+        attempt: int = 1,
+        data_key=None
+    ) -> Dict:
+        """
+        POST payload and stream the body through an _InlineDataExtractor.
+
+        Returns the parsed response with inlineData strings emptied; the
+        decoded images went to sink_for(index).
+        """
+        timeout_key, timeout = self._read_timeout(endpoint, payload)
+        payload, uploaded = await self._resolve_files(payload)
+        body = _request_body(payload)
+        try:
+            with self._observe(endpoint.rsplit(":", 1)[-1], endpoint, body, attempt) as event:
+                async with self._api_key(pinned=bool(uploaded)) as key:
+                    wait = _ReadWait()
+                    async with self.client.stream(
+                        "POST",
+                        endpoint,
+                        params={"key": key},
+                        timeout=timeout,
+                        **body
+                    ) as response:
+                        wait.tick()
+                        if response.is_error:
+                            await response.aread()
+                        response.raise_for_status()
+
+                        extractor = _InlineDataExtractor(sink_for, data_key)
+                        async for chunk in response.aiter_bytes():
+                            wait.tick()
+                            extractor.feed(chunk)
+                        if event is not None:
+                            event["status"] = response.status_code
+                            event["response_bytes"] = response.num_bytes_downloaded
+                        result = extractor.finish()
+                    self._observe_wait(timeout_key, wait.longest)
+                    return result
+        except httpx.ReadTimeout:
+            self._observe_wait(timeout_key, None, timeout)
+            raise
+        except httpx.HTTPStatusError as e:
+            self._forget_files(uploaded, e)
+            raise
+
+    def add_hook(self, hook):
+        """Register an instrumentation hook (see ClientHooks)."""
+        self.hooks.append(hook)
+
+    def _emit(self, name: str, event: Dict):
+        for hook in self.hooks:
+            method = getattr(hook, name, None)
+            if method is None:
+                continue
             try:
-                response = await self.client.post(
-                    endpoint,
-                    params={"key": self.api_key},
-                    json=payload,
-                    headers={"Content-Type": "application/json"}
+                method(dict(event))
+            except Exception as e:
+                # Instrumentation must never break generation
+                print(f"Hook {type(hook).__name__}.{name} failed: {e}")
+
+    def _observe(self, call: str, url, body: Optional[Dict], attempt: int):
+        """
+        Context manager emitting on_request, then on_response or on_error.
+
+        Yields a dict the caller fills with status/response_bytes, or None
+        (via a shared no-op context) when no hooks are registered.
+        """
+        if not self.hooks:
+            return _NO_HOOKS
+        return self._observed(call, url, body, attempt)
+
+    @contextlib.contextmanager
+    def _observed(self, call: str, url, body: Optional[Dict], attempt: int):
+        length = (body or {}).get("headers", {}).get("Content-Length")
+        event = {
+            "call": call,
+            "model": _model_from_url(url),
+            "url": str(url),
+            "attempt": attempt,
+            "payload_bytes": int(length) if length else 0
+        }
+        self._emit("on_request", event)
+        start = time.perf_counter()
+        try:
+            yield event
+        except Exception as e:
+            event["elapsed"] = time.perf_counter() - start
+            event["status"] = (
+                e.response.status_code if isinstance(e, httpx.HTTPStatusError) else None
+            )
+            event["error"] = e
+            self._emit("on_error", event)
+            raise
+        event["elapsed"] = time.perf_counter() - start
+        self._emit("on_response", event)
+
+    def _read_timeout(self, endpoint: str, payload: Dict):
+        """
+        (class key, per-request timeout) for an image call.
+
+        The key is (model_id, image_size, aspect_ratio); without adaptive
+        timeouts (or while the class is cold) the client's timeout applies.
+        """
+        if self.timeouts is None:
+            return None, httpx.USE_CLIENT_DEFAULT
+        config = payload.get("generation_config") or {}
+        options = config.get("imageConfig") or payload.get("parameters") or {}
+        key = (_model_from_url(endpoint), options.get("imageSize"), options.get("aspectRatio"))
+        read = self.timeouts.timeout_for(key)
+        if read is None:
+            return key, httpx.USE_CLIENT_DEFAULT
+        return key, httpx.Timeout(self.timeout, read=read)
+
+    def _observe_wait(self, key, longest: Optional[float], timeout=None):
+        """Feed a finished call (or, with longest None, a read timeout) back."""
+        if key is None:
+            return
+        if longest is not None:
+            self.timeouts.observe(key, longest)
+            return
+        hit = timeout.read if isinstance(timeout, httpx.Timeout) else self.timeout
+        if hit is not None:
+            self.timeouts.observe(key, hit, timed_out=True)
+
+    async def _resolve_files(self, payload: Dict) -> Tuple[Dict, List[str]]:
+        """
+        Swap large inline reference images for Files API URIs (uploading on a cache miss).
+
+        Returns (payload, cache keys used); the payload is copied, never
+        modified, so every retry resolves afresh.
+        """
+        if self.file_cache is None:
+            return payload, []
+
+        used = []
+        contents = []
+        for content in payload["contents"]:
+            parts = []
+            for part in content["parts"]:
+                image = part.get("inlineData")
+                if isinstance(image, ReferenceImage) and image.size >= self.file_cache.min_bytes:
+                    key, file = await self._upload_cached(image)
+                    used.append(key)
+                    part = {"fileData": {"mimeType": image.mime_type, "fileUri": file["uri"]}}
+                parts.append(part)
+            contents.append({**content, "parts": parts})
+
+        if not used:
+            return payload, []
+        return {**payload, "contents": contents}, used
+
+    async def _upload_cached(self, image: "ReferenceImage") -> Tuple[str, Dict]:
+        """Cached Files API resource for an image, uploading it at most once at a time."""
+        key = self.file_cache.cache_key(self.api_key, image.sha256())
+        file = self.file_cache.get(key)
+        if file is not None:
+            return key, file
+
+        async with self.file_cache.uploading(key):
+            file = self.file_cache.get(key, count=False)
+            if file is None:
+                file = await self.upload_file(
+                    image, image.mime_type, display_name=f"nanobanana-ref-{key[-12:]}"
                 )
+                self.file_cache.put(key, file)
+        return key, file
+
+    def _forget_files(self, keys: List[str], error: httpx.HTTPStatusError):
+        """Drop cached URIs the API refused (expired or deleted early) so a retry re-uploads."""
+        if keys and error.response.status_code in (400, 403, 404):
+            for key in keys:
+                self.file_cache.discard(key)
+
+    @contextlib.asynccontextmanager
+    async def _api_key(self, pinned: bool = False):
+        """
+        Lease a key for one upstream call.
+
+        Without a pool (or when pinned) this is just api_key. With a pool, the
+        chosen key is reported back with the call's HTTP status so 403/429
+        keys get benched.
+        """
+        if self.key_pool is None or pinned:
+            yield self.api_key
+            return
+
+        key, wait = self.key_pool.acquire()
+        if wait:
+            await asyncio.sleep(wait)
+
+        status = 200
+        retry_after = None
+        try:
+            yield key
+        except httpx.HTTPStatusError as e:
+            status = e.response.status_code
+            retry_after = _retry_delay(e.response)
+            raise
+        except httpx.HTTPError:
+            status = None
+            raise
+        finally:
+            self.key_pool.release(key, status, retry_after)
+
+    async def _retry_wait(self, attempt: int, max_retries: int, error: Exception):
+        """Exponential backoff between attempts (skipped when another pool key is ready)."""
+        status = error.response.status_code if isinstance(error, httpx.HTTPStatusError) else None
+        if self.key_pool is not None and status in (403, 429) and self.key_pool.available():
+            wait_time = 0
+        else:
+            wait_time = 2 ** attempt
+
+        if self.hooks:
+            try:
+                model = _model_from_url(error.request.url)
+            except (AttributeError, RuntimeError):  # error without a request attached
+                model = None
+            self._emit("on_retry", {
+                "model": model,
+                "attempt": attempt + 1,
+                "max_retries": max_retries,
+                "wait": wait_time,
+                "status": status,
+                "error": error
+            })
+
+        print(f"API call failed (attempt {attempt + 1}/{max_retries}): {error}")
+        if not wait_time:
+            print("Retrying now with another API key...")
+            return
+        print(f"Retrying in {wait_time} seconds...")
+        await asyncio.sleep(wait_time)
+
+    async def generate_image(
+        self,
+        prompt: str,
+        model: str = "flash",
+        aspect_ratio: Optional[str] = None,
+        image_size: Optional[str] = None,
+        max_retries: int = 3,
+        reference_images: Optional[List] = None
+    ) -> Dict:
+        """
+        Generate image from text prompt.
+
+        Args:
+            prompt: Text description of image to generate
+            model: "flash" (fast) or "pro" (high quality)
+            max_retries: Number of retries on failure
+            reference_images: Input images for edits or style references -
+                              file paths, bytes, memoryviews, binary files
+                              or ReferenceImage(source, mime_type)
+
+        Returns:
+            Dictionary with:
+                - image_data: bytes (PNG image data)
+                - mime_type: str (e.g., "image/png")
+                - model: str (model used)
+                - prompt: str (original prompt)
+
+        Raises:
+            ValueError: If model is invalid
+            httpx.HTTPError: If API call fails after retries
+
+        Example:
+            result = await client.generate_image(
+                "professional headshot of a CEO",
+                model="flash"
+            )
+            with open("output.png", "wb") as f:
+                f.write(result["image_data"])
+        """
+        buffer = bytearray()
+        result = await self.generate_image_into(
+            prompt,
+            buffer,
+            model=model,
+            aspect_ratio=aspect_ratio,
+            image_size=image_size,
+            max_retries=max_retries,
+            reference_images=reference_images
+        )
+
+        return {
+            "image_data": bytes(buffer),
+            "mime_type": result["mime_type"],
+            "model": model,
+            "prompt": prompt,
+            "aspect_ratio": aspect_ratio,
+            "image_size": image_size
+        }
+
+    async def generate_image_into(
+        self,
+        prompt: str,
+        sink,
+        model: str = "flash",
+        aspect_ratio: Optional[str] = None,
+        image_size: Optional[str] = None,
+        max_retries: int = 3,
+        reference_images: Optional[List] = None
+    ) -> Dict:
+        """
+        Generate image and stream the decoded bytes into a sink.
+
+        The HTTP body is scanned as it arrives: the base64 in inlineData.data
+        is decoded chunk by chunk and written to the sink, so neither the
+        multi-MB JSON string nor the base64 text is ever held in memory.
+
+        Args:
+            prompt: Text description of image to generate
+            sink: bytearray, binary file object (anything with write()),
+                  or socket (anything with sendall())
+            model: "flash" (fast) or "pro" (high quality)
+            max_retries: Number of retries on failure. Retries rewind
+                         bytearrays and seekable files; for other sinks a
+                         failure after bytes were written is re-raised.
+            reference_images: Input images (see generate_image)
+
+        Returns:
+            Dictionary with:
+                - mime_type: str (e.g., "image/png")
+                - bytes_written: int
+                - text: str (model commentary, may be empty)
+                - model, prompt, aspect_ratio, image_size
+
+        Example:
+            with open("output.png", "wb") as f:
+                await client.generate_image_into("a red ball", f)
+        """
+        endpoint, payload = self._build_request(
+            prompt, model, aspect_ratio, image_size, reference_images=reference_images
+        )
+        write = _sink_writer(sink)
+        start = _sink_position(sink)
 
-                response.raise_for_status()
-                data = response.json()
+        # Retry loop with exponential backoff
+        for attempt in range(max_retries):
+            written = 0
+
+            def sink_for(index: int):
+                # Only the first image goes to the sink; any others are skipped
+                if index != 0:
+                    return None
+
+                def counted(chunk: bytes):
+                    nonlocal written
+                    written += len(chunk)
+                    write(chunk)
+                return counted
+
+            try:
+                data = await self._post_streaming(endpoint, payload, sink_for, attempt + 1)
 
                 # Extract image from response
                 # Note: API may return multiple parts (text + image)
                 # We need to find the part with inlineData
                 parts = data["candidates"][0]["content"]["parts"]
 
-                image_b64 = None
                 mime_type = None
+                text = []
 
                 for part in parts:
-                    if "inlineData" in part:
-                        image_b64 = part["inlineData"]["data"]
+                    if "inlineData" in part and mime_type is None:
                         mime_type = part["inlineData"]["mimeType"]
-                        break
+                    elif "text" in part:
+                        text.append(part["text"])
 
-                if not image_b64:
+                if not written:
                     raise ValueError(
                         f"No image data found in response. "
                         f"API returned {len(parts)} parts but none contained inlineData"
                     )
 
-                # Decode base64
-                image_bytes = base64.b64decode(image_b64)
-
                 return {
-                    "image_data": image_bytes,
                     "mime_type": mime_type,
+                    "bytes_written": written,
+                    "text": "".join(text),
                     "model": model,
                     "prompt": prompt,
                     "aspect_ratio": aspect_ratio,
@@ -178,53 +608,1497 @@ class GeminiClient:
                 if attempt == max_retries - 1:
                     raise  # Last attempt, give up
 
+                if written and not _rewind_sink(sink, start):
+                    raise  # Partial image already sent somewhere we can't undo
+
                 # Exponential backoff
-                wait_time = 2 ** attempt
-                print(f"API call failed (attempt {attempt + 1}/{max_retries}): {e}")
-                print(f"Retrying in {wait_time} seconds...")
-                await asyncio.sleep(wait_time)
+                await self._retry_wait(attempt, max_retries, e)
 
-    async def generate_and_save(
+    async def generate_images(
         self,
         prompt: str,
-        output_path: str,
-        model: str = "flash"
-    ) -> str:
+        n: int = 4,
+        model: str = "flash",
+        aspect_ratio: Optional[str] = None,
+        image_size: Optional[str] = None,
+        max_concurrent: int = 4,
+        max_retries: int = 3,
+        reference_images: Optional[List] = None
+    ) -> List[Dict]:
         """
-        Generate image and save to file (convenience method).
+        Generate n variations of one prompt.
+
+        Asks for up to MAX_CANDIDATES[model] candidates per call and spreads
+        the rest over parallel calls (at most max_concurrent in flight).
+        Every image part of every candidate is returned, not just the first.
 
         Args:
-            prompt: Text description
-            output_path: Where to save image
-            model: "flash" or "pro"
+            prompt: Text description of image to generate
+            n: Number of images wanted
+            model: "flash" (fast) or "pro" (high quality)
+            max_concurrent: Upper bound on simultaneous upstream calls
+            max_retries: Number of retries per call
+            reference_images: Input images sent with every call (see generate_image)
 
         Returns:
-            Path to saved file
+            List of up to n dictionaries shaped like generate_image() results.
+            Calls that fail or come back without an image are skipped; if no
+            call produced an image, the first error is raised.
 
         Example:
-            path = await client.generate_and_save(
-                "sunset over mountains",
-                "sunset.png",
-                model="pro"
+            variations = await client.generate_images("logo for a bakery", n=6)
+            for i, result in enumerate(variations):
+                with open(f"logo-{i}.png", "wb") as f:
+                    f.write(result["image_data"])
+        """
+        if n < 1:
+            raise ValueError(f"Invalid n: {n}. Must be at least 1")
+
+        per_call = max(1, min(n, self.MAX_CANDIDATES.get(model, 1)))
+        semaphore = asyncio.Semaphore(max_concurrent)
+
+        async def one_call(count: int) -> List[Dict]:
+            async with semaphore:
+                return await self._generate_candidates(
+                    prompt, count, model, aspect_ratio, image_size, max_retries,
+                    reference_images
+                )
+
+        counts = [per_call] * (n // per_call)
+        if n % per_call:
+            counts.append(n % per_call)
+
+        outcomes = await asyncio.gather(
+            *(one_call(count) for count in counts), return_exceptions=True
+        )
+        images = [image for outcome in outcomes if isinstance(outcome, list) for image in outcome]
+        errors = [outcome for outcome in outcomes if isinstance(outcome, BaseException)]
+
+        # Multi-candidate calls may return fewer images than asked; top up once
+        missing = n - len(images)
+        if missing > 0 and per_call > 1 and not errors:
+            topped_up = await asyncio.gather(
+                *(one_call(1) for _ in range(missing)), return_exceptions=True
             )
-            print(f"Saved to {path}")
+            images += [image for outcome in topped_up if isinstance(outcome, list) for image in outcome]
+            errors += [outcome for outcome in topped_up if isinstance(outcome, BaseException)]
+
+        if not images:
+            if errors:
+                raise errors[0]
+            raise ValueError(f"No image data found in {len(counts)} responses")
+
+        return images[:n]
+
+    async def _generate_candidates(
+        self,
+        prompt: str,
+        candidate_count: int,
+        model: str,
+        aspect_ratio: Optional[str],
+        image_size: Optional[str],
+        max_retries: int,
+        reference_images: Optional[List] = None
+    ) -> List[Dict]:
+        """One call asking for candidate_count candidates; returns every image part."""
+        endpoint, payload = self._build_request(
+            prompt, model, aspect_ratio, image_size,
+            candidate_count=candidate_count, reference_images=reference_images
+        )
+
+        for attempt in range(max_retries):
+            buffers: List[bytearray] = []
+
+            def sink_for(index: int):
+                buffer = bytearray()
+                buffers.append(buffer)
+                return buffer.extend
+
+            try:
+                data = await self._post_streaming(endpoint, payload, sink_for, attempt + 1)
+            except httpx.HTTPError as e:
+                if attempt == max_retries - 1:
+                    raise
+
+                await self._retry_wait(attempt, max_retries, e)
+                continue
+
+            mime_types = [
+                part["inlineData"].get("mimeType")
+                for candidate in data.get("candidates", [])
+                for part in candidate.get("content", {}).get("parts", [])
+                if "inlineData" in part
+            ]
+
+            return [
+                {
+                    "image_data": bytes(buffer),
+                    "mime_type": mime_type,
+                    "model": model,
+                    "prompt": prompt,
+                    "aspect_ratio": aspect_ratio,
+                    "image_size": image_size
+                }
+                for buffer, mime_type in zip(buffers, mime_types)
+                if buffer
+            ]
+
+    async def predict_images(
+        self,
+        prompt: str,
+        model: str = "imagen",
+        n: int = 1,
+        aspect_ratio: Optional[str] = None,
+        image_size: Optional[str] = None,
+        max_retries: int = 3
+    ) -> List[Dict]:
         """
-        result = await self.generate_image(prompt, model)
+        Generate images with an Imagen model via :predict.
 
-        with open(output_path, "wb") as f:
-            f.write(result["image_data"])
+        Imagen takes {"instances": [{"prompt"}], "parameters": {...}} and
+        answers with predictions[].bytesBase64Encoded; the base64 is decoded
+        while streaming, like generateContent responses.
 
-        return output_path
+        Args:
+            prompt: Text description of image to generate
+            model: "imagen-fast", "imagen" or "imagen-ultra"
+            n: Images in one call (1 to MAX_IMAGEN_SAMPLES)
+            image_size: "1K" or "2K" (imagen-fast: 1K only)
+            max_retries: Number of retries on failure
 
-    async def close(self):
-        """Close HTTP client"""
-        await self.client.aclose()
+        Returns:
+            List of dictionaries shaped like generate_image() results
 
-    async def __aenter__(self):
-        return self
+        Raises:
+            ValueError: Invalid options, or every image was filtered
+        """
+        if model not in self.IMAGEN_MODELS:
+            raise ValueError(
+                f"Invalid model: {model}. Must be one of {list(self.IMAGEN_MODELS.keys())}"
+            )
+        if not 1 <= n <= self.MAX_IMAGEN_SAMPLES:
+            raise ValueError(f"Invalid n: {n}. Must be between 1 and {self.MAX_IMAGEN_SAMPLES}")
+        if aspect_ratio and aspect_ratio not in self.IMAGEN_ASPECT_RATIOS:
+            raise ValueError(
+                f"Invalid aspect_ratio: {aspect_ratio}. "
+                f"Must be one of {sorted(self.IMAGEN_ASPECT_RATIOS)}"
+            )
+        if image_size and image_size not in self.IMAGEN_IMAGE_SIZES[model]:
+            raise ValueError(
+                f"Invalid image_size: {image_size}. "
+                f"Model {model} supports {sorted(self.IMAGEN_IMAGE_SIZES[model])}"
+            )
 
-    async def __aexit__(self, exc_type, exc_val, exc_tb):
-        await self.close()
+        if self.catalog is not None:
+            self.catalog.validate(self.IMAGEN_MODELS[model], "predict", aspect_ratio, image_size, n)
+        endpoint = f"{self.base_url}/{self.IMAGEN_MODELS[model]}:predict"
+        parameters = {"sampleCount": n}
+        if aspect_ratio:
+            parameters["aspectRatio"] = aspect_ratio
+        if image_size:
+            parameters["imageSize"] = image_size
+        payload = {"instances": [{"prompt": prompt}], "parameters": parameters}
+
+        for attempt in range(max_retries):
+            buffers: List[bytearray] = []
+
+            def sink_for(index: int):
+                buffer = bytearray()
+                buffers.append(buffer)
+                return buffer.extend
+
+            try:
+                data = await self._post_streaming(
+                    endpoint, payload, sink_for, attempt + 1,
+                    data_key=_InlineDataExtractor.PREDICT_DATA_KEY
+                )
+            except httpx.HTTPError as e:
+                if attempt == max_retries - 1:
+                    raise
+
+                await self._retry_wait(attempt, max_retries, e)
+                continue
+
+            predictions = [p for p in data.get("predictions", []) if "bytesBase64Encoded" in p]
+            results = [
+                {
+                    "image_data": bytes(buffer),
+                    "mime_type": prediction.get("mimeType", "image/png"),
+                    "model": model,
+                    "prompt": prompt,
+                    "aspect_ratio": aspect_ratio,
+                    "image_size": image_size
+                }
+                for buffer, prediction in zip(buffers, predictions)
+                if buffer
+            ]
+            if not results:
+                raise ValueError(
+                    "No image data found in response "
+                    "(all predictions were filtered or empty)"
+                )
+            return results
+
+    async def stream_image(
+        self,
+        prompt: str,
+        model: str = "flash",
+        aspect_ratio: Optional[str] = None,
+        image_size: Optional[str] = None,
+        max_retries: int = 3,
+        reference_images: Optional[List] = None
+    ) -> AsyncIterator[Dict]:
+        """
+        Generate image via :streamGenerateContent (SSE), yielding parts as they arrive.
+
+        Text commentary is yielded as soon as its event lands, and image bytes
+        are decoded and yielded while the (multi-MB) image event is still
+        being received.
+
+        Args:
+            prompt: Text description of image to generate
+            model: "flash" (fast) or "pro" (high quality)
+            max_retries: Retries before the first event; once anything has
+                         been yielded, failures are raised
+            reference_images: Input images (see generate_image)
+
+        Yields:
+            {"type": "text", "text": str}
+            {"type": "image_chunk", "index": int, "data": bytes}
+            {"type": "image_end", "index": int, "mime_type": str, "bytes": int}
+
+        Example:
+            async for event in client.stream_image("a red ball"):
+                if event["type"] == "image_chunk":
+                    out.write(event["data"])
+        """
+        endpoint, payload = self._build_request(
+            prompt, model, aspect_ratio, image_size,
+            action="streamGenerateContent", reference_images=reference_images
+        )
+
+        timeout_key, timeout = self._read_timeout(endpoint, payload)
+        for attempt in range(max_retries):
+            yielded = False
+            uploaded: List[str] = []
+            try:
+                resolved, uploaded = await self._resolve_files(payload)
+                body = _request_body(resolved)
+                with self._observe("streamGenerateContent", endpoint, body, attempt + 1) as observed:
+                    async with self._api_key(pinned=bool(uploaded)) as key:
+                        wait = _ReadWait()
+                        async with self.client.stream(
+                            "POST",
+                            endpoint,
+                            params={"key": key, "alt": "sse"},
+                            timeout=timeout,
+                            **body
+                        ) as response:
+                            wait.tick()
+                            if response.is_error:
+                                await response.aread()
+                            response.raise_for_status()
+
+                            parser = _SSEImageParser()
+                            async for chunk in response.aiter_bytes():
+                                wait.tick()
+                                for event in parser.feed(chunk):
+                                    yielded = True
+                                    yield event
+                            for event in parser.finish():
+                                yielded = True
+                                yield event
+                            if observed is not None:
+                                observed["status"] = response.status_code
+                                observed["response_bytes"] = response.num_bytes_downloaded
+                        self._observe_wait(timeout_key, wait.longest)
+                return
+
+            except httpx.HTTPError as e:
+                if isinstance(e, httpx.HTTPStatusError):
+                    self._forget_files(uploaded, e)
+                if isinstance(e, httpx.ReadTimeout):
+                    self._observe_wait(timeout_key, None, timeout)
+                if yielded or attempt == max_retries - 1:
+                    raise
+
+                await self._retry_wait(attempt, max_retries, e)
+
+    async def generate_and_save(
+        self,
+        prompt: str,
+        output_path: str,
+        model: str = "flash",
+        aspect_ratio: Optional[str] = None,
+        image_size: Optional[str] = None,
+        reference_images: Optional[List] = None
+    ) -> str:
+        """
+        Generate image and save to file (convenience method).
+
+        Decoded bytes are streamed straight to disk (via a .part file that is
+        renamed on success), so the image is never held in memory.
+
+        Args:
+            prompt: Text description
+            output_path: Where to save image
+            model: "flash" or "pro"
+            reference_images: Input images (see generate_image)
+
+        Returns:
+            Path to saved file
+
+        Example:
+            path = await client.generate_and_save(
+                "sunset over mountains",
+                "sunset.png",
+                model="pro"
+            )
+            print(f"Saved to {path}")
+        """
+        partial_path = f"{output_path}.part"
+        try:
+            with open(partial_path, "wb") as f:
+                await self.generate_image_into(
+                    prompt,
+                    f,
+                    model=model,
+                    aspect_ratio=aspect_ratio,
+                    image_size=image_size,
+                    reference_images=reference_images
+                )
+            os.replace(partial_path, output_path)
+        finally:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+
+        return output_path
+
+    # ------------------------------------------------------------------
+    # Files API + Batch API (asynchronous, half-price, no per-minute limits)
+    # ------------------------------------------------------------------
+
+    BATCH_DONE_STATES = {"SUCCEEDED", "FAILED", "CANCELLED", "EXPIRED"}
+
+    def _api_url(self, path: str, prefix: str = "") -> str:
+        """
+        Build an API URL next to base_url.
+
+        base_url is ".../v1beta/models"; prefix "upload"/"download" gives the
+        media roots (".../upload/v1beta/...").
+        """
+        url = httpx.URL(self.base_url)
+        version_path = url.path.rsplit("/models", 1)[0]
+        if prefix:
+            version_path = f"/{prefix}{version_path}"
+        return str(url.copy_with(path=f"{version_path}/{path}", query=None))
+
+    async def _call_json(
+        self,
+        method: str,
+        url: str,
+        max_retries: int = 3,
+        **kwargs
+    ) -> httpx.Response:
+        """Small control-plane call (JSON in/out) with the usual retry/backoff."""
+        params = kwargs.pop("params", None) or {}
+        for attempt in range(max_retries):
+            try:
+                with self._observe(method, url, None, attempt + 1) as event:
+                    response = await self.client.request(
+                        method, url, params={**params, "key": self.api_key}, **kwargs
+                    )
+                    response.raise_for_status()
+                    if event is not None:
+                        event["status"] = response.status_code
+                        event["response_bytes"] = len(response.content)
+                return response
+
+            except httpx.HTTPError as e:
+                if attempt == max_retries - 1:
+                    raise
+
+                await self._retry_wait(attempt, max_retries, e)
+
+    async def list_models(self, page_size: int = 1000) -> List[Dict]:
+        """
+        List the models this API key can use (GET /v1beta/models, all pages).
+
+        Returns:
+            Model resources: name, displayName, supportedGenerationMethods, ...
+        """
+        models: List[Dict] = []
+        params = {"pageSize": page_size}
+        while True:
+            response = await self._call_json("GET", self.base_url, params=params)
+            data = response.json()
+            models.extend(data.get("models", []))
+            if not data.get("nextPageToken"):
+                return models
+            params = {"pageSize": page_size, "pageToken": data["nextPageToken"]}
+
+    async def upload_file(
+        self,
+        data,
+        mime_type: str,
+        display_name: Optional[str] = None
+    ) -> Dict:
+        """
+        Upload through the Files API (resumable protocol, one chunk).
+
+        Args:
+            data: bytes, or a ReferenceImage (streamed from its mmap/memoryview)
+
+        Returns:
+            File resource: name ("files/..."), uri, mimeType, expirationTime, ...
+        """
+        if isinstance(data, ReferenceImage):
+            size, content = data.size, data.iter_raw_async()
+        else:
+            size, content = len(data), data
+
+        start = await self._call_json(
+            "POST",
+            self._api_url("files", prefix="upload"),
+            headers={
+                "X-Goog-Upload-Protocol": "resumable",
+                "X-Goog-Upload-Command": "start",
+                "X-Goog-Upload-Header-Content-Length": str(size),
+                "X-Goog-Upload-Header-Content-Type": mime_type
+            },
+            json={"file": {"display_name": display_name or "nanobanana-upload"}}
+        )
+        upload_url = start.headers["X-Goog-Upload-URL"]
+
+        # Not retried: a failed finalize means starting a new upload session
+        response = await self.client.post(
+            upload_url,
+            headers={
+                "X-Goog-Upload-Command": "upload, finalize",
+                "X-Goog-Upload-Offset": "0",
+                "Content-Length": str(size)
+            },
+            content=content
+        )
+        response.raise_for_status()
+        return response.json()["file"]
+
+    async def submit_batch(
+        self,
+        prompts: List[str],
+        model: str = "flash",
+        aspect_ratio: Optional[str] = None,
+        image_size: Optional[str] = None,
+        display_name: Optional[str] = None
+    ) -> Dict:
+        """
+        Submit prompts as one Batch API job.
+
+        Builds a JSONL of requests keyed "request-<index>", uploads it and
+        starts :batchGenerateContent. Results come back in any order; use
+        iter_batch_results() to demultiplex them to input indexes.
+
+        Returns:
+            Batch resource (name "batches/...", metadata.state, ...)
+
+        Example:
+            batch = await client.submit_batch(catalog_prompts, model="flash")
+            batch = await client.wait_for_batch(batch["name"])
+            async for index, result in client.iter_batch_results(batch):
+                ...
+        """
+        if not prompts:
+            raise ValueError("prompts must be a non-empty list")
+
+        lines = []
+        for index, prompt in enumerate(prompts):
+            endpoint, payload = self._build_request(prompt, model, aspect_ratio, image_size)
+            lines.append(json.dumps({"key": f"request-{index}", "request": payload}))
+        jsonl = ("\n".join(lines) + "\n").encode("utf-8")
+
+        input_file = await self.upload_file(
+            jsonl, "application/jsonl", display_name=f"{display_name or 'nanobanana-batch'}-input"
+        )
+
+        model_id = self.MODELS[model]
+        response = await self._call_json(
+            "POST",
+            f"{self.base_url}/{model_id}:batchGenerateContent",
+            json={
+                "batch": {
+                    "display_name": display_name or "nanobanana-batch",
+                    "input_config": {"file_name": input_file["name"]}
+                }
+            }
+        )
+        return response.json()
+
+    async def get_batch(self, name: str) -> Dict:
+        """Fetch a batch resource ("batches/...")."""
+        response = await self._call_json("GET", self._api_url(name))
+        return response.json()
+
+    async def cancel_batch(self, name: str) -> None:
+        """Cancel a pending or running batch."""
+        await self._call_json("POST", self._api_url(f"{name}:cancel"))
+
+    @staticmethod
+    def batch_state(batch: Dict) -> str:
+        """Batch state without its prefix: PENDING, RUNNING, SUCCEEDED, FAILED, ..."""
+        state = batch.get("metadata", {}).get("state") or batch.get("state", "")
+        return state.rsplit("_STATE_", 1)[-1]
+
+    async def wait_for_batch(
+        self,
+        name: str,
+        poll_interval: float = 10.0,
+        max_poll_interval: float = 300.0,
+        backoff: float = 1.5,
+        timeout: Optional[float] = None
+    ) -> Dict:
+        """
+        Poll a batch until it finishes, backing off between polls.
+
+        Args:
+            name: Batch name ("batches/...")
+            poll_interval: First wait in seconds
+            max_poll_interval: Upper bound for the wait between polls
+            backoff: Multiplier applied to the wait after each poll
+            timeout: Give up (TimeoutError) after this many seconds
+
+        Returns:
+            Final batch resource (check batch_state() for SUCCEEDED)
+        """
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        interval = poll_interval
+
+        while True:
+            batch = await self.get_batch(name)
+            if self.batch_state(batch) in self.BATCH_DONE_STATES or batch.get("done"):
+                return batch
+
+            if deadline is not None and loop.time() + interval > deadline:
+                raise TimeoutError(f"Batch {name} still {self.batch_state(batch)} after {timeout}s")
+
+            await asyncio.sleep(interval)
+            interval = min(interval * backoff, max_poll_interval)
+
+    async def iter_batch_results(self, batch: Dict) -> AsyncIterator[Tuple[int, Dict]]:
+        """
+        Stream a finished batch's results file, yielding (input_index, result).
+
+        The results file is read line by line, so memory stays at one image
+        regardless of batch size. Each result is shaped like generate_image()
+        output (image_data, mime_type) or {"error": ...} for failed items.
+        """
+        if self.batch_state(batch) != "SUCCEEDED":
+            raise ValueError(f"Batch {batch.get('name')} is {self.batch_state(batch)}, not SUCCEEDED")
+
+        output = batch.get("response") or batch.get("metadata", {}).get("output", {})
+        responses_file = output.get("responsesFile")
+        if not responses_file:
+            raise ValueError(f"Batch {batch.get('name')} has no responsesFile")
+
+        async with self.client.stream(
+            "GET",
+            self._api_url(f"{responses_file}:download", prefix="download"),
+            params={"key": self.api_key, "alt": "media"}
+        ) as response:
+            if response.is_error:
+                await response.aread()
+            response.raise_for_status()
+
+            parser = _BatchResultsParser()
+            async for chunk in response.aiter_bytes():
+                for result in parser.feed(chunk):
+                    yield result
+            for result in parser.finish():
+                yield result
+
+    async def fetch_batch_results(self, batch: Dict, count: int) -> List[Dict]:
+        """
+        Collect all results in input order (index i -> prompts[i]).
+
+        Items missing from the results file come back as {"error": ...}.
+        Holds every image in memory; prefer iter_batch_results() for big jobs.
+        """
+        results: List[Dict] = [{"error": "missing from batch results"} for _ in range(count)]
+        async for index, result in self.iter_batch_results(batch):
+            if 0 <= index < count:
+                results[index] = result
+        return results
+
+    async def close(self):
+        """Close HTTP client (unless it was passed in as http_client)"""
+        if self._owns_client:
+            await self.client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+
+class BackgroundLoop:
+    """
+    An asyncio event loop running in a daemon thread.
+
+    Lets sync code (scripts, Flask/gunicorn worker threads) run coroutines on
+    one long-lived loop, so connection pools bound to that loop are reused
+    across calls instead of being rebuilt per call. Thread-safe; the thread
+    starts on first use.
+    """
+
+    def __init__(self, name: str = "gemini-loop"):
+        self.name = name
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name=self.name, daemon=True)
+                thread.start()
+                self._loop, self._thread = loop, thread
+            return self._loop
+
+    def run(self, coro: Awaitable, timeout: Optional[float] = None) -> Any:
+        """Run a coroutine on the loop and block until it finishes."""
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        try:
+            return future.result(timeout)
+        except BaseException:
+            future.cancel()
+            raise
+
+    def iterate(self, agen) -> Iterator:
+        """Drive an async generator on the loop, yielding its items synchronously."""
+        try:
+            while True:
+                try:
+                    yield self.run(agen.__anext__())
+                except StopAsyncIteration:
+                    break
+        finally:
+            self.run(agen.aclose())
+
+    def stop(self):
+        """Stop the loop and join its thread (a later call starts a new one)."""
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        if loop is None:
+            return
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+
+class SyncGeminiClient:
+    """
+    Blocking, thread-safe facade over GeminiClient.
+
+    Owns a BackgroundLoop and one GeminiClient (one connection pool), so
+    scripts and worker threads get pooled, concurrent upstream access
+    without managing asyncio.
+
+    Example:
+        with SyncGeminiClient() as client:
+            result = client.generate_image("a cute banana on a beach", model="pro")
+            results = client.generate_many(["a red ball", "a blue cube"], max_concurrent=2)
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        timeout: float = 30.0,
+        base_url: Optional[str] = None,
+        key_pool=None,
+        max_connections: int = 20,
+        file_cache: Optional["UploadedFileCache"] = None,
+        hooks: Optional[List] = None
+    ):
+        """
+        Initialize sync client (arguments as for GeminiClient).
+
+        Args:
+            max_connections: Size of the shared upstream connection pool
+        """
+        http_client = httpx.AsyncClient(
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections
+            )
+        )
+        self.client = GeminiClient(
+            api_key=api_key,
+            timeout=timeout,
+            base_url=base_url,
+            key_pool=key_pool,
+            http_client=http_client,
+            file_cache=file_cache,
+            hooks=hooks
+        )
+        self._http_client = http_client
+        self._loop = BackgroundLoop()
+
+    def run(self, coro: Awaitable, timeout: Optional[float] = None) -> Any:
+        """Run any GeminiClient coroutine (e.g. client.submit_batch(...)) and block."""
+        return self._loop.run(coro, timeout)
+
+    def generate_image(self, prompt: str, **kwargs) -> Dict:
+        """Blocking GeminiClient.generate_image (same arguments and result)."""
+        return self.run(self.client.generate_image(prompt, **kwargs))
+
+    def generate_and_save(self, prompt: str, output_path: str, **kwargs) -> str:
+        """Blocking GeminiClient.generate_and_save."""
+        return self.run(self.client.generate_and_save(prompt, output_path, **kwargs))
+
+    def generate_images(self, prompt: str, n: int = 4, **kwargs) -> List[Dict]:
+        """Blocking GeminiClient.generate_images (variations of one prompt)."""
+        return self.run(self.client.generate_images(prompt, n, **kwargs))
+
+    def generate_many(
+        self,
+        prompts: List[str],
+        max_concurrent: int = 4,
+        return_exceptions: bool = False,
+        **kwargs
+    ) -> List:
+        """
+        Generate one image per prompt concurrently, results in input order.
+
+        Args:
+            prompts: Text prompts
+            max_concurrent: Upstream calls in flight at once
+            return_exceptions: Put exceptions in the result list instead of
+                               raising the first one
+            **kwargs: Passed to generate_image (model, aspect_ratio, ...)
+        """
+        async def run_all():
+            semaphore = asyncio.Semaphore(max(1, max_concurrent))
+
+            async def one(prompt):
+                async with semaphore:
+                    return await self.client.generate_image(prompt, **kwargs)
+
+            return await asyncio.gather(
+                *(one(prompt) for prompt in prompts), return_exceptions=return_exceptions
+            )
+
+        return self.run(run_all())
+
+    def close(self):
+        """Close the connection pool and stop the background loop."""
+        try:
+            self.run(self._http_client.aclose())
+        finally:
+            self._loop.stop()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class ReferenceImage:
+    """
+    An input image (edit source or style reference) sent as inlineData.
+
+    Nothing is read up front beyond a few header bytes: files are
+    memory-mapped and base64-encoded in chunks while the request body is
+    being sent, so a multi-MB reference costs one chunk of Python memory
+    instead of several full-size bytes/str copies per call.
+
+    Example:
+        await client.generate_image(
+            "put this logo on a coffee cup",
+            reference_images=["logo.png", ReferenceImage(jpeg_bytes, "image/jpeg")]
+        )
+    """
+
+    # Multiple of 3 so every chunk encodes to whole base64 quads
+    CHUNK_SIZE = 3 * 64 * 1024
+
+    SIGNATURES = (
+        (b"\x89PNG\r\n\x1a\n", "image/png"),
+        (b"\xff\xd8\xff", "image/jpeg"),
+        (b"GIF87a", "image/gif"),
+        (b"GIF89a", "image/gif"),
+    )
+
+    def __init__(self, source, mime_type: Optional[str] = None):
+        """
+        Args:
+            source: File path, bytes/bytearray/memoryview, or a binary file
+                    object (BytesIO, open file, upload stream)
+            mime_type: Defaults to sniffing the header bytes
+        """
+        self.source = source
+        self._sha256: Optional[str] = None
+        if isinstance(source, (str, os.PathLike)):
+            self.size = os.path.getsize(source)
+            with open(source, "rb") as f:
+                header = f.read(16)
+        else:
+            with self._view() as view:
+                self.size = len(view)
+                header = bytes(view[:16])
+
+        if not self.size:
+            raise ValueError("Reference image is empty")
+
+        self.mime_type = mime_type or self.sniff_mime_type(header)
+        if not self.mime_type:
+            raise ValueError("Unrecognized reference image format; pass mime_type")
+
+    @classmethod
+    def coerce(cls, image) -> "ReferenceImage":
+        return image if isinstance(image, cls) else cls(image)
+
+    @classmethod
+    def sniff_mime_type(cls, header: bytes) -> Optional[str]:
+        for signature, mime_type in cls.SIGNATURES:
+            if header.startswith(signature):
+                return mime_type
+        if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+            return "image/webp"
+        if header[4:12] in (b"ftypheic", b"ftypheix", b"ftypmif1"):
+            return "image/heic"
+        return None
+
+    @property
+    def encoded_size(self) -> int:
+        return 4 * ((self.size + 2) // 3)
+
+    @contextlib.contextmanager
+    def _view(self):
+        """Zero-copy memoryview of the image bytes (mmap for files)."""
+        source = self.source
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            with memoryview(source) as view:
+                yield view.cast("B")
+            return
+
+        if isinstance(source, (str, os.PathLike)):
+            with open(source, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                with memoryview(mm) as view:
+                    yield view
+            return
+
+        getbuffer = getattr(source, "getbuffer", None)
+        if getbuffer is not None:
+            with getbuffer() as view:
+                yield view
+            return
+
+        fileno = source.fileno()  # (rolls a SpooledTemporaryFile over to disk)
+        if hasattr(source, "flush"):
+            source.flush()  # buffered writes must reach the file before mmap
+        with mmap.mmap(fileno, 0, access=mmap.ACCESS_READ) as mm:
+            with memoryview(mm) as view:
+                yield view
+
+    def iter_base64(self):
+        """Base64 of the image in CHUNK_SIZE slices (bytes, no newlines)."""
+        with self._view() as view:
+            for start in range(0, len(view), self.CHUNK_SIZE):
+                yield binascii.b2a_base64(view[start:start + self.CHUNK_SIZE], newline=False)
+
+    async def iter_raw_async(self):
+        """Raw image bytes in CHUNK_SIZE slices, as an httpx request body."""
+        with self._view() as view:
+            for start in range(0, len(view), self.CHUNK_SIZE):
+                yield bytes(view[start:start + self.CHUNK_SIZE])
+
+    def sha256(self) -> str:
+        """Hex SHA-256 of the image bytes (computed once)."""
+        if self._sha256 is None:
+            digest = hashlib.sha256()
+            with self._view() as view:
+                for start in range(0, len(view), self.CHUNK_SIZE):
+                    digest.update(view[start:start + self.CHUNK_SIZE])
+            self._sha256 = digest.hexdigest()
+        return self._sha256
+
+
+class UploadedFileCache:
+    """
+    Files API resources for reference images, keyed by content hash.
+
+    Brand kits reuse the same logos and style references across thousands
+    of calls; with a cache, each unique image is uploaded once and later
+    calls send its URI. Entries expire with the file (expirationTime, 48h
+    on the real API) minus refresh_margin_seconds, after which the next
+    call re-uploads. Optionally persisted as JSON so separate processes
+    (CLI runs, workers) share uploads.
+
+    Example:
+        cache = UploadedFileCache(path=".nanobanana_files.json")
+        client = GeminiClient(file_cache=cache)
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        min_bytes: int = 256 * 1024,
+        refresh_margin_seconds: float = 3600.0,
+        default_ttl_seconds: float = 48 * 3600
+    ):
+        """
+        Initialize cache.
+
+        Args:
+            path: JSON file to load/save entries (None = in memory only)
+            min_bytes: Smaller references stay inline (an upload round trip
+                       costs more than it saves)
+            refresh_margin_seconds: Treat files as expired this long before
+                                    their expirationTime
+            default_ttl_seconds: Lifetime assumed when the API omits expirationTime
+        """
+        self.path = path
+        self.min_bytes = min_bytes
+        self.refresh_margin_seconds = refresh_margin_seconds
+        self.default_ttl_seconds = default_ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.uploads = 0
+        self._entries: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        # In-flight uploads: key -> (lock, callers holding or waiting for it)
+        self._uploading: Dict[str, Tuple[asyncio.Lock, int]] = {}
+
+        if path:
+            self._entries = self._read()
+
+    @classmethod
+    def from_env(cls) -> Optional["UploadedFileCache"]:
+        """
+        Build a cache from GEMINI_FILE_CACHE, if set.
+
+        "memory" keeps entries in process; anything else is a JSON path.
+        """
+        setting = os.getenv("GEMINI_FILE_CACHE")
+        if not setting:
+            return None
+        return cls(path=None if setting == "memory" else setting)
+
+    @staticmethod
+    def cache_key(api_key: str, digest: str) -> str:
+        """Files belong to the uploading project, so entries are per key."""
+        return f"{hashlib.sha256(api_key.encode()).hexdigest()[:12]}:{digest}"
+
+    def get(self, key: str, count: bool = True) -> Optional[Dict]:
+        """Cached file resource, or None if missing or about to expire."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry["expires_at"] - self.refresh_margin_seconds <= time.time():
+                del self._entries[key]
+                entry = None
+            if count:
+                if entry is None:
+                    self.misses += 1
+                else:
+                    self.hits += 1
+            return entry["file"] if entry else None
+
+    @contextlib.asynccontextmanager
+    async def uploading(self, key: str):
+        """
+        Hold the upload slot for key.
+
+        Every client sharing this cache queues on the same lock, so concurrent
+        requests upload a new image once; the lock is dropped with its last user.
+        """
+        with self._lock:
+            lock, users = self._uploading.get(key, (None, 0))
+            if lock is None:
+                lock = asyncio.Lock()
+            self._uploading[key] = (lock, users + 1)
+        try:
+            async with lock:
+                yield
+        finally:
+            with self._lock:
+                users = self._uploading[key][1] - 1
+                if users:
+                    self._uploading[key] = (lock, users)
+                else:
+                    del self._uploading[key]
+
+    def put(self, key: str, file: Dict):
+        expires_at = _parse_rfc3339(file.get("expirationTime"))
+        if expires_at is None:
+            expires_at = time.time() + self.default_ttl_seconds
+        with self._lock:
+            self._entries[key] = {"file": file, "expires_at": expires_at}
+            self.uploads += 1
+            self._save()
+
+    def discard(self, key: str):
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self._save(dropped=key)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "uploads": self.uploads
+            }
+
+    def _read(self) -> Dict[str, Dict]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return entries if isinstance(entries, dict) else {}
+
+    def _save(self, dropped: Optional[str] = None):
+        # Caller holds the lock. Other processes sharing the file may have
+        # saved uploads since we loaded it: merge in their live entries
+        # (except the one being dropped) before replacing the file.
+        if not self.path:
+            return
+        cutoff = time.time() + self.refresh_margin_seconds
+        for key, entry in self._read().items():
+            if key != dropped and key not in self._entries and entry.get("expires_at", 0) > cutoff:
+                self._entries[key] = entry
+
+        # A temp file per writer, renamed into place so readers never see half a file
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".files-", suffix=".part")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(self._entries, f)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+
+def _parse_rfc3339(value: Optional[str]) -> Optional[float]:
+    """Epoch seconds from an RFC 3339 timestamp ("2025-01-01T00:00:00.123456789Z")."""
+    if not value:
+        return None
+    value = re.sub(r"(\.\d{6})\d+", r"\1", value).replace("Z", "+00:00")
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        return None
+
+
+def _request_body(payload: Dict) -> Dict:
+    """
+    httpx keyword arguments for a JSON payload.
+
+    Plain payloads are serialized once to bytes. Payloads holding
+    ReferenceImage objects are serialized around them and streamed, with the
+    images encoded on the fly. Both carry an exact Content-Length (no
+    chunked encoding), which hooks report as payload_bytes.
+    """
+    images: List[ReferenceImage] = []
+    token = os.urandom(8).hex()
+
+    def placeholder(obj):
+        if isinstance(obj, ReferenceImage):
+            images.append(obj)
+            return {"mimeType": obj.mime_type, "data": f"{token}:{len(images) - 1}"}
+        raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+    text = json.dumps(payload, default=placeholder)
+    if not images:
+        body = text.encode("utf-8")
+        return {
+            "content": body,
+            "headers": {"Content-Type": "application/json", "Content-Length": str(len(body))}
+        }
+
+    pieces = re.split(f"{token}:(\\d+)", text)
+    segments = []
+    for i, piece in enumerate(pieces):
+        segments.append(images[int(piece)] if i % 2 else piece.encode("utf-8"))
+
+    length = sum(
+        segment.encoded_size if isinstance(segment, ReferenceImage) else len(segment)
+        for segment in segments
+    )
+
+    async def body():
+        for segment in segments:
+            if isinstance(segment, ReferenceImage):
+                for chunk in segment.iter_base64():
+                    yield chunk
+            else:
+                yield segment
+
+    return {
+        "content": body(),
+        "headers": {"Content-Type": "application/json", "Content-Length": str(length)}
+    }
+
+
+class ClientHooks:
+    """
+    Base class for GeminiClient instrumentation (override what you need).
+
+    Every method receives one event dict:
+        on_request:  call, model, url, attempt, payload_bytes
+        on_response: ... + status, elapsed (seconds), response_bytes
+        on_error:    ... + status (None for transport errors), elapsed, error
+        on_retry:    model, attempt, max_retries, wait (seconds), status, error
+
+    Hooks run inline on the event loop, so keep them cheap; exceptions are
+    printed and otherwise ignored.
+
+    Example:
+        class LatencyLog(ClientHooks):
+            def on_response(self, event):
+                print(f"{event['model']} {event['status']} {event['elapsed']:.2f}s")
+
+        client = GeminiClient(hooks=[LatencyLog()])
+    """
+
+    def on_request(self, event: Dict):
+        pass
+
+    def on_response(self, event: Dict):
+        pass
+
+    def on_retry(self, event: Dict):
+        pass
+
+    def on_error(self, event: Dict):
+        pass
+
+
+# Shared do-nothing context for _observe when no hooks are registered
+_NO_HOOKS = contextlib.nullcontext()
+
+
+def _model_from_url(url) -> Optional[str]:
+    """Model id from ".../models/<model>:<action>" URLs (None for other calls)."""
+    path = str(url).split("?", 1)[0]
+    if "/models/" not in path:
+        return None
+    return path.rsplit("/models/", 1)[1].split(":", 1)[0]
+
+
+class _ReadWait:
+    """Longest gap spent waiting for response data (what a read timeout bounds)."""
+
+    __slots__ = ("longest", "_last")
+
+    def __init__(self):
+        self.longest = 0.0
+        self._last = time.perf_counter()
+
+    def tick(self):
+        now = time.perf_counter()
+        if now - self._last > self.longest:
+            self.longest = now - self._last
+        self._last = now
+
+
+class _InlineDataExtractor:
+    """
+    Incremental scanner for a streamed generateContent JSON body.
+
+    Every inlineData "data" string is base64-decoded as it arrives and handed
+    to sink_for(index) (None skips that image). Everything else is kept as a
+    small "skeleton" document - the same JSON with the image strings emptied -
+    which finish() parses normally for mimeType, text parts, etc.
+
+    The key pattern can't match inside a JSON string value, because quotes
+    there are always escaped.
+    """
+
+    DATA_KEY = re.compile(rb'"data"\s*:\s*"')
+    # Imagen :predict responses carry predictions[].bytesBase64Encoded instead
+    PREDICT_DATA_KEY = re.compile(rb'"bytesBase64Encoded"\s*:\s*"')
+    # Longest possible partial match kept between chunks while searching
+    KEEP_TAIL = 64
+
+    def __init__(self, sink_for, data_key=None):
+        self.sink_for = sink_for
+        self.data_key = data_key or self.DATA_KEY
+        self.skeleton = bytearray()
+        self._search = b""
+        self._in_data = False
+        self._write = None
+        self._pending = b""
+        self._images = 0
+
+    def feed(self, chunk: bytes):
+        while chunk:
+            if self._in_data:
+                end = chunk.find(b'"')
+                if end == -1:
+                    self._decode(chunk)
+                    return
+                self._decode(chunk[:end])
+                self._end_image()
+                chunk = chunk[end:]
+            else:
+                self._search += chunk
+                match = self.data_key.search(self._search)
+                if match is None:
+                    keep = self._search[-self.KEEP_TAIL:]
+                    self.skeleton += self._search[:-self.KEEP_TAIL]
+                    self._search = keep
+                    return
+                self.skeleton += self._search[:match.end()]
+                chunk = self._search[match.end():]
+                self._search = b""
+                self._start_image()
+
+    def _start_image(self):
+        self._in_data = True
+        self._write = self.sink_for(self._images)
+        self._pending = b""
+
+    def _end_image(self):
+        if self._write and self._pending:
+            self._write(binascii.a2b_base64(self._pending))
+        self._in_data = False
+        self._write = None
+        self._pending = b""
+        self._images += 1
+
+    def _decode(self, segment: bytes):
+        if self._write is None:
+            return
+        # JSON may escape "/" as "\/"
+        if b"\\" in segment:
+            segment = segment.translate(None, b"\\")
+        data = self._pending + segment if self._pending else segment
+        usable = len(data) - len(data) % 4
+        self._pending = data[usable:]
+        if usable:
+            self._write(binascii.a2b_base64(data[:usable]))
+
+    def finish(self) -> Dict:
+        """Parse the skeleton once the body has been fully fed."""
+        if self._in_data:
+            raise ValueError("Truncated response: inlineData string never closed")
+        self.skeleton += self._search
+        self._search = b""
+        return json.loads(bytes(self.skeleton))
+
+
+class _SSEImageParser:
+    """
+    Incremental parser for :streamGenerateContent?alt=sse bodies.
+
+    Each "data:" line is one GenerateContentResponse chunk. The line is fed to
+    an _InlineDataExtractor while it is still arriving, so image bytes are
+    emitted before the (multi-MB) line is complete.
+    """
+
+    def __init__(self):
+        self._line = b""
+        self._extractor = None
+        self._events = []
+        self._image_index = 0
+        self._image_bytes = 0
+
+    def _on_image_chunk(self, chunk: bytes):
+        self._image_bytes += len(chunk)
+        self._events.append({"type": "image_chunk", "index": self._image_index, "data": chunk})
+
+    def _end_line(self):
+        data = self._extractor.finish()
+        self._extractor = None
+        for candidate in data.get("candidates", []):
+            for part in candidate.get("content", {}).get("parts", []):
+                if "inlineData" in part:
+                    self._events.append({
+                        "type": "image_end",
+                        "index": self._image_index,
+                        "mime_type": part["inlineData"].get("mimeType"),
+                        "bytes": self._image_bytes
+                    })
+                    self._image_index += 1
+                    self._image_bytes = 0
+                elif "text" in part:
+                    self._events.append({"type": "text", "text": part["text"]})
+
+    def feed(self, chunk: bytes) -> List[Dict]:
+        while chunk:
+            if self._extractor is not None:
+                end = chunk.find(b"\n")
+                if end == -1:
+                    self._extractor.feed(chunk)
+                    break
+                self._extractor.feed(chunk[:end])
+                self._end_line()
+                chunk = chunk[end + 1:]
+                continue
+
+            self._line += chunk
+            chunk = b""
+            if self._line.startswith(b"data:"):
+                chunk = self._line[len(b"data:"):]
+                self._line = b""
+                self._extractor = _InlineDataExtractor(lambda index: self._on_image_chunk)
+            elif len(self._line) >= len(b"data:") or b"\n" in self._line:
+                # event:/id:/comment/blank line - skip to the next line
+                end = self._line.find(b"\n")
+                if end == -1:
+                    break
+                chunk = self._line[end + 1:]
+                self._line = b""
+
+        events, self._events = self._events, []
+        return events
+
+    def finish(self) -> List[Dict]:
+        """Flush a final data line that had no trailing newline."""
+        if self._extractor is not None:
+            self._end_line()
+        events, self._events = self._events, []
+        return events
+
+
+class _BatchResultsParser:
+    """
+    Incremental parser for a Batch API results file (JSON Lines).
+
+    Each line is fed to an _InlineDataExtractor while it is still arriving,
+    like _SSEImageParser, so a line's multi-MB base64 image is decoded as it
+    streams in instead of being buffered as text, and every chunk is
+    searched for newlines once. Blank lines are skipped.
+    """
+
+    def __init__(self):
+        self._extractor = None
+        self._image: Optional[bytearray] = None
+        self._results: List[Tuple[int, Dict]] = []
+
+    def _sink_for(self, index: int):
+        if index != 0:
+            return None
+        self._image = bytearray()
+        return self._image.extend
+
+    def _end_line(self):
+        if self._extractor is None:
+            return
+        data = self._extractor.finish()
+        self._extractor = None
+        self._results.append(_batch_result(data, self._image))
+        self._image = None
+
+    def feed(self, chunk: bytes) -> List[Tuple[int, Dict]]:
+        """Feed the next chunk; returns the (input_index, result) of every line it completes."""
+        start = 0
+        while start < len(chunk):
+            end = chunk.find(b"\n", start)
+            piece = chunk[start:] if end == -1 else chunk[start:end]
+            if self._extractor is None and piece and not piece.isspace():
+                self._extractor = _InlineDataExtractor(self._sink_for)
+            if self._extractor is not None and piece:
+                self._extractor.feed(piece)
+            if end == -1:
+                break
+            self._end_line()
+            start = end + 1
+
+        results, self._results = self._results, []
+        return results
+
+    def finish(self) -> List[Tuple[int, Dict]]:
+        """Flush a final line that had no trailing newline."""
+        self._end_line()
+        results, self._results = self._results, []
+        return results
+
+
+def _batch_result(data: Dict, image: Optional[bytearray]) -> Tuple[int, Dict]:
+    """(input_index, result) for one parsed Batch API results line and its first image."""
+    suffix = data.get("key", "").rsplit("-", 1)[-1]
+    index = int(suffix) if suffix.isdigit() else -1
+
+    if "error" in data:
+        return index, {"error": data["error"].get("message", str(data["error"]))}
+
+    parts = [
+        part
+        for candidate in data.get("response", {}).get("candidates", [])
+        for part in candidate.get("content", {}).get("parts", [])
+    ]
+    mime_type = next(
+        (part["inlineData"].get("mimeType") for part in parts if "inlineData" in part), None
+    )
+    if not image:
+        return index, {"error": f"No image data found in response ({len(parts)} parts)"}
+
+    return index, {"image_data": bytes(image), "mime_type": mime_type}
+
+
+def _retry_delay(response: httpx.Response) -> Optional[float]:
+    """Seconds from a Retry-After header or a google.rpc.RetryInfo retryDelay ("30s")."""
+    header = response.headers.get("Retry-After")
+    if header and header.replace(".", "", 1).isdigit():
+        return float(header)
+    try:
+        details = response.json().get("error", {}).get("details", [])
+    except (ValueError, AttributeError, httpx.ResponseNotRead):
+        return None
+    for detail in details:
+        delay = detail.get("retryDelay") if isinstance(detail, dict) else None
+        if isinstance(delay, str) and delay.endswith("s"):
+            try:
+                return float(delay[:-1])
+            except ValueError:
+                return None
+    return None
+
+
+def _sink_writer(sink):
+    if isinstance(sink, bytearray):
+        return sink.extend
+    if hasattr(sink, "write"):
+        return sink.write
+    if hasattr(sink, "sendall"):
+        return sink.sendall
+    raise TypeError(
+        f"Unsupported sink: {type(sink).__name__}. "
+        f"Use a bytearray, binary file or socket"
+    )
+
+
+def _sink_position(sink) -> Optional[int]:
+    if isinstance(sink, bytearray):
+        return len(sink)
+    try:
+        if sink.seekable():
+            return sink.tell()
+    except (AttributeError, OSError):
+        pass
+    return None
+
+
+def _rewind_sink(sink, position: Optional[int]) -> bool:
+    """Drop bytes written by a failed attempt. Returns False if impossible."""
+    if position is None:
+        return False
+    if isinstance(sink, bytearray):
+        del sink[position:]
+    else:
+        sink.seek(position)
+        sink.truncate()
+    return True
 
 
 # Convenience function for simple usage
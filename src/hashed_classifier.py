@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+Hashed Classifier - Learned domain classifier on hashed n-gram features
+
+Keyword substring matching misroutes prompts whose keywords hide inside
+other words ("shot" in "screenshot", "art" in "architecture"). This is a
+small multinomial logistic regression over hashed word unigrams, word
+bigrams and character n-grams, in plain NumPy: trained offline from a
+labeled prompt file, saved as a compact .npz (only the feature rows seen in
+training) and loaded at startup. Inference is one gather over a few hundred
+weight rows - tens of microseconds per prompt.
+
+Features are hashed with CRC32, not hash(), so a model trained in one
+process scores identically in every other one. Like keyword matching, only
+a prompt's scan_window (its first 16 KB) is featurized.
+
+Labeled file: .jsonl with {"prompt": "...", "domain": "..."} per line, or
+.tsv/.txt with "domain<TAB>prompt" per line (blank lines and # comments
+skipped).
+
+Usage:
+    python src/hashed_classifier.py train labeled.jsonl models/domain.npz
+    python src/hashed_classifier.py eval labeled.jsonl models/domain.npz
+
+    DOMAIN_CLASSIFIER_MODEL=models/domain.npz  # DomainClassifier uses it
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import zlib
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from keyword_matcher import scan_window
+
+try:
+    import numpy as np
+except ImportError:  # only needed once a model is trained or loaded
+    np = None
+
+_WORD = re.compile(r"\w+")
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("HashedClassifier requires numpy (pip install numpy)")
+
+
+def read_labeled(path: str) -> Tuple[List[str], List[str]]:
+    """(prompts, domains) from a labeled .jsonl or tab-separated file."""
+    prompts, labels = [], []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if path.endswith(".jsonl"):
+                item = json.loads(line)
+                prompt, label = item["prompt"], item["domain"]
+            else:
+                label, _, prompt = line.partition("\t")
+            prompts.append(prompt)
+            labels.append(label)
+    return prompts, labels
+
+
+class HashedClassifier:
+    """
+    Linear softmax classifier over hashed n-gram features.
+
+    Example:
+        model = HashedClassifier.train(prompts, domains)
+        model.save("models/domain.npz")
+        model = HashedClassifier.load("models/domain.npz")
+        model.classify_with_confidence("UI screenshot of the login flow")
+        # Returns: ("diagrams", 0.93)
+    """
+
+    def __init__(
+        self,
+        classes: Sequence[str],
+        weights,
+        bias,
+        n_features: int = 1 << 18,
+        char_ngrams: Tuple[int, int] = (3, 5)
+    ):
+        """
+        Initialize model (use train() or load() rather than calling this).
+
+        Args:
+            classes: Class names, in weight column order
+            weights: float32 array (n_features x classes)
+            bias: float32 array (classes,)
+            n_features: Hash space size
+            char_ngrams: (shortest, longest) character n-gram
+        """
+        _require_numpy()
+        self.classes: List[str] = list(classes)
+        self.weights = np.asarray(weights, dtype=np.float32)
+        self.bias = np.asarray(bias, dtype=np.float32)
+        self.n_features = n_features
+        self.char_ngrams = tuple(char_ngrams)
+        # Words repeat across prompts; hash each one once
+        self._word_features = lru_cache(maxsize=1 << 16)(self._hash_word)
+
+    @classmethod
+    def from_env(cls) -> Optional["HashedClassifier"]:
+        """Load the model at DOMAIN_CLASSIFIER_MODEL, if set."""
+        path = os.getenv("DOMAIN_CLASSIFIER_MODEL")
+        if not path:
+            return None
+        return cls.load(path)
+
+    def _hash(self, feature: str) -> int:
+        return zlib.crc32(feature.encode("utf-8")) % self.n_features
+
+    def _hash_word(self, word: str) -> Tuple[int, ...]:
+        shortest, longest = self.char_ngrams
+        padded = f" {word} "
+        features = [self._hash("w:" + word)]
+        for size in range(shortest, longest + 1):
+            features.extend(
+                self._hash("c:" + padded[i:i + size])
+                for i in range(len(padded) - size + 1)
+            )
+        return tuple(features)
+
+    def features(self, prompt: str):
+        """(feature indexes, L2-normalized counts) of one prompt."""
+        words = _WORD.findall(scan_window(prompt).casefold())
+        counts: Dict[int, float] = {}
+        for word in words:
+            for index in self._word_features(word):
+                counts[index] = counts.get(index, 0.0) + 1.0
+        for first, second in zip(words, words[1:]):
+            index = self._hash(f"b:{first} {second}")
+            counts[index] = counts.get(index, 0.0) + 1.0
+
+        indexes = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        values = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+        if len(values):
+            values /= np.sqrt(values @ values)
+        return indexes, values
+
+    def _matrix(self, prompts: Sequence[str]):
+        """Sparse prompts x features as (rows, indexes, values) arrays."""
+        rows, indexes, values = [], [], []
+        for row, prompt in enumerate(prompts):
+            prompt_indexes, prompt_values = self.features(prompt)
+            rows.append(np.full(len(prompt_indexes), row, dtype=np.int64))
+            indexes.append(prompt_indexes)
+            values.append(prompt_values)
+        if not rows:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty, np.zeros(0, dtype=np.float32)
+        return np.concatenate(rows), np.concatenate(indexes), np.concatenate(values)
+
+    def probabilities(self, prompt: str):
+        """Class probabilities for one prompt (in self.classes order)."""
+        indexes, values = self.features(prompt)
+        logits = self.bias + values @ self.weights[indexes]
+        exp = np.exp(logits - logits.max())
+        return exp / exp.sum()
+
+    def classify_with_confidence(self, prompt: str) -> Tuple[str, float]:
+        """(class, probability) of the most likely class."""
+        probabilities = self.probabilities(prompt)
+        best = int(probabilities.argmax())
+        return self.classes[best], float(probabilities[best])
+
+    def classify_many(self, prompts: Sequence[str]) -> List[Tuple[str, float]]:
+        """classify_with_confidence() for many prompts, in input order."""
+        rows, indexes, values = self._matrix(prompts)
+        logits = np.tile(self.bias, (len(prompts), 1))
+        np.add.at(logits, rows, values[:, None] * self.weights[indexes])
+        logits -= logits.max(axis=1, keepdims=True)
+        probabilities = np.exp(logits)
+        probabilities /= probabilities.sum(axis=1, keepdims=True)
+        best = probabilities.argmax(axis=1)
+        confidence = probabilities[np.arange(len(prompts)), best]
+        return [(self.classes[b], float(c)) for b, c in zip(best.tolist(), confidence.tolist())]
+
+    @classmethod
+    def train(
+        cls,
+        prompts: Sequence[str],
+        labels: Sequence[str],
+        n_features: int = 1 << 18,
+        char_ngrams: Tuple[int, int] = (3, 5),
+        epochs: int = 300,
+        learning_rate: float = 0.1,
+        l2: float = 1e-4
+    ) -> "HashedClassifier":
+        """
+        Fit softmax regression with full-batch Adam.
+
+        Only feature rows that occur in the training prompts are optimized
+        (the rest stay zero), so training cost scales with the data, not
+        with n_features.
+
+        Args:
+            prompts: Training prompts
+            labels: Class of each prompt
+            n_features: Hash space size
+            char_ngrams: (shortest, longest) character n-gram
+            epochs: Gradient steps over the whole set
+            learning_rate: Adam step size
+            l2: Weight decay
+        """
+        _require_numpy()
+        if len(prompts) != len(labels) or not prompts:
+            raise ValueError("Need as many labels as prompts, and at least one of each")
+
+        classes = sorted(set(labels))
+        model = cls(classes, np.zeros((0, len(classes))), np.zeros(len(classes)),
+                    n_features=n_features, char_ngrams=char_ngrams)
+        rows, indexes, values = model._matrix(prompts)
+        used, columns = np.unique(indexes, return_inverse=True)
+
+        class_index = {name: i for i, name in enumerate(classes)}
+        target = np.zeros((len(prompts), len(classes)))
+        target[np.arange(len(prompts)), [class_index[label] for label in labels]] = 1.0
+
+        weights = np.zeros((len(used), len(classes)))
+        bias = np.log(target.mean(axis=0))  # start from the class priors
+        params = [weights, bias]
+        moments = [[np.zeros_like(p), np.zeros_like(p)] for p in params]
+        beta1, beta2, eps = 0.9, 0.999, 1e-8
+
+        for step in range(1, epochs + 1):
+            logits = np.tile(bias, (len(prompts), 1))
+            np.add.at(logits, rows, values[:, None] * weights[columns])
+            logits -= logits.max(axis=1, keepdims=True)
+            probabilities = np.exp(logits)
+            probabilities /= probabilities.sum(axis=1, keepdims=True)
+            error = (probabilities - target) / len(prompts)
+
+            grad_weights = l2 * weights
+            np.add.at(grad_weights, columns, values[:, None] * error[rows])
+            grads = [grad_weights, error.sum(axis=0)]
+
+            for param, grad, (m, v) in zip(params, grads, moments):
+                m *= beta1
+                m += (1 - beta1) * grad
+                v *= beta2
+                v += (1 - beta2) * grad * grad
+                param -= learning_rate * (m / (1 - beta1 ** step)) / (np.sqrt(v / (1 - beta2 ** step)) + eps)
+
+        model.weights = np.zeros((n_features, len(classes)), dtype=np.float32)
+        model.weights[used] = weights
+        model.bias = bias.astype(np.float32)
+        return model
+
+    def save(self, path: str):
+        """Write the model as .npz, keeping only non-zero feature rows."""
+        used = np.flatnonzero(np.any(self.weights != 0, axis=1))
+        tmp_path = f"{path}.part"
+        with open(tmp_path, "wb") as f:
+            np.savez_compressed(
+                f,
+                classes=np.array(self.classes),
+                rows=used.astype(np.int32),
+                weights=self.weights[used],
+                bias=self.bias,
+                n_features=np.int64(self.n_features),
+                char_ngrams=np.array(self.char_ngrams, dtype=np.int64)
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "HashedClassifier":
+        _require_numpy()
+        with np.load(path, allow_pickle=False) as data:
+            n_features = int(data["n_features"])
+            classes = data["classes"].tolist()
+            weights = np.zeros((n_features, len(classes)), dtype=np.float32)
+            weights[data["rows"]] = data["weights"]
+            return cls(
+                classes,
+                weights,
+                data["bias"],
+                n_features=n_features,
+                char_ngrams=tuple(int(n) for n in data["char_ngrams"])
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train or evaluate the hashed domain classifier")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name in ("train", "eval"):
+        p = sub.add_parser(name)
+        p.add_argument("labeled", help=".jsonl or domain<TAB>prompt file")
+        p.add_argument("model", help=".npz model path")
+    sub.choices["train"].add_argument("--features", type=int, default=1 << 18)
+    sub.choices["train"].add_argument("--epochs", type=int, default=300)
+    args = parser.parse_args()
+
+    prompts, labels = read_labeled(args.labeled)
+    if not prompts:
+        sys.exit(f"No labeled prompts in {args.labeled}")
+
+    if args.command == "train":
+        model = HashedClassifier.train(prompts, labels, n_features=args.features, epochs=args.epochs)
+        model.save(args.model)
+        print(f"Trained on {len(prompts)} prompts, classes {model.classes} -> {args.model} "
+              f"({os.path.getsize(args.model) / 1024:.0f} KB)")
+    else:
+        model = HashedClassifier.load(args.model)
+
+    predicted = [domain for domain, _ in model.classify_many(prompts)]
+    correct = sum(p == label for p, label in zip(predicted, labels))
+    print(f"Accuracy on {args.labeled}: {correct}/{len(labels)} ({correct / len(labels):.1%})")
+
+
+if __name__ == "__main__":
+    main()
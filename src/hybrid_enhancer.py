@@ -0,0 +1,176 @@
+"""
+Hybrid Enhancer - Keyword templates for clear prompts, the LLM for ambiguous ones
+
+Keyword classification is microseconds and free; LLMPromptEnhancer is a
+network round trip and a paid text call. Most prompts are unambiguous, so
+the keyword result is kept whenever its confidence reaches a threshold and
+only the rest - ties, weak matches, and zero-match prompts (defaulted to
+photography at 0.5) - escalate to the LLM. A failed LLM call falls back to
+the keyword result, so escalation never fails a request.
+
+Stats report the escalation rate, LLM latency, escalations answered from
+the cache, and an estimate of the latency saved (prompts kept on the
+keyword path x mean LLM latency).
+
+With a KeyPool (GOOGLE_API_KEYS), each LLM call leases a key from the pool
+like image calls do, so pool-only deployments need no GOOGLE_API_KEY.
+
+Example:
+    hybrid = HybridEnhancer(threshold=0.6, http_client=shared_client)
+    if hybrid.should_escalate(prompt_info):
+        enhancement = await hybrid.escalate("something vague")   # None on failure
+"""
+
+import asyncio
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+import httpx
+
+from key_pool import KeyPool
+from llm_prompt_enhancer import LLMPromptEnhancer
+
+ROUTING_MODES = ("keyword", "hybrid", "llm")
+
+
+class HybridEnhancer:
+    """Confidence gate between the keyword path and LLMPromptEnhancer, with stats."""
+
+    def __init__(
+        self,
+        threshold: float = 0.6,
+        api_key: Optional[str] = None,
+        http_client: Optional[httpx.AsyncClient] = None,
+        max_retries: int = 1,
+        enhancer_factory: Callable[..., Any] = LLMPromptEnhancer,
+        key_pool: Optional[KeyPool] = None
+    ):
+        """
+        Initialize hybrid routing.
+
+        Args:
+            threshold: Keyword confidence below which a prompt escalates
+                       (above 1.0 escalates everything)
+            api_key: Google API key for the text model (defaults to GOOGLE_API_KEY)
+            http_client: Shared httpx.AsyncClient for LLM calls
+            max_retries: LLM attempts per prompt before falling back
+            enhancer_factory: Builds the LLM enhancer (api_key, http_client=...)
+            key_pool: Lease a key per LLM call from this pool instead of api_key
+        """
+        if threshold < 0:
+            raise ValueError(f"Invalid threshold: {threshold}. Must be >= 0")
+
+        self.threshold = threshold
+        self.api_key = api_key
+        self.http_client = http_client
+        self.max_retries = max_retries
+        self.enhancer_factory = enhancer_factory
+        self.key_pool = key_pool
+
+        self.prompts = 0
+        self.escalated = 0
+        self.llm_cached = 0
+        self.llm_calls = 0
+        self.llm_failures = 0
+        self.llm_seconds = 0.0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(
+        cls,
+        http_client: Optional[httpx.AsyncClient] = None,
+        key_pool: Optional[KeyPool] = None
+    ) -> Optional["HybridEnhancer"]:
+        """
+        Build from PROMPT_ROUTING ("keyword" = None, "hybrid", "llm").
+
+        PROMPT_ROUTING_THRESHOLD sets the hybrid confidence threshold;
+        "llm" escalates every prompt. LLM calls use key_pool when given,
+        else GOOGLE_API_KEY; with neither, routing is refused at startup.
+        """
+        mode = os.getenv("PROMPT_ROUTING", "keyword").lower()
+        if mode not in ROUTING_MODES:
+            raise ValueError(f"Invalid PROMPT_ROUTING: {mode}. Must be one of {ROUTING_MODES}")
+        if mode == "keyword":
+            return None
+        if key_pool is None and not os.getenv("GOOGLE_API_KEY"):
+            raise ValueError(
+                f"PROMPT_ROUTING={mode} needs GOOGLE_API_KEY or GOOGLE_API_KEYS for the LLM enhancer"
+            )
+        threshold = float(os.getenv("PROMPT_ROUTING_THRESHOLD", "0.6")) if mode == "hybrid" else 1.01
+        return cls(threshold=threshold, http_client=http_client, key_pool=key_pool)
+
+    def should_escalate(self, prompt_info: Dict[str, Any]) -> bool:
+        """Count one routing decision; True if the keyword result is too uncertain."""
+        escalate = prompt_info["domain_confidence"] < self.threshold
+        with self._lock:
+            self.prompts += 1
+            self.escalated += 1 if escalate else 0
+        return escalate
+
+    def record_cached(self):
+        """Count an escalation answered from a cached LLM result (no call made)."""
+        with self._lock:
+            self.llm_cached += 1
+
+    async def escalate(self, user_prompt: str) -> Optional[Dict[str, Any]]:
+        """
+        LLMPromptEnhancer result for a prompt, or None if the call failed.
+
+        Returns:
+            {"domain", "style", "confidence", "enhanced_prompt", ...}
+        """
+        start = time.perf_counter()
+        if self.key_pool is None:
+            api_key = self.api_key
+        else:
+            api_key, wait = self.key_pool.acquire()
+            if wait:
+                await asyncio.sleep(wait)
+
+        status = 200
+        try:
+            async with self.enhancer_factory(api_key, http_client=self.http_client) as enhancer:
+                enhancement = await enhancer.enhance_prompt(user_prompt, max_retries=self.max_retries)
+        except Exception as e:
+            status = _upstream_status(e)
+            with self._lock:
+                self.llm_failures += 1
+            print(f"LLM enhancement failed, keeping keyword result: {e}")
+            return None
+        finally:
+            if self.key_pool is not None:
+                self.key_pool.release(api_key, status)
+
+        with self._lock:
+            self.llm_calls += 1
+            self.llm_seconds += time.perf_counter() - start
+        return enhancement
+
+    def stats(self) -> Dict:
+        with self._lock:
+            mean_llm = self.llm_seconds / self.llm_calls if self.llm_calls else None
+            kept = self.prompts - self.escalated
+            return {
+                "threshold": self.threshold,
+                "prompts": self.prompts,
+                "escalated": self.escalated,
+                "escalation_rate": round(self.escalated / self.prompts, 4) if self.prompts else None,
+                "llm_cached": self.llm_cached,
+                "llm_failures": self.llm_failures,
+                "llm_mean_seconds": round(mean_llm, 3) if mean_llm is not None else None,
+                "estimated_seconds_saved": round(kept * mean_llm, 1) if mean_llm is not None else None
+            }
+
+
+def _upstream_status(error: Exception) -> Optional[int]:
+    """HTTP status behind a failed LLM call, for the key pool (None = transport error)."""
+    # LLMPromptEnhancer re-raises its last httpx error as a ValueError
+    cause = error if isinstance(error, httpx.HTTPError) else error.__context__
+    if isinstance(cause, httpx.HTTPStatusError):
+        return cause.response.status_code
+    if isinstance(cause, httpx.HTTPError):
+        return None
+    return 200  # the key worked; the answer was unusable
@@ -0,0 +1,313 @@
+"""
+Image Backends - Logical tiers over Gemini and Imagen models, with routing
+
+Gemini image models answer :generateContent; Imagen 4 models answer
+:predict with a different payload. Both are wrapped as ImageBackend objects
+with one generate() signature, a BackendRegistry maps logical tiers
+("fast", "standard", "quality") to candidate backends, and LatencyRouter
+picks, per request class, the candidate with the best observed latency (or
+the lowest cost), falling back to the next one when a call fails.
+
+Example:
+    router = LatencyRouter(BackendRegistry.default())
+    async with GeminiClient() as client:
+        result = await router.generate(client, "fast", "a red bicycle", image_size="1K")
+        # result["backend"] == "imagen-fast" (or whichever proved quicker)
+"""
+
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Tuple
+
+from gemini_client import GeminiClient
+
+
+# Approximate list prices in USD per image, for cost routing and reports
+COST_PER_IMAGE = {
+    "flash": 0.039,
+    "pro": 0.134,
+    "pro/4K": 0.24,
+    "imagen-fast": 0.02,
+    "imagen": 0.04,
+    "imagen-ultra": 0.06
+}
+
+DEFAULT_TIERS = {
+    "fast": ["imagen-fast", "flash"],
+    "standard": ["flash", "imagen"],
+    "quality": ["pro", "imagen-ultra"]
+}
+
+ROUTING_STRATEGIES = ("latency", "cost")
+
+
+class ImageBackend(ABC):
+    """One upstream model behind a common generate() call."""
+
+    name = "backend"
+
+    def supports(
+        self,
+        aspect_ratio: Optional[str] = None,
+        image_size: Optional[str] = None,
+        reference_images: Optional[List] = None
+    ) -> bool:
+        return True
+
+    def cost_per_image(self, image_size: Optional[str] = None) -> float:
+        return COST_PER_IMAGE.get(f"{self.name}/{image_size}", COST_PER_IMAGE.get(self.name, 0.0))
+
+    @abstractmethod
+    async def generate(
+        self,
+        client: GeminiClient,
+        prompt: str,
+        aspect_ratio: Optional[str] = None,
+        image_size: Optional[str] = None,
+        reference_images: Optional[List] = None,
+        max_retries: int = 3
+    ) -> Dict:
+        """Generate one image; result dict shaped like GeminiClient.generate_image()."""
+
+
+class GeminiBackend(ImageBackend):
+    """Gemini image model (:generateContent)."""
+
+    def __init__(self, model: str):
+        if model not in GeminiClient.MODELS:
+            raise ValueError(f"Unknown Gemini model: {model}")
+        self.name = model
+
+    def supports(self, aspect_ratio=None, image_size=None, reference_images=None) -> bool:
+        return (
+            (aspect_ratio is None or aspect_ratio in GeminiClient.ASPECT_RATIOS)
+            and (image_size is None or image_size in GeminiClient.IMAGE_SIZES)
+        )
+
+    async def generate(self, client, prompt, aspect_ratio=None, image_size=None,
+                       reference_images=None, max_retries=3) -> Dict:
+        return await client.generate_image(
+            prompt,
+            model=self.name,
+            aspect_ratio=aspect_ratio,
+            image_size=image_size,
+            max_retries=max_retries,
+            reference_images=reference_images
+        )
+
+
+class ImagenBackend(ImageBackend):
+    """Imagen 4 model (:predict) - text-to-image only, no reference images."""
+
+    def __init__(self, model: str):
+        if model not in GeminiClient.IMAGEN_MODELS:
+            raise ValueError(f"Unknown Imagen model: {model}")
+        self.name = model
+
+    def supports(self, aspect_ratio=None, image_size=None, reference_images=None) -> bool:
+        return (
+            not reference_images
+            and (aspect_ratio is None or aspect_ratio in GeminiClient.IMAGEN_ASPECT_RATIOS)
+            and (image_size is None or image_size in GeminiClient.IMAGEN_IMAGE_SIZES[self.name])
+        )
+
+    async def generate(self, client, prompt, aspect_ratio=None, image_size=None,
+                       reference_images=None, max_retries=3) -> Dict:
+        results = await client.predict_images(
+            prompt,
+            model=self.name,
+            aspect_ratio=aspect_ratio,
+            image_size=image_size,
+            max_retries=max_retries
+        )
+        return results[0]
+
+
+class BackendRegistry:
+    """Named backends plus the tiers that list them in preference order."""
+
+    def __init__(self):
+        self.backends: Dict[str, ImageBackend] = {}
+        self.tiers: Dict[str, List[str]] = {}
+
+    @classmethod
+    def default(cls) -> "BackendRegistry":
+        """Every known Gemini and Imagen model, with DEFAULT_TIERS."""
+        registry = cls()
+        for model in GeminiClient.MODELS:
+            registry.register(GeminiBackend(model))
+        for model in GeminiClient.IMAGEN_MODELS:
+            registry.register(ImagenBackend(model))
+        for tier, names in DEFAULT_TIERS.items():
+            registry.add_tier(tier, names)
+        return registry
+
+    def register(self, backend: ImageBackend):
+        self.backends[backend.name] = backend
+
+    def add_tier(self, tier: str, names: List[str]):
+        unknown = [name for name in names if name not in self.backends]
+        if unknown:
+            raise ValueError(f"Unknown backends for tier {tier}: {unknown}")
+        self.tiers[tier] = list(names)
+
+    def candidates(
+        self,
+        tier: str,
+        aspect_ratio: Optional[str] = None,
+        image_size: Optional[str] = None,
+        reference_images: Optional[List] = None
+    ) -> List[ImageBackend]:
+        """Backends of a tier that can serve these options, in tier order."""
+        if tier not in self.tiers:
+            raise ValueError(f"Invalid tier: {tier}. Must be one of {sorted(self.tiers)}")
+        candidates = [
+            self.backends[name] for name in self.tiers[tier]
+            if self.backends[name].supports(aspect_ratio, image_size, reference_images)
+        ]
+        if not candidates:
+            raise ValueError(
+                f"No {tier} backend supports aspect_ratio={aspect_ratio}, image_size={image_size}"
+                + (" with reference images" if reference_images else "")
+            )
+        return candidates
+
+
+class LatencyRouter:
+    """
+    Pick a backend per request class from observed latency or cost.
+
+    A request class is (tier, image_size). Latency is an exponentially
+    weighted moving average of successful calls per (backend, image_size);
+    backends not yet observed for a class are tried first so every
+    candidate gets measured. A failed call counts as a slow sample and the
+    next candidate is tried.
+    """
+
+    def __init__(
+        self,
+        registry: BackendRegistry,
+        strategy: str = "latency",
+        smoothing: float = 0.2,
+        failure_penalty_seconds: float = 60.0
+    ):
+        """
+        Initialize router.
+
+        Args:
+            registry: Backends and tiers to route over
+            strategy: "latency" (lowest EWMA) or "cost" (cheapest, latency breaks ties)
+            smoothing: EWMA weight of the newest sample
+            failure_penalty_seconds: Sample recorded for a failed call
+        """
+        if strategy not in ROUTING_STRATEGIES:
+            raise ValueError(f"Invalid strategy: {strategy}. Must be one of {ROUTING_STRATEGIES}")
+
+        self.registry = registry
+        self.strategy = strategy
+        self.smoothing = smoothing
+        self.failure_penalty_seconds = failure_penalty_seconds
+
+        self._latency: Dict[Tuple[str, Optional[str]], float] = {}
+        self._counts: Dict[Tuple[str, Optional[str]], Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, backend: str, image_size: Optional[str], seconds: float, ok: bool = True):
+        """Fold one call into the backend's latency average for image_size."""
+        key = (backend, image_size)
+        sample = seconds if ok else max(seconds, self.failure_penalty_seconds)
+        with self._lock:
+            previous = self._latency.get(key)
+            self._latency[key] = (
+                sample if previous is None
+                else previous + self.smoothing * (sample - previous)
+            )
+            counts = self._counts.setdefault(key, {"calls": 0, "failures": 0})
+            counts["calls"] += 1
+            counts["failures"] += 0 if ok else 1
+
+    def rank(
+        self,
+        tier: str,
+        aspect_ratio: Optional[str] = None,
+        image_size: Optional[str] = None,
+        reference_images: Optional[List] = None
+    ) -> List[ImageBackend]:
+        """Candidates for a request, best first."""
+        candidates = self.registry.candidates(tier, aspect_ratio, image_size, reference_images)
+        with self._lock:
+            latency = {
+                backend.name: self._latency.get((backend.name, image_size))
+                for backend in candidates
+            }
+
+        def key(item):
+            order, backend = item
+            observed = latency[backend.name]
+            unmeasured = observed is None
+            if self.strategy == "cost":
+                return (backend.cost_per_image(image_size), observed or 0.0, order)
+            return (not unmeasured, observed or 0.0, order)
+
+        return [backend for _, backend in sorted(enumerate(candidates), key=key)]
+
+    async def generate(
+        self,
+        client: GeminiClient,
+        tier: str,
+        prompt: str,
+        aspect_ratio: Optional[str] = None,
+        image_size: Optional[str] = None,
+        reference_images: Optional[List] = None,
+        max_retries: int = 3
+    ) -> Dict:
+        """
+        Generate with the best backend for the request, falling back in rank order.
+
+        Returns:
+            The backend's result dict plus "backend", "tier" and "cost_usd"
+
+        Raises:
+            ValueError: No backend of the tier supports the options
+            The last backend's error if every candidate failed
+        """
+        candidates = self.rank(tier, aspect_ratio, image_size, reference_images)
+        last_error: Optional[Exception] = None
+
+        for backend in candidates:
+            start = time.perf_counter()
+            try:
+                result = await backend.generate(
+                    client, prompt, aspect_ratio, image_size, reference_images, max_retries
+                )
+            except Exception as e:
+                self.observe(backend.name, image_size, time.perf_counter() - start, ok=False)
+                print(f"Backend {backend.name} failed for tier {tier}: {e}")
+                last_error = e
+                continue
+
+            self.observe(backend.name, image_size, time.perf_counter() - start)
+            return {
+                **result,
+                "backend": backend.name,
+                "tier": tier,
+                "cost_usd": backend.cost_per_image(image_size)
+            }
+
+        raise last_error
+
+    def stats(self) -> List[Dict]:
+        """Latency average and call counts per (backend, image_size)."""
+        with self._lock:
+            return [
+                {
+                    "backend": backend,
+                    "image_size": image_size,
+                    "latency_seconds": round(latency, 3),
+                    **self._counts[(backend, image_size)]
+                }
+                for (backend, image_size), latency in sorted(
+                    self._latency.items(), key=lambda item: (item[0][0], item[0][1] or "")
+                )
+            ]
@@ -0,0 +1,137 @@
+"""
+Image Probe - Dimensions and pixel format from header bytes only
+
+Reads just the headers of PNG, JPEG, WebP and GIF images (the IHDR chunk,
+the JPEG SOF segment, the WebP VP8/VP8L/VP8X header) to report width,
+height, bit depth and color type. Pixels are never decoded, so probing a
+20 MB 4K PNG costs the same as probing a thumbnail.
+
+Example:
+    info = probe_image(result["image_data"])
+    # {"format": "png", "width": 2048, "height": 2048, "bit_depth": 8, "color_type": "rgb"}
+"""
+
+import struct
+from typing import Dict, Optional
+
+# Enough for every PNG/WebP/GIF header; JPEGs with large EXIF/ICC segments
+# may put the SOF marker further in (see probe_image)
+HEADER_BYTES = 64 * 1024
+
+PNG_COLOR_TYPES = {
+    0: "grayscale",
+    2: "rgb",
+    3: "palette",
+    4: "grayscale_alpha",
+    6: "rgba"
+}
+
+JPEG_COMPONENTS = {1: "grayscale", 3: "rgb", 4: "cmyk"}
+
+# Start-of-frame markers carry the dimensions (C4/C8/CC are DHT/JPG/DAC)
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def probe_image(data) -> Optional[Dict]:
+    """
+    Probe image headers.
+
+    Args:
+        data: bytes-like holding at least the image header (the whole image
+              is fine - only the header is read)
+
+    Returns:
+        {"format", "width", "height", "bit_depth", "color_type"}, or None
+        if the format is unknown or the header is truncated
+    """
+    data = memoryview(data).cast("B")
+    try:
+        if data[:8] == b"\x89PNG\r\n\x1a\n":
+            return _probe_png(data)
+        if data[:3] == b"\xff\xd8\xff":
+            return _probe_jpeg(data)
+        if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+            return _probe_webp(data)
+        if data[:6] in (b"GIF87a", b"GIF89a"):
+            return _probe_gif(data)
+    except (struct.error, IndexError):
+        return None
+    return None
+
+
+def _result(fmt: str, width: int, height: int, bit_depth: int, color_type: str) -> Dict:
+    return {
+        "format": fmt,
+        "width": width,
+        "height": height,
+        "bit_depth": bit_depth,
+        "color_type": color_type
+    }
+
+
+def _probe_png(data: memoryview) -> Optional[Dict]:
+    # Signature, then IHDR: length(4) "IHDR" width(4) height(4) depth(1) color(1)
+    if data[12:16] != b"IHDR":
+        return None
+    width, height, bit_depth, color = struct.unpack(">IIBB", data[16:26])
+    return _result("png", width, height, bit_depth, PNG_COLOR_TYPES.get(color, str(color)))
+
+
+def _probe_jpeg(data: memoryview) -> Optional[Dict]:
+    # Walk marker segments (skipping their payloads) until a start-of-frame
+    offset = 2
+    while offset + 4 <= len(data):
+        if data[offset] != 0xFF:
+            return None
+        marker = data[offset + 1]
+        if marker == 0xFF:  # fill byte
+            offset += 1
+            continue
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:  # no length field
+            offset += 2
+            continue
+        if marker in (0xD9, 0xDA):  # end of image / start of scan: no SOF seen
+            return None
+
+        (length,) = struct.unpack(">H", data[offset + 2:offset + 4])
+        if marker in JPEG_SOF_MARKERS:
+            precision, height, width, components = struct.unpack(
+                ">BHHB", data[offset + 4:offset + 10]
+            )
+            return _result(
+                "jpeg", width, height, precision,
+                JPEG_COMPONENTS.get(components, str(components))
+            )
+        offset += 2 + length
+    return None
+
+
+def _probe_webp(data: memoryview) -> Optional[Dict]:
+    chunk = bytes(data[12:16])
+    if chunk == b"VP8 ":
+        # Lossy: frame tag(3) start code 9d 01 2a, then 14-bit width/height
+        if data[23:26] != b"\x9d\x01\x2a":
+            return None
+        width, height = struct.unpack("<HH", data[26:30])
+        return _result("webp", width & 0x3FFF, height & 0x3FFF, 8, "rgb")
+    if chunk == b"VP8L":
+        # Lossless: signature 0x2f, then width-1 (14 bits), height-1 (14 bits), alpha (1 bit)
+        if data[20] != 0x2F:
+            return None
+        (bits,) = struct.unpack("<I", data[21:25])
+        width = (bits & 0x3FFF) + 1
+        height = ((bits >> 14) & 0x3FFF) + 1
+        alpha = (bits >> 28) & 1
+        return _result("webp", width, height, 8, "rgba" if alpha else "rgb")
+    if chunk == b"VP8X":
+        # Extended: flags(1) reserved(3) canvas width-1 (24 bits) height-1 (24 bits)
+        flags = data[20]
+        width = int.from_bytes(data[24:27], "little") + 1
+        height = int.from_bytes(data[27:30], "little") + 1
+        return _result("webp", width, height, 8, "rgba" if flags & 0x10 else "rgb")
+    return None
+
+
+def _probe_gif(data: memoryview) -> Optional[Dict]:
+    width, height, packed = struct.unpack("<HHB", data[6:11])
+    return _result("gif", width, height, (packed & 0x07) + 1, "palette")
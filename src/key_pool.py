@@ -0,0 +1,210 @@
+"""
+API Key Pool - Spread upstream calls across several Google API keys
+
+One key means one project's quota. With keys from several projects, each
+call goes to the key with the most headroom, and keys that hit 429 (quota)
+or 403 (revoked/disabled) are benched until they recover, so throughput
+scales close to linearly with the number of keys.
+
+Example:
+    pool = KeyPool(["key-a", "key-b", "key-c"], requests_per_minute=10)
+    client = GeminiClient(key_pool=pool)
+
+    # Or from the environment: GOOGLE_API_KEYS=key-a,key-b,key-c
+    pool = KeyPool.from_env()
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+
+class _KeyState:
+    def __init__(self, key: str):
+        self.key = key
+        self.recent: Deque[float] = deque()   # request start times in the window
+        self.in_flight = 0
+        self.requests = 0
+        self.errors = 0
+        self.consecutive_errors = 0
+        self.cooldown_until = 0.0
+        self.last_status: Optional[int] = None
+
+
+class KeyPool:
+    """
+    Thread-safe pool of API keys with per-key rate, error and cooldown tracking.
+
+    Routing: keys in cooldown are skipped; among the rest, the key with the
+    most headroom (quota left in the rolling window minus calls in flight)
+    wins. If every key is cooling down or at its limit, acquire() returns the
+    key that frees up first together with how long to wait.
+    """
+
+    def __init__(
+        self,
+        keys: List[str],
+        requests_per_minute: Optional[int] = None,
+        window_seconds: float = 60.0,
+        cooldown_seconds: float = 30.0,
+        max_cooldown_seconds: float = 600.0,
+        forbidden_cooldown_seconds: float = 3600.0
+    ):
+        """
+        Initialize key pool.
+
+        Args:
+            keys: API keys (duplicates are ignored)
+            requests_per_minute: Per-key quota within window_seconds
+                                 (None = unlimited, route by load only)
+            window_seconds: Rolling window for the quota
+            cooldown_seconds: First bench after a 429; doubles per consecutive 429
+            max_cooldown_seconds: Cap for the 429 bench
+            forbidden_cooldown_seconds: Quarantine after a 403
+        """
+        unique = list(dict.fromkeys(key.strip() for key in keys if key and key.strip()))
+        if not unique:
+            raise ValueError("KeyPool needs at least one API key")
+
+        self.requests_per_minute = requests_per_minute
+        self.window_seconds = window_seconds
+        self.cooldown_seconds = cooldown_seconds
+        self.max_cooldown_seconds = max_cooldown_seconds
+        self.forbidden_cooldown_seconds = forbidden_cooldown_seconds
+
+        self._states: Dict[str, _KeyState] = {key: _KeyState(key) for key in unique}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, **kwargs) -> Optional["KeyPool"]:
+        """
+        Build a pool from GOOGLE_API_KEYS (comma-separated), if set.
+
+        GOOGLE_API_KEYS_RPM sets requests_per_minute. Returns None when no
+        pool is configured, so callers fall back to GOOGLE_API_KEY.
+        """
+        keys = [key for key in os.getenv("GOOGLE_API_KEYS", "").split(",") if key.strip()]
+        if not keys:
+            return None
+        if "requests_per_minute" not in kwargs and os.getenv("GOOGLE_API_KEYS_RPM"):
+            kwargs["requests_per_minute"] = int(os.getenv("GOOGLE_API_KEYS_RPM"))
+        return cls(keys, **kwargs)
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+    @property
+    def keys(self) -> List[str]:
+        return list(self._states)
+
+    def _trim(self, state: _KeyState, now: float):
+        while state.recent and state.recent[0] <= now - self.window_seconds:
+            state.recent.popleft()
+
+    def _wait_and_headroom(self, state: _KeyState, now: float) -> Tuple[float, float]:
+        self._trim(state, now)
+        wait = max(0.0, state.cooldown_until - now)
+
+        if self.requests_per_minute is None:
+            return wait, -float(len(state.recent) + state.in_flight)
+
+        used = len(state.recent) + state.in_flight
+        headroom = self.requests_per_minute - used
+        if headroom <= 0 and state.recent:
+            # Wait for the oldest request in the window to age out
+            wait = max(wait, state.recent[0] + self.window_seconds - now)
+        return wait, headroom
+
+    def acquire(self) -> Tuple[str, float]:
+        """
+        Pick the key with the most headroom and count a request against it.
+
+        Returns:
+            (key, wait_seconds) - wait_seconds is 0 unless every key is
+            cooling down or at quota; the caller should sleep that long
+            before using the key. Always pair with release().
+        """
+        with self._lock:
+            now = time.monotonic()
+            best_key = None
+            best_rank = None
+            best_wait = 0.0
+
+            for state in self._states.values():
+                wait, headroom = self._wait_and_headroom(state, now)
+                rank = (wait, -headroom, state.consecutive_errors, state.requests)
+                if best_rank is None or rank < best_rank:
+                    best_key, best_rank, best_wait = state.key, rank, wait
+
+            state = self._states[best_key]
+            state.recent.append(now + best_wait)
+            state.in_flight += 1
+            state.requests += 1
+            return best_key, best_wait
+
+    def release(
+        self,
+        key: str,
+        status: Optional[int] = None,
+        retry_after: Optional[float] = None
+    ):
+        """
+        Report the outcome of a call made with key.
+
+        Args:
+            key: Key returned by acquire()
+            status: HTTP status (None for transport errors)
+            retry_after: Server-suggested wait for a 429, in seconds
+        """
+        with self._lock:
+            state = self._states.get(key)
+            if state is None:
+                return
+
+            now = time.monotonic()
+            state.in_flight = max(0, state.in_flight - 1)
+            state.last_status = status
+
+            if status == 429:
+                state.errors += 1
+                state.consecutive_errors += 1
+                backoff = self.cooldown_seconds * 2 ** (state.consecutive_errors - 1)
+                bench = max(retry_after or 0.0, min(backoff, self.max_cooldown_seconds))
+                state.cooldown_until = max(state.cooldown_until, now + bench)
+            elif status == 403:
+                state.errors += 1
+                state.consecutive_errors += 1
+                state.cooldown_until = now + self.forbidden_cooldown_seconds
+            elif status is None or status >= 500:
+                state.errors += 1
+            else:
+                state.consecutive_errors = 0
+
+    def available(self) -> int:
+        """Number of keys usable right now (not cooling down, under quota)."""
+        with self._lock:
+            now = time.monotonic()
+            return sum(
+                1 for state in self._states.values()
+                if self._wait_and_headroom(state, now)[0] == 0
+            )
+
+    def stats(self) -> List[Dict]:
+        """Per-key counters (keys masked to their last 4 characters)."""
+        with self._lock:
+            now = time.monotonic()
+            result = []
+            for state in self._states.values():
+                self._trim(state, now)
+                result.append({
+                    "key": f"...{state.key[-4:]}",
+                    "requests": state.requests,
+                    "errors": state.errors,
+                    "in_flight": state.in_flight,
+                    "recent_requests": len(state.recent),
+                    "cooldown_seconds": round(max(0.0, state.cooldown_until - now), 1),
+                    "last_status": state.last_status
+                })
+            return result
@@ -0,0 +1,96 @@
+"""
+Keyword Config - Domain and subcategory keyword lists from templates/keywords.json
+
+The keyword lists live next to templates.json so they can be tuned without
+a code change. DomainClassifier.DOMAIN_KEYWORDS and
+TemplateEngine.SUBCATEGORY_KEYWORDS are loaded from here at import;
+KeywordReloader (keyword_reloader) recompiles them while the service runs.
+
+File format:
+    {
+      "domains": {"photography": ["photo", "portrait", ...], ...},
+      "subcategories": {"portrait": ["portrait", "headshot", ...], ...},
+      "languages": {
+        "es": {"domains": {"photography": ["fotografía", ...]}, "subcategories": {...}}
+      }
+    }
+
+Each language adds its keywords to the same groups, so every language is
+matched in the same single pass. Matching folds case and accents (see
+keyword_matcher), so write keywords in their natural spelling. Keywords
+written with capitals match as whole words only.
+
+A language's keywords should not occur inside words of the other
+languages ("red" is Spanish for network but an English color; "venta"
+is inside "ventana"), or prompts in those languages change score. Nor
+should they occur inside another group's keywords ("gráfico" is inside
+"fotográfico"). Capitalize such words to match them as whole words only
+("Foto", "Gráfico").
+"""
+
+import json
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Union
+
+KEYWORDS_PATH = Path(__file__).parent.parent / "templates" / "keywords.json"
+
+KeywordGroups = Dict[str, List[str]]
+
+
+def _validate_groups(name: str, groups, allow_empty: bool = False) -> KeywordGroups:
+    if not isinstance(groups, dict) or not (groups or allow_empty):
+        raise ValueError(f"'{name}' must be a non-empty object of keyword lists")
+    for group, keywords in groups.items():
+        if not isinstance(keywords, list) or not all(isinstance(k, str) for k in keywords):
+            raise ValueError(f"'{name}.{group}' must be a list of strings")
+    return groups
+
+
+def load_keywords(
+    path: Optional[Union[str, Path]] = None,
+    languages: Optional[Iterable[str]] = None
+) -> Dict[str, KeywordGroups]:
+    """
+    Read and validate a keyword file, merging its language sets.
+
+    Args:
+        path: JSON file (defaults to templates/keywords.json)
+        languages: Language sets to merge (None = all in the file)
+
+    Returns:
+        {"domains": {domain: [keywords]}, "subcategories": {subcategory: [keywords]}}
+        - base keywords first, then each language's in file order
+
+    Raises:
+        ValueError: Malformed JSON, wrong shape, or a language set naming
+                    a group the base lists don't have
+        OSError: File can't be read
+    """
+    with open(path or KEYWORDS_PATH, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if not isinstance(data, dict):
+        raise ValueError("Keyword file must be a JSON object")
+
+    merged = {
+        section: {
+            group: list(keywords)
+            for group, keywords in _validate_groups(section, data.get(section)).items()
+        }
+        for section in ("domains", "subcategories")
+    }
+
+    sets = data.get("languages", {})
+    if not isinstance(sets, dict):
+        raise ValueError("'languages' must be an object of keyword sets")
+    wanted = set(sets) if languages is None else set(languages)
+    for language, keyword_set in sets.items():
+        if language not in wanted:
+            continue
+        for section, groups in merged.items():
+            name = f"languages.{language}.{section}"
+            extra = _validate_groups(name, (keyword_set or {}).get(section, {}), allow_empty=True)
+            for group, keywords in extra.items():
+                if group not in groups:
+                    raise ValueError(f"'{name}.{group}' is not one of the {section}: {sorted(groups)}")
+                groups[group].extend(k for k in keywords if k not in groups[group])
+    return merged
@@ -0,0 +1,350 @@
+"""
+Keyword Matcher - Aho-Corasick automaton over grouped keyword lists
+
+Finds every keyword of every group in one left-to-right pass over the text,
+however many keywords there are, instead of one substring search per
+keyword. Matching is case-insensitive (str.casefold on both sides) and
+accent-insensitive: accented Latin-1 letters fold to their base letter in
+the byte table, and the rare text with characters beyond Latin-1 is
+NFKD-normalized with its combining marks dropped first, so "fotografía",
+"FOTOGRAFÍA", "fotografia" and a decomposed "i" + U+0301 all fold alike.
+
+Keywords written with capitals in the source lists ("ISO", "AWS", "UML",
+"Canon", "UI") are acronyms and proper nouns, so they only match as whole
+words - "aws" inside "draws" or "ui" inside "build" is not a hit. Lowercase
+keywords keep substring semantics ("photo" matches "photorealistic").
+
+Texts longer than MAX_SCAN_CHARS are scanned up to that point only (see
+scan_window), so matching time is bounded however much text is pasted.
+
+Example:
+    matcher = KeywordMatcher({"diagrams": ["AWS", "diagram"], "art": ["painting"]})
+    matcher.scores("AWS architecture diagram")
+    # {"diagrams": 2, "art": 0}
+"""
+
+import re
+import unicodedata
+from collections import deque
+from typing import Dict, Iterable, List, Sequence, Set, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # batch matching only; single texts need nothing extra
+    np = None
+
+# Combining marks (accents) left over after NFKD decomposition are dropped
+_COMBINING_MARKS = re.compile("[\u0300-\u036f]+")
+
+
+def _base_letter(code: int) -> int:
+    """Latin-1 letter without its accent ("é" -> "e"), or the letter itself."""
+    base = _COMBINING_MARKS.sub("", unicodedata.normalize("NFKD", chr(code)))
+    return ord(base) if len(base) == 1 and ord(base) < 256 else code
+
+
+# Text and keywords are scanned as Latin-1 bytes with every non-alphanumeric
+# byte (and any character outside Latin-1) folded to a space, so "e-commerce"
+# and "e commerce" match alike and word boundaries are just spaces. Accented
+# Latin-1 letters fold to their base letter in the same table.
+SEPARATOR = 0x20
+_BYTE_CLASSES = bytes(
+    _base_letter(code) if chr(code).isalnum() else SEPARATOR for code in range(256)
+)
+
+# Same classes, but NUL survives: it delimits texts folded in one call
+_BATCH_CLASSES = b"\0" + _BYTE_CLASSES[1:]
+
+# Texts scanned in lockstep per block by the batch methods
+BATCH_BLOCK = 2048
+
+# Lockstep scanning pays for its NumPy overhead only on many short texts
+# (benchmarks/bench_classify_many.py: ~2.4x at 64 chars, break-even near
+# 256 chars or 100 texts); otherwise scores_many loops like scores()
+BATCH_MIN_TEXTS = 128
+BATCH_MAX_MEAN_CHARS = 160
+
+# Only the head of a longer text is scanned (see scan_window)
+MAX_SCAN_CHARS = 16384
+
+
+def _latin1(text: str) -> bytes:
+    text = text.casefold()
+    try:
+        return text.encode("latin-1")  # accents are folded by the byte table
+    except UnicodeEncodeError:
+        # Decomposed accents or characters outside Latin-1: "e" + U+0301 -> "e"
+        text = _COMBINING_MARKS.sub("", unicodedata.normalize("NFKD", text))
+        return text.encode("latin-1", "replace")
+
+
+def fold(text: str) -> bytes:
+    """Case-, accent- and separator-folded Latin-1 bytes for scanning."""
+    return _latin1(text).translate(_BYTE_CLASSES)
+
+
+def scan_window(text: str, limit: int = MAX_SCAN_CHARS) -> str:
+    """
+    The part of a text that classification looks at: all of it up to limit
+    characters, else its head cut back to the last whitespace.
+
+    Keywords that decide a prompt come early (the subject leads; the Pro
+    example prompts are a few KB), so the head is a good sample, and it
+    bounds the work one pasted megabyte can cause. Cutting at whitespace
+    keeps a truncated word ("UIX") from matching as a shorter whole word.
+    """
+    if len(text) <= limit:
+        return text
+    cut = max(text.rfind(" ", 0, limit + 1), text.rfind("\n", 0, limit + 1))
+    return text[:cut] if cut > 0 else text[:limit]
+
+
+def fold_many(texts: Sequence[str]) -> Tuple[bytes, List[int]]:
+    """
+    Fold many texts in one pass: (NUL-joined folded bytes, folded lengths).
+
+    Equivalent to [fold(t) for t in texts] without per-text calls.
+    """
+    if not texts:
+        return b"", []
+    joined = "\0".join(texts)
+    if joined.count("\0") != len(texts) - 1:
+        # A text contains NUL itself; fold one by one (NUL is a separator anyway)
+        folded = [fold(text) for text in texts]
+        return b"\0".join(folded), [len(part) for part in folded]
+    folded = _latin1(joined).translate(_BATCH_CLASSES)
+    return folded, [len(part) for part in folded.split(b"\0")]
+
+
+class KeywordMatcher:
+    """
+    Compiled multi-pattern matcher for {group: [keywords]}.
+
+    The automaton is a full DFA over byte classes - one class per byte
+    that occurs in some keyword, and one shared class for every other
+    byte, which always leads back to the start - stored as one flat
+    transition list (one entry per class per state) with the states that
+    complete a keyword numbered last, so the scan loop is one list index
+    and one comparison per byte. Keeping the rows this narrow keeps the
+    table small enough to stay in cache as keyword sets for more
+    languages are added. Whole-word keywords are compiled with a separator on each
+    side and the text is padded with one, so boundaries need no extra
+    checks. Each keyword counts once per text, as with the
+    `keyword in text` loops this replaces.
+    """
+
+    def __init__(self, groups: Dict[str, Iterable[str]], max_scan_chars: int = MAX_SCAN_CHARS):
+        self.groups: List[str] = list(groups)
+        self.max_scan_chars = max_scan_chars
+        # (group index, keyword as written)
+        self.keywords: List[Tuple[int, str]] = []
+
+        goto: List[Dict[int, int]] = [{}]
+        outputs: List[List[int]] = [[]]
+        for group_index, group in enumerate(self.groups):
+            for keyword in groups[group]:
+                pattern = fold(keyword).strip()
+                if not pattern:
+                    continue
+                if keyword != keyword.lower():
+                    pattern = b" " + pattern + b" "
+                state = 0
+                for code in pattern:
+                    next_state = goto[state].get(code)
+                    if next_state is None:
+                        next_state = len(goto)
+                        goto[state][code] = next_state
+                        goto.append({})
+                        outputs.append([])
+                    state = next_state
+                outputs[state].append(len(self.keywords))
+                self.keywords.append((group_index, keyword))
+
+        # Breadth-first: a state's failure target is shallower, so its
+        # transitions and outputs are final by the time they are copied
+        fail = [0] * len(goto)
+        delta: List[Dict[int, int]] = [dict() for _ in goto]
+        delta[0] = dict(goto[0])
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            delta[state] = {**delta[fail[state]], **goto[state]}
+            for code, child in goto[state].items():
+                fail[child] = delta[fail[state]].get(code, 0)
+                outputs[child] = outputs[child] + outputs[fail[child]]
+                queue.append(child)
+
+        # Byte classes: class 0 for bytes no keyword uses, then one per used byte
+        used = sorted({code for transitions in goto for code in transitions})
+        width = len(used) + 1
+        classes = bytearray(256)
+        for index, code in enumerate(used, 1):
+            classes[code] = index
+        self._width = width
+        self._classes = bytes(classes)
+
+        # Renumber: silent states first, so "completes a keyword" is state >= limit.
+        # States are stored premultiplied by the row width.
+        order = [s for s in range(len(goto)) if not outputs[s]]
+        self._limit = len(order) * width
+        order += [s for s in range(len(goto)) if outputs[s]]
+        number = {old: new * width for new, old in enumerate(order)}
+
+        table = [0] * (len(order) * width)
+        for old, transitions in enumerate(delta):
+            base = number[old]
+            for code, target in transitions.items():
+                table[base + classes[code]] = number[target]
+        self._table = table
+        self._outputs = {number[s]: tuple(outputs[s]) for s in range(len(goto)) if outputs[s]}
+        self._arrays = None  # NumPy copies for matched_many, built on first use
+
+    def __len__(self) -> int:
+        return len(self.keywords)
+
+    @property
+    def states(self) -> int:
+        return len(self._table) // self._width
+
+    def matched(self, text: str) -> Set[int]:
+        """Indexes (into self.keywords) of the keywords found in text's scan_window."""
+        table = self._table
+        limit = self._limit
+        hits = set()
+
+        state = 0
+        for code in (b" " + fold(scan_window(text, self.max_scan_chars)) + b" ").translate(self._classes):
+            state = table[state + code]
+            if state >= limit:
+                hits.add(state)
+
+        found: Set[int] = set()
+        for state in hits:
+            found.update(self._outputs[state])
+        return found
+
+    def _numpy_tables(self):
+        if self._arrays is None:
+            # Output states as CSR: keywords of state s are
+            # output_keywords[output_start[i]:output_start[i + 1]], i = (s - limit) // width
+            width = self._width
+            first = self._limit // width
+            output_lists = [self._outputs[(first + i) * width] for i in range(self.states - first)]
+            output_start = np.zeros(len(output_lists) + 1, dtype=np.int64)
+            np.cumsum([len(found) for found in output_lists], out=output_start[1:])
+            output_keywords = np.fromiter(
+                (keyword for found in output_lists for keyword in found),
+                dtype=np.int64, count=int(output_start[-1])
+            )
+            self._arrays = (np.asarray(self._table, dtype=np.int32), output_start, output_keywords)
+        return self._arrays
+
+    def _blocks(self, texts: Sequence[str]):
+        """
+        Yield (text indexes, text x keyword presence matrix) per lockstep block.
+
+        The automaton runs over a block of texts at once - one vectorized
+        table lookup per character position instead of one Python step per
+        character per text. Texts are grouped by length so little padding
+        is scanned.
+        """
+        if np is None:
+            raise ImportError("Batch matching requires numpy (pip install numpy)")
+
+        table, output_start, output_keywords = self._numpy_tables()
+        limit = self._limit
+        stride = self._width
+        separator = self._classes[SEPARATOR]
+        folded, lengths = fold_many([scan_window(text, self.max_scan_chars) for text in texts])
+        buffer = np.frombuffer(
+            (folded + b"\0").translate(self._classes), dtype=np.uint8  # never empty
+        ).astype(np.int32)
+        lengths = np.asarray(lengths, dtype=np.int64)
+        starts = np.concatenate(([0], np.cumsum(lengths + 1)[:-1]))
+        order = np.argsort(lengths, kind="stable")
+
+        for start in range(0, len(order), BATCH_BLOCK):
+            block = order[start:start + BATCH_BLOCK]
+            # Position x text codes, with one leading and at least one
+            # trailing separator, like matched()
+            width = int(lengths[block[-1]]) + 2
+            positions = np.arange(-1, width - 1)[:, None]
+            inside = (positions >= 0) & (positions < lengths[block])
+            index = np.minimum(starts[block] + positions, len(buffer) - 1)
+            codes = np.where(inside, buffer[np.maximum(index, 0)], separator)
+
+            states = np.empty(codes.shape, dtype=np.int32)
+            state = np.zeros(len(block), dtype=np.int32)
+            lookup = np.empty(len(block), dtype=np.int32)
+            for position, column in enumerate(codes):
+                np.add(state, column, out=lookup)
+                state = states[position]
+                np.take(table, lookup, out=state)
+
+            # (row, output state) -> every keyword that state completes
+            hits = np.flatnonzero(states >= limit)
+            hit_rows = hits % len(block)
+            outputs = (states.ravel()[hits] - limit) // stride
+            counts = output_start[outputs + 1] - output_start[outputs]
+            first = np.repeat(output_start[outputs], counts)
+            offsets = np.arange(first.size) - np.repeat(np.cumsum(counts) - counts, counts)
+
+            present = np.zeros((len(block), len(self.keywords)), dtype=bool)
+            present[np.repeat(hit_rows, counts), output_keywords[first + offsets]] = True
+            yield block, present
+
+    def matched_many(self, texts: Sequence[str]):
+        """
+        Keywords found in many texts, as (text_index, keyword_index) arrays.
+
+        Each (text, keyword) pair appears once, exactly as matched() would
+        report it, sorted by text then keyword.
+        """
+        rows, found = [np.zeros(0, dtype=np.int64)], [np.zeros(0, dtype=np.int64)]
+        for block, present in self._blocks(texts):
+            block_rows, keywords = np.nonzero(present)
+            rows.append(block[block_rows])
+            found.append(keywords)
+        rows, found = np.concatenate(rows), np.concatenate(found)
+        order = np.lexsort((found, rows))
+        return rows[order], found[order]
+
+    def prefers_batch(self, texts: Sequence[str]) -> bool:
+        """True if lockstep scanning beats one scan per text for these texts."""
+        if np is None or len(texts) < BATCH_MIN_TEXTS:
+            return False
+        chars = sum(min(len(text), self.max_scan_chars) for text in texts)
+        return chars <= BATCH_MAX_MEAN_CHARS * len(texts)
+
+    def scores_many(self, texts: Sequence[str]):
+        """Distinct keywords per group for many texts: int matrix (texts x groups)."""
+        if np is None:
+            raise ImportError("Batch matching requires numpy (pip install numpy)")
+        if not self.prefers_batch(texts):
+            scores = np.zeros((len(texts), len(self.groups)), dtype=np.int32)
+            for row, text in enumerate(texts):
+                scores[row] = list(self.scores(text).values())
+            return scores
+        membership = np.zeros((len(self.keywords), len(self.groups)), dtype=np.int32)
+        membership[np.arange(len(self.keywords)), [group for group, _ in self.keywords]] = 1
+
+        scores = np.zeros((len(texts), len(self.groups)), dtype=np.int32)
+        for block, present in self._blocks(texts):
+            scores[block] = present.astype(np.int32) @ membership
+        return scores
+
+    def scores(self, text: str) -> Dict[str, int]:
+        """Distinct keywords found per group (every group present, in order)."""
+        counts = [0] * len(self.groups)
+        keywords = self.keywords
+        for keyword_index in self.matched(text):
+            counts[keywords[keyword_index][0]] += 1
+        return dict(zip(self.groups, counts))
+
+    def matches(self, text: str) -> Dict[str, List[str]]:
+        """Keywords found per group, as written in the source lists (for debugging)."""
+        result: Dict[str, List[str]] = {group: [] for group in self.groups}
+        for keyword_index in sorted(self.matched(text)):
+            group_index, keyword = self.keywords[keyword_index]
+            result[self.groups[group_index]].append(keyword)
+        return result
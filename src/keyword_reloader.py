@@ -0,0 +1,199 @@
+"""
+Keyword Reloader - Recompile keyword and template configuration while serving
+
+Holds the PromptAnalyzer (classifier + template engine + compiled keyword
+automaton) that requests use, built from templates/keywords.json and
+templates/templates.json. reload() builds a complete new analyzer off to
+the side and swaps it in with a single reference assignment: requests
+already running finish on the analyzer they started with, new ones get the
+new one, and nobody waits on a lock. A file that fails to load or validate
+leaves the current configuration in place; validation includes checking
+that every keyword domain and subcategory has a template.
+
+Reloads are triggered by a background watcher polling the files' mtimes
+(start()) or explicitly, e.g. from an admin endpoint.
+
+Example:
+    keywords = KeywordReloader(on_reload=prompt_cache.clear)
+    keywords.start(interval=5.0)          # optional watcher
+    keywords.analyzer.analyze("headshot of a CEO")
+"""
+
+import os
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Dict, Optional, Tuple, Union
+
+from domain_classifier import DomainClassifier
+from keyword_config import KEYWORDS_PATH, load_keywords
+from prompt_analyzer import PromptAnalyzer
+from template_engine import TemplateEngine
+
+if TYPE_CHECKING:
+    from hashed_classifier import HashedClassifier
+
+TEMPLATES_PATH = KEYWORDS_PATH.parent / "templates.json"
+
+
+class KeywordReloader:
+    """Current PromptAnalyzer plus atomic, non-blocking reloads from disk."""
+
+    def __init__(
+        self,
+        keywords_path: Optional[Union[str, Path]] = None,
+        templates_path: Optional[Union[str, Path]] = None,
+        model: Optional["HashedClassifier"] = None,
+        on_reload: Optional[Callable[[], None]] = None
+    ):
+        """
+        Initialize and load the configuration.
+
+        Args:
+            keywords_path: Keyword file (defaults to templates/keywords.json)
+            templates_path: Template file (defaults to templates/templates.json)
+            model: Learned domain classifier kept across reloads
+            on_reload: Called after each successful swap (e.g. clear caches)
+
+        Raises:
+            ValueError, OSError: The initial configuration can't be loaded
+        """
+        self.keywords_path = Path(keywords_path or KEYWORDS_PATH)
+        self.templates_path = Path(templates_path or TEMPLATES_PATH)
+        self.model = model
+        self.on_reload = on_reload
+
+        self.version = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+        self.loaded_at = 0.0
+
+        self._reload_lock = threading.Lock()  # one rebuild at a time; readers never take it
+        self._stop = threading.Event()
+        self._watcher: Optional[threading.Thread] = None
+
+        self._mtimes = self._file_mtimes()
+        self.analyzer: PromptAnalyzer = self._build()
+        self.version = 1
+        self.loaded_at = time.time()
+
+    @property
+    def classifier(self) -> DomainClassifier:
+        return self.analyzer.classifier
+
+    @property
+    def template_engine(self) -> TemplateEngine:
+        return self.analyzer.template_engine
+
+    def _file_mtimes(self) -> Tuple[Optional[float], Optional[float]]:
+        def mtime(path: Path) -> Optional[float]:
+            try:
+                return path.stat().st_mtime
+            except OSError:
+                return None
+        return mtime(self.keywords_path), mtime(self.templates_path)
+
+    def _build(self) -> PromptAnalyzer:
+        keywords = load_keywords(self.keywords_path)
+        classifier = DomainClassifier(keywords["domains"], model=self.model)
+        engine = TemplateEngine(str(self.templates_path), subcategory_keywords=keywords["subcategories"])
+        self._check_against_templates(classifier, engine)
+        return PromptAnalyzer(classifier, engine)
+
+    @staticmethod
+    def _check_against_templates(classifier: DomainClassifier, engine: TemplateEngine):
+        """
+        Reject domains and subcategories no template defines.
+
+        The analyzer would pick them and every matching request would fail
+        on the template lookup, so such a file must not be swapped in.
+        """
+        domains = set(classifier.keywords)
+        if classifier.model is not None:
+            domains |= set(classifier.model.classes)
+        unknown = sorted(domains - set(engine.templates))
+        if unknown:
+            raise ValueError(f"Domains without templates: {unknown}. Known: {sorted(engine.templates)}")
+
+        subcategories = {name for domain in engine.templates.values() for name in domain}
+        unknown = sorted(set(engine.subcategory_keywords) - subcategories)
+        if unknown:
+            raise ValueError(f"Subcategories without templates: {unknown}")
+
+    def changed(self) -> bool:
+        return self._file_mtimes() != self._mtimes
+
+    def reload(self) -> int:
+        """
+        Rebuild from disk and swap the new analyzer in.
+
+        Returns:
+            The new configuration version
+
+        Raises:
+            ValueError, OSError: The files don't load; the current
+                                 configuration stays active
+        """
+        with self._reload_lock:
+            mtimes = self._file_mtimes()
+            try:
+                analyzer = self._build()
+            except (OSError, ValueError) as e:
+                self.failures += 1
+                self.last_error = str(e)
+                self._mtimes = mtimes  # don't retry the same broken file every poll
+                raise
+
+            # One reference assignment: in-flight requests keep their analyzer
+            self.analyzer = analyzer
+            self._mtimes = mtimes
+            self.version += 1
+            self.loaded_at = time.time()
+            self.last_error = None
+
+        if self.on_reload is not None:
+            self.on_reload()
+        return self.version
+
+    def start(self, interval: float = 5.0):
+        """Poll the files every interval seconds and reload when they change."""
+        if self._watcher is not None:
+            return
+        self._stop.clear()
+
+        def watch():
+            while not self._stop.wait(interval):
+                if not self.changed():
+                    continue
+                try:
+                    version = self.reload()
+                    print(f"Reloaded keyword configuration (version {version})")
+                except (OSError, ValueError) as e:
+                    print(f"Keyword configuration reload failed, keeping current: {e}")
+
+        self._watcher = threading.Thread(target=watch, name="keyword-reloader", daemon=True)
+        self._watcher.start()
+
+    def start_from_env(self):
+        """Start the watcher if KEYWORDS_RELOAD_INTERVAL (seconds) is set above 0."""
+        interval = float(os.getenv("KEYWORDS_RELOAD_INTERVAL", "0"))
+        if interval > 0:
+            self.start(interval)
+
+    def stop(self):
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+
+    def stats(self) -> Dict:
+        analyzer = self.analyzer
+        return {
+            "version": self.version,
+            "loaded_at": self.loaded_at,
+            "keywords": len(analyzer.matcher),
+            "automaton_states": analyzer.matcher.states,
+            "watching": self._watcher is not None,
+            "failures": self.failures,
+            "last_error": self.last_error
+        }
@@ -67,22 +67,30 @@ Respond ONLY with valid JSON in this exact format:
 
 Be creative and specific. Add details that would make a professional-quality image."""
 
-    def __init__(self, api_key: Optional[str] = None):
-        """Initialize with Google API key."""
+    def __init__(self, api_key: Optional[str] = None, http_client: Optional[httpx.AsyncClient] = None):
+        """
+        Initialize with Google API key.
+
+        Args:
+            api_key: Google API key (defaults to GOOGLE_API_KEY)
+            http_client: Shared httpx.AsyncClient to reuse connections
+                         (left open on exit)
+        """
         self.api_key = api_key or os.getenv("GOOGLE_API_KEY")
         if not self.api_key:
             raise ValueError("API key required. Set GOOGLE_API_KEY environment variable")
 
+        self._shared_client = http_client
         self.client = None
 
     async def __aenter__(self):
         """Async context manager entry."""
-        self.client = httpx.AsyncClient(timeout=30.0)
+        self.client = self._shared_client or httpx.AsyncClient(timeout=30.0)
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         """Async context manager exit."""
-        if self.client:
+        if self.client and self.client is not self._shared_client:
             await self.client.aclose()
 
     async def enhance_prompt(
@@ -11,53 +11,151 @@ Simple workflow:
 No Kubernetes, no PostgreSQL, no Redis Queue - just works!
 """
 
-from flask import Flask, request, jsonify, Response
+from flask import Flask, request, jsonify, Response, stream_with_context
 import asyncio
 import os
 import base64
+import hmac
+import json
+import httpx
 from datetime import datetime, UTC
 from typing import Any, Dict, List, Optional
 
 # Our simple components
-from domain_classifier import DomainClassifier
-from template_engine import TemplateEngine
-from gemini_client import GeminiClient
+from hashed_classifier import HashedClassifier
+from hybrid_enhancer import HybridEnhancer
+from keyword_reloader import KeywordReloader
+from prompt_analyzer import PromptAnalyzer
+from prompt_cache import SUBJECT, PromptCache, normalize
+from gemini_client import BackgroundLoop, GeminiClient, ReferenceImage, UploadedFileCache
+from key_pool import KeyPool
+from cassette import Cassette
 from brand_profile_manager import BrandProfileManager
+from image_probe import HEADER_BYTES, probe_image
+from image_backends import BackendRegistry, LatencyRouter
+from model_catalog import ModelCatalog
+from adaptive_timeouts import AdaptiveTimeouts
 
 # Initialize Flask app
 app = Flask(__name__)
 
 # Initialize components
-classifier = DomainClassifier()
-template_engine = TemplateEngine()
 brand_profile_manager = BrandProfileManager()
+# Enhancement results per (normalized prompt, quality, brand); PROMPT_CACHE_SIZE=0 disables
+prompt_cache = PromptCache.from_env()
+# Classifier, templates and their compiled keywords (one scan per prompt), reloadable from
+# templates/keywords.json + templates.json; learned domain model from DOMAIN_CLASSIFIER_MODEL
+keyword_config = KeywordReloader(
+    model=HashedClassifier.from_env(),
+    on_reload=prompt_cache.clear if prompt_cache is not None else None
+)
+keyword_config.start_from_env()  # watcher only if KEYWORDS_RELOAD_INTERVAL is set
+key_pool = KeyPool.from_env()  # None unless GOOGLE_API_KEYS is set
+file_cache = UploadedFileCache.from_env()  # None unless GEMINI_FILE_CACHE is set
+cassette = Cassette.from_env()  # None unless GEMINI_CASSETTE is set (record/replay benchmarks)
+model_catalog = ModelCatalog.from_env()  # None unless GEMINI_MODEL_CATALOG is set
+# Read timeouts per (model, size, aspect) from observed latency; ADAPTIVE_TIMEOUTS=off disables
+upstream_timeouts = AdaptiveTimeouts.from_env()
+# "tier" requests pick among Gemini/Imagen backends by observed latency (or cost)
+backend_router = LatencyRouter(
+    BackendRegistry.default(),
+    strategy=os.getenv("BACKEND_ROUTING", "latency")
+)
+
+# All request threads share one event loop and one upstream connection pool
+upstream_loop = BackgroundLoop(name="upstream")
+upstream_http = httpx.AsyncClient(
+    timeout=30.0,
+    limits=httpx.Limits(max_connections=32, max_keepalive_connections=32),
+    transport=cassette.transport() if cassette is not None else None
+)
+# Low-confidence prompts escalate to the LLM enhancer; None unless PROMPT_ROUTING=hybrid/llm
+hybrid_enhancer = HybridEnhancer.from_env(http_client=upstream_http, key_pool=key_pool)
 
 VALID_QUALITIES = {"basic", "detailed", "expert"}
 VALID_MODELS = {"flash", "pro"}
 VALID_FORMATS = {"base64"}
 MAX_BATCH_SIZE = 20
+MAX_VARIATIONS = 8
+MAX_REFERENCE_IMAGES = 3
+MAX_REFERENCE_BYTES = 15 * 1024 * 1024  # inline requests are capped at 20 MB total
 DEFAULT_BATCH_CONCURRENCY = 3
 MAX_BATCH_CONCURRENCY = 10
+# Longest example prompts are ~3 KB; checked before any prompt processing
+MAX_PROMPT_CHARS = int(os.getenv("MAX_PROMPT_CHARS", "20000"))
 
 
 # Helper to run async code in Flask
 def run_async(coro):
     """Run async function in Flask (Flask doesn't support async natively)"""
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    try:
-        return loop.run_until_complete(coro)
-    finally:
-        loop.close()
+    return upstream_loop.run(coro)
+
+
+def iter_async(agen):
+    """Drive an async generator from sync code (for Flask streaming responses)"""
+    return upstream_loop.iterate(agen)
+
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _form_request_data() -> Dict[str, Any]:
+    """
+    /generate fields from a multipart/form-data request.
+
+    Form values are strings; "n" and "stream" are converted so the usual
+    validation applies.
+    """
+    data: Dict[str, Any] = request.form.to_dict()
+    if "n" in data and data["n"].strip().isdigit():
+        data["n"] = int(data["n"])
+    if "stream" in data and data["stream"].lower() in ("true", "false", "1", "0"):
+        data["stream"] = data["stream"].lower() in ("true", "1")
+    return data
+
+
+def _reference_images_from_upload() -> List[ReferenceImage]:
+    """Uploaded "reference_images" files, wrapped without copying their bytes."""
+    uploads = [f for f in request.files.getlist("reference_images") if f.filename]
+    if len(uploads) > MAX_REFERENCE_IMAGES:
+        raise ValueError(f"At most {MAX_REFERENCE_IMAGES} reference images allowed")
+
+    images = []
+    for upload in uploads:
+        fallback = upload.mimetype if upload.mimetype.startswith("image/") else None
+        try:
+            image = ReferenceImage(upload.stream)
+        except ValueError:
+            if fallback is None:
+                raise
+            image = ReferenceImage(upload.stream, fallback)
+        images.append(image)
+
+    if sum(image.size for image in images) > MAX_REFERENCE_BYTES:
+        raise ValueError(
+            f"Reference images exceed {MAX_REFERENCE_BYTES // (1024 * 1024)} MB in total"
+        )
+    return images
+
+
+def _check_prompt(prompt: Any) -> str:
+    """Return prompt if it is a non-empty string within MAX_PROMPT_CHARS."""
+    if not isinstance(prompt, str) or not prompt.strip() or len(prompt) > MAX_PROMPT_CHARS:
+        raise ValueError(
+            f"'prompt' must be a non-empty string of at most {MAX_PROMPT_CHARS} characters"
+        )
+    return prompt
 
 
-def _validate_and_parse_request(data: Dict[str, Any]) -> Dict[str, Any]:
+def _validate_and_parse_request(
+    data: Dict[str, Any],
+    reference_images: Optional[List[ReferenceImage]] = None
+) -> Dict[str, Any]:
     if not data or "prompt" not in data:
         raise ValueError("Missing 'prompt' in request")
 
-    user_prompt = data["prompt"]
-    if not isinstance(user_prompt, str) or not user_prompt.strip():
-        raise ValueError("'prompt' must be a non-empty string")
+    user_prompt = _check_prompt(data["prompt"])
 
     quality = data.get("quality", "detailed")
     model = data.get("model", "flash")
@@ -65,6 +163,9 @@ def _validate_and_parse_request(data: Dict[str, Any]) -> Dict[str, Any]:
     aspect_ratio = data.get("aspect_ratio")
     image_size = data.get("image_size")
     brand_profile = data.get("brand_profile")
+    stream = data.get("stream", False)
+    n = data.get("n", 1)
+    tier = data.get("tier")
 
     if quality not in VALID_QUALITIES:
         raise ValueError(
@@ -80,6 +181,23 @@ def _validate_and_parse_request(data: Dict[str, Any]) -> Dict[str, Any]:
         )
     if brand_profile and not isinstance(brand_profile, str):
         raise ValueError("'brand_profile' must be a string")
+    if not isinstance(stream, bool):
+        raise ValueError("'stream' must be a boolean")
+    if isinstance(n, bool) or not isinstance(n, int) or not (1 <= n <= MAX_VARIATIONS):
+        raise ValueError(
+            f"Invalid n: {n}. Must be integer between 1 and {MAX_VARIATIONS}"
+        )
+    if stream and n > 1:
+        raise ValueError("'stream' supports a single image (n=1)")
+    if tier is not None:
+        if tier not in backend_router.registry.tiers:
+            raise ValueError(
+                f"Invalid tier: {tier}. Must be one of {sorted(backend_router.registry.tiers)}"
+            )
+        if stream or n > 1:
+            raise ValueError("'tier' supports a single, non-streamed image")
+        # Fail fast (400) when no backend of the tier takes these options
+        backend_router.registry.candidates(tier, aspect_ratio, image_size, reference_images)
 
     return {
         "user_prompt": user_prompt.strip(),
@@ -88,7 +206,11 @@ def _validate_and_parse_request(data: Dict[str, Any]) -> Dict[str, Any]:
         "format": output_format,
         "aspect_ratio": aspect_ratio,
         "image_size": image_size,
-        "brand_profile": brand_profile
+        "brand_profile": brand_profile,
+        "stream": stream,
+        "n": n,
+        "tier": tier,
+        "reference_images": reference_images or []
     }
 
 
@@ -107,15 +229,35 @@ def _build_enhanced_prompt(parsed: Dict[str, Any]) -> Dict[str, Any]:
     quality = parsed["quality"]
     brand_profile = parsed["brand_profile"]
 
-    # Step 1: Classify domain
-    domain, confidence = classifier.classify_with_confidence(user_prompt)
+    key = PromptCache.key(user_prompt, quality, brand_profile)
+    entry = prompt_cache.get(key) if prompt_cache is not None else None
+    if entry is None:
+        analyzer = keyword_config.analyzer
+        entry = _enhance_subject(analyzer, normalize(user_prompt), quality, brand_profile)
+        # Skip results from a configuration swapped out meanwhile (the cache was cleared)
+        if prompt_cache is not None and analyzer is keyword_config.analyzer:
+            prompt_cache.put(key, entry)
+
+    # The user's own text goes where the template placed the subject
+    return {**entry, "enhanced_prompt": entry["enhanced_prompt"].replace(SUBJECT, user_prompt)}
+
 
-    # Step 2: Suggest subcategory
-    subcategory = template_engine.suggest_subcategory(user_prompt, domain)
+def _enhance_subject(
+    analyzer: PromptAnalyzer,
+    prompt: str,
+    quality: str,
+    brand_profile: Optional[str]
+) -> Dict[str, Any]:
+    """Decisions and enhanced prompt for a normalized prompt, subject left as SUBJECT."""
+    # Steps 1-2: Classify domain and suggest subcategory (one scan)
+    analysis = analyzer.analyze(prompt)
+    domain = analysis["domain"]
+    confidence = analysis["confidence"]
+    subcategory = analysis["subcategory"]
 
     # Step 3: Enhance prompt
-    enhanced_prompt = template_engine.enhance(
-        user_prompt,
+    enhanced_prompt = analyzer.template_engine.enhance(
+        SUBJECT,
         domain=domain,
         quality=quality,
         subcategory=subcategory
@@ -128,60 +270,295 @@ def _build_enhanced_prompt(parsed: Dict[str, Any]) -> Dict[str, Any]:
         "enhanced_prompt": enhanced_prompt,
         "domain": domain,
         "subcategory": subcategory,
-        "domain_confidence": confidence
+        "domain_confidence": confidence,
+        "enhancer": "keyword"
     }
 
 
-def _format_image_response(
+async def _prepare_prompt(parsed: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    _build_enhanced_prompt, escalated to the LLM enhancer when hybrid routing
+    finds the keyword confidence too low (keeping the keyword result if the
+    LLM call fails).
+
+    LLM results are the model's rewrite of the literal prompt, with no
+    SUBJECT placeholder, so they are cached under PromptCache.exact_key:
+    a case or whitespace variant escalates on its own.
+    """
+    analyzer = keyword_config.analyzer
+    prompt_info = _build_enhanced_prompt(parsed)
+    if hybrid_enhancer is None or not hybrid_enhancer.should_escalate(prompt_info):
+        return prompt_info
+
+    key = PromptCache.exact_key(parsed["user_prompt"], parsed["quality"], parsed["brand_profile"])
+    cached = prompt_cache.get(key) if prompt_cache is not None else None
+    if cached is not None:
+        hybrid_enhancer.record_cached()
+        return cached
+
+    enhancement = await hybrid_enhancer.escalate(parsed["user_prompt"])
+    if enhancement is None:
+        return prompt_info
+
+    prompt_info = {
+        "enhanced_prompt": brand_profile_manager.apply(
+            enhancement["enhanced_prompt"], parsed["brand_profile"]
+        ),
+        "domain": enhancement["domain"],
+        "subcategory": enhancement["style"],
+        "domain_confidence": enhancement["confidence"],
+        "enhancer": "llm"
+    }
+    # Skip results from a configuration swapped out meanwhile (the cache was cleared)
+    if prompt_cache is not None and analyzer is keyword_config.analyzer:
+        prompt_cache.put(key, prompt_info)
+    return prompt_info
+
+
+def _response_metadata(
     parsed: Dict[str, Any],
     prompt_info: Dict[str, Any],
-    result: Dict[str, Any]
+    image_size_bytes: int,
+    mime_type: Optional[str],
+    image_header: bytes = b""
 ) -> Dict[str, Any]:
+    # Header-only probe: dimensions without decoding pixels
+    probe = probe_image(image_header) or {}
+    return {
+        "original_prompt": parsed["user_prompt"],
+        "quality": parsed["quality"],
+        "domain_confidence": prompt_info["domain_confidence"],
+        "enhancer": prompt_info["enhancer"],
+        "image_size_bytes": image_size_bytes,
+        "mime_type": mime_type,
+        "width": probe.get("width"),
+        "height": probe.get("height"),
+        "bit_depth": probe.get("bit_depth"),
+        "color_type": probe.get("color_type"),
+        "aspect_ratio": parsed["aspect_ratio"],
+        "image_size": parsed["image_size"],
+        "brand_profile": parsed["brand_profile"],
+        "reference_images": len(parsed.get("reference_images", [])),
+        "timestamp": datetime.now(UTC).isoformat()
+    }
+
+
+def _data_uri(result: Dict[str, Any]) -> str:
     image_b64 = base64.b64encode(result["image_data"]).decode("utf-8")
-    image_data_uri = f"data:{result['mime_type']};base64,{image_b64}"
+    return f"data:{result['mime_type']};base64,{image_b64}"
+
 
+def _format_image_response(
+    parsed: Dict[str, Any],
+    prompt_info: Dict[str, Any],
+    result: Dict[str, Any]
+) -> Dict[str, Any]:
     return {
-        "image": image_data_uri,
+        "image": _data_uri(result),
         "enhanced_prompt": prompt_info["enhanced_prompt"],
         "domain": prompt_info["domain"],
         "subcategory": prompt_info["subcategory"],
         "model": parsed["model"],
-        "metadata": {
-            "original_prompt": parsed["user_prompt"],
-            "quality": parsed["quality"],
-            "domain_confidence": prompt_info["domain_confidence"],
-            "image_size_bytes": len(result["image_data"]),
-            "mime_type": result["mime_type"],
-            "aspect_ratio": parsed["aspect_ratio"],
-            "image_size": parsed["image_size"],
-            "brand_profile": parsed["brand_profile"],
-            "timestamp": datetime.now(UTC).isoformat()
-        }
+        "metadata": _response_metadata(
+            parsed, prompt_info, len(result["image_data"]), result["mime_type"],
+            result["image_data"]
+        )
     }
 
 
-async def _generate_single_async(parsed: Dict[str, Any]) -> Dict[str, Any]:
-    prompt_info = _build_enhanced_prompt(parsed)
+def _format_variations_response(
+    parsed: Dict[str, Any],
+    prompt_info: Dict[str, Any],
+    results: List[Dict[str, Any]]
+) -> Dict[str, Any]:
+    # "image" stays the first variation so n=1 clients keep working
+    response = _format_image_response(parsed, prompt_info, results[0])
+    response["images"] = [_data_uri(result) for result in results]
+    response["metadata"]["variations"] = len(results)
+    response["metadata"]["image_size_bytes"] = [len(r["image_data"]) for r in results]
+    response["metadata"]["dimensions"] = [
+        [probe.get("width"), probe.get("height")]
+        for probe in (probe_image(r["image_data"]) or {} for r in results)
+    ]
+    return response
+
+
+def gemini_client() -> GeminiClient:
+    """
+    Upstream client for one request.
+
+    Reuses the shared connection pool (run it via run_async/iter_async),
+    spreads calls over the key pool and uploads repeated reference images
+    once when configured.
+    """
+    return GeminiClient(
+        key_pool=key_pool,
+        http_client=upstream_http,
+        file_cache=file_cache,
+        catalog=model_catalog,
+        timeouts=upstream_timeouts
+    )
+
+
+async def _discover_models():
+    """
+    List available models unless the cached catalog is fresh.
 
-    async with GeminiClient() as client:
-        result = await client.generate_image(
+    Failure only logs - validation then keeps the old copy or falls back to
+    the built-in checks.
+    """
+    try:
+        async with gemini_client() as client:
+            if await model_catalog.refresh(client):
+                print(f"Model catalog: discovered {len(model_catalog.models)} models")
+    except Exception as e:
+        print(f"WARNING: model discovery failed: {e}")
+
+
+if model_catalog is not None:
+    run_async(_discover_models())
+
+
+async def _generate_with_client(
+    client: GeminiClient,
+    parsed: Dict[str, Any],
+    prompt_info: Dict[str, Any]
+) -> Dict[str, Any]:
+    if model_catalog is not None and model_catalog.claim_refresh():
+        # Past the TTL: this one request re-lists, the others use the stale copy
+        await _discover_models()
+
+    if parsed.get("tier"):
+        result = await backend_router.generate(
+            client,
+            parsed["tier"],
             prompt_info["enhanced_prompt"],
+            aspect_ratio=parsed["aspect_ratio"],
+            image_size=parsed["image_size"],
+            reference_images=parsed["reference_images"]
+        )
+        response = _format_image_response(parsed, prompt_info, result)
+        response["model"] = result["backend"]
+        response["metadata"]["tier"] = result["tier"]
+        response["metadata"]["cost_usd"] = result["cost_usd"]
+        return response
+
+    if parsed["n"] > 1:
+        results = await client.generate_images(
+            prompt_info["enhanced_prompt"],
+            n=parsed["n"],
             model=parsed["model"],
             aspect_ratio=parsed["aspect_ratio"],
-            image_size=parsed["image_size"]
+            image_size=parsed["image_size"],
+            reference_images=parsed["reference_images"]
         )
-
+        return _format_variations_response(parsed, prompt_info, results)
+
+    result = await client.generate_image(
+        prompt_info["enhanced_prompt"],
+        model=parsed["model"],
+        aspect_ratio=parsed["aspect_ratio"],
+        image_size=parsed["image_size"],
+        reference_images=parsed["reference_images"]
+    )
     return _format_image_response(parsed, prompt_info, result)
 
 
+async def _generate_single_async(parsed: Dict[str, Any]) -> Dict[str, Any]:
+    prompt_info = await _prepare_prompt(parsed)
+
+    async with gemini_client() as client:
+        return await _generate_with_client(client, parsed, prompt_info)
+
+
+async def _generate_stream_async(parsed: Dict[str, Any], prompt_info: Dict[str, Any]):
+    """
+    Server-sent events for a streamed /generate.
+
+    Events: prompt -> text* -> image_chunk* -> image_end -> done (or error).
+    Each image_chunk carries base64 of its own bytes; decode each chunk and
+    concatenate the bytes (the base64 strings are not joinable as text).
+    """
+    yield _sse("prompt", {
+        "enhanced_prompt": prompt_info["enhanced_prompt"],
+        "domain": prompt_info["domain"],
+        "subcategory": prompt_info["subcategory"],
+        "model": parsed["model"]
+    })
+
+    image_size_bytes = 0
+    mime_type = None
+    image_header = bytearray()  # first bytes of image 0, for the metadata probe
+    try:
+        async with gemini_client() as client:
+            async for event in client.stream_image(
+                prompt_info["enhanced_prompt"],
+                model=parsed["model"],
+                aspect_ratio=parsed["aspect_ratio"],
+                image_size=parsed["image_size"],
+                reference_images=parsed["reference_images"]
+            ):
+                if event["type"] == "text":
+                    yield _sse("text", {"text": event["text"]})
+                elif event["type"] == "image_chunk":
+                    image_size_bytes += len(event["data"])
+                    if event["index"] == 0 and len(image_header) < HEADER_BYTES:
+                        image_header += event["data"][:HEADER_BYTES - len(image_header)]
+                    yield _sse("image_chunk", {
+                        "index": event["index"],
+                        "data": base64.b64encode(event["data"]).decode("ascii")
+                    })
+                elif event["type"] == "image_end":
+                    mime_type = mime_type or event["mime_type"]
+                    yield _sse("image_end", {
+                        "index": event["index"],
+                        "mime_type": event["mime_type"],
+                        "bytes": event["bytes"]
+                    })
+
+    except ValueError:
+        yield _sse("error", {"error": "Invalid request parameters"})
+        return
+
+    except Exception as e:
+        print(f"ERROR: {e}")
+        yield _sse("error", {"error": "Internal server error"})
+        return
+
+    yield _sse("done", {
+        "metadata": _response_metadata(
+            parsed, prompt_info, image_size_bytes, mime_type, bytes(image_header)
+        )
+    })
+
+
 @app.route("/health", methods=["GET"])
 def health():
     """Health check endpoint for Cloud Run"""
-    return jsonify({
+    body = {
         "status": "healthy",
         "service": "nanobanana-image-generation",
         "timestamp": datetime.now(UTC).isoformat()
-    })
+    }
+    if key_pool is not None:
+        body["api_keys"] = {"available": key_pool.available(), "keys": key_pool.stats()}
+    if file_cache is not None:
+        body["file_cache"] = file_cache.stats()
+    if cassette is not None:
+        body["cassette"] = cassette.stats()
+    if model_catalog is not None:
+        body["model_catalog"] = model_catalog.stats()
+    if upstream_timeouts is not None:
+        body["timeouts"] = upstream_timeouts.stats()
+    body["keywords"] = keyword_config.stats()
+    if prompt_cache is not None:
+        body["prompt_cache"] = prompt_cache.stats()
+    if hybrid_enhancer is not None:
+        body["prompt_routing"] = hybrid_enhancer.stats()
+    routes = backend_router.stats()
+    if routes:
+        body["backends"] = {"strategy": backend_router.strategy, "routes": routes}
+    return jsonify(body)
 
 
 @app.route("/generate", methods=["POST"])
@@ -197,7 +574,11 @@ def generate_image():
             "aspect_ratio": "16:9", # optional: 1:1/16:9/9:16/4:3/3:4
             "image_size": "2K",     # optional: 1K/2K/4K
             "brand_profile": "modern_tech", # optional: named brand profile
-            "format": "base64"      # optional: base64/url
+            "format": "base64",     # optional: base64/url
+            "stream": false,        # optional: true = text/event-stream
+            "n": 1,                 # optional: 1-8 variations
+            "tier": "fast"          # optional: fast/standard/quality - routed
+                                    # across Gemini/Imagen backends (overrides model)
         }
 
     Response:
@@ -210,14 +591,40 @@ def generate_image():
             "metadata": {...}
         }
 
+    With "n" > 1 the response adds "images" (all variations, "image" is
+    the first) and metadata.variations.
+
+    With "stream": true the response is text/event-stream: the model's text
+    commentary and image bytes are forwarded as they arrive (see
+    _generate_stream_async for the event sequence).
+
+    Image edits / style references: send multipart/form-data with the same
+    fields as form values plus up to MAX_REFERENCE_IMAGES files in
+    "reference_images". Uploads are streamed to the model without being
+    copied into memory.
+
     Example:
         curl -X POST http://localhost:8080/generate \\
              -H "Content-Type: application/json" \\
              -d '{"prompt": "sunset over mountains"}'
+
+        curl -X POST http://localhost:8080/generate \\
+             -F prompt="same logo, embossed on leather" \\
+             -F reference_images=@logo.png
     """
     try:
-        data = request.get_json()
-        parsed = _validate_and_parse_request(data)
+        if request.mimetype == "multipart/form-data":
+            parsed = _validate_and_parse_request(
+                _form_request_data(), _reference_images_from_upload()
+            )
+        else:
+            parsed = _validate_and_parse_request(request.get_json())
+        if parsed["stream"]:
+            # Build the prompt up front so bad input still gets a 400
+            prompt_info = run_async(_prepare_prompt(parsed))
+            events = iter_async(_generate_stream_async(parsed, prompt_info))
+            return Response(stream_with_context(events), mimetype="text/event-stream")
+
         response = run_async(_generate_single_async(parsed))
         return jsonify(response), 200
 
@@ -268,21 +675,15 @@ def generate_batch():
         async def process_batch(items: List[Dict[str, Any]]) -> Dict[str, Any]:
             semaphore = asyncio.Semaphore(max_concurrent)
 
-            async with GeminiClient() as client:
+            async with gemini_client() as client:
                 async def process_item(index: int, item: Dict[str, Any]) -> Dict[str, Any]:
                     try:
                         parsed = _validate_and_parse_request(item)
-                        prompt_info = _build_enhanced_prompt(parsed)
+                        prompt_info = await _prepare_prompt(parsed)
 
                         async with semaphore:
-                            result = await client.generate_image(
-                                prompt_info["enhanced_prompt"],
-                                model=parsed["model"],
-                                aspect_ratio=parsed["aspect_ratio"],
-                                image_size=parsed["image_size"]
-                            )
-
-                        payload = _format_image_response(parsed, prompt_info, result)
+                            payload = await _generate_with_client(client, parsed, prompt_info)
+
                         payload["status"] = "success"
                         payload["index"] = index
                         return payload
@@ -326,7 +727,8 @@ def classify():
             "domain": "photography",
             "confidence": 0.85,
             "scores": {"photography": 3, "diagrams": 0, ...},
-            "suggested_subcategory": "portrait"
+            "suggested_subcategory": "portrait",
+            "subcategory_scores": {"portrait": 1, "landscape": 0, ...}
         }
     """
     try:
@@ -334,19 +736,21 @@ def classify():
         if not data or "prompt" not in data:
             return jsonify({"error": "Missing 'prompt' in request"}), 400
 
-        user_prompt = data["prompt"]
+        try:
+            user_prompt = _check_prompt(data["prompt"])
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
 
-        # Classify
-        domain, confidence = classifier.classify_with_confidence(user_prompt)
-        scores = classifier.get_all_scores(user_prompt)
-        subcategory = template_engine.suggest_subcategory(user_prompt, domain)
+        # Classify (domain, scores and subcategory from one scan)
+        analysis = keyword_config.analyzer.analyze(user_prompt)
 
         return jsonify({
-            "domain": domain,
-            "confidence": confidence,
-            "scores": scores,
-            "suggested_subcategory": subcategory,
-            "available_subcategories": template_engine.get_available_subcategories(domain)
+            "domain": analysis["domain"],
+            "confidence": analysis["confidence"],
+            "scores": analysis["scores"],
+            "suggested_subcategory": analysis["subcategory"],
+            "subcategory_scores": analysis["subcategory_scores"],
+            "available_subcategories": list(analysis["subcategory_scores"])
         }), 200
 
     except Exception as e:
@@ -381,22 +785,25 @@ def enhance():
         if not data or "prompt" not in data:
             return jsonify({"error": "Missing 'prompt' in request"}), 400
 
-        user_prompt = data["prompt"]
+        try:
+            user_prompt = _check_prompt(data["prompt"])
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         domain = data.get("domain")
         subcategory = data.get("subcategory")
         quality = data.get("quality", "detailed")
         brand_profile = data.get("brand_profile")
 
-        # Auto-detect domain if not provided
-        if not domain:
-            domain, _ = classifier.classify_with_confidence(user_prompt)
+        analyzer = keyword_config.analyzer
 
-        # Auto-suggest subcategory if not provided
-        if not subcategory:
-            subcategory = template_engine.suggest_subcategory(user_prompt, domain)
+        # Auto-detect domain and/or suggest subcategory if not provided (one scan)
+        if not domain or not subcategory:
+            analysis = analyzer.analyze(user_prompt, domain=domain)
+            domain = analysis["domain"]
+            subcategory = subcategory or analysis["subcategory"]
 
         # Enhance
-        enhanced = template_engine.enhance(
+        enhanced = analyzer.template_engine.enhance(
             user_prompt,
             domain=domain,
             quality=quality,
@@ -427,6 +834,27 @@ def brand_profiles():
     }), 200
 
 
+@app.route("/admin/reload-keywords", methods=["POST"])
+def reload_keywords():
+    """
+    Recompile templates/keywords.json + templates.json and swap them in.
+
+    Enabled only when ADMIN_TOKEN is set; send it as X-Admin-Token.
+    In-flight requests finish on the previous configuration.
+    """
+    admin_token = os.getenv("ADMIN_TOKEN")
+    if not admin_token:
+        return jsonify({"error": "Not found"}), 404
+    if not hmac.compare_digest(request.headers.get("X-Admin-Token", ""), admin_token):
+        return jsonify({"error": "Forbidden"}), 403
+
+    try:
+        keyword_config.reload()
+    except (OSError, ValueError) as e:
+        return jsonify({"error": f"Reload failed, keeping current configuration: {e}"}), 400
+    return jsonify(keyword_config.stats()), 200
+
+
 @app.route("/", methods=["GET"])
 def index():
     """
@@ -481,7 +909,9 @@ def index():
   "model": "flash",       // optional: flash/pro
   "aspect_ratio": "16:9", // optional: 1:1/16:9/9:16/4:3/3:4
   "image_size": "2K",     // optional: 1K/2K/4K
-  "brand_profile": "modern_tech" // optional
+  "brand_profile": "modern_tech", // optional
+  "stream": true,         // optional: server-sent events
+  "n": 4                  // optional: 1-8 variations
 }</pre>
         </div>
 
@@ -0,0 +1,275 @@
+"""
+Model Catalog - Discover available models once, validate requests locally
+
+Lists the models the API key can use (GET /v1beta/models) with their
+supported generation methods, joins them with the image options each model
+family accepts, and caches the result on disk with a TTL. GeminiClient
+then rejects unavailable models and invalid option combinations before any
+upstream call, instead of paying a round trip for a 400/404.
+
+models.list does not report image options (aspect ratios, sizes), so those
+come from IMAGE_OPTIONS for the image models we know; discovery decides
+which of them exist for this key and which methods each one serves.
+
+Example:
+    catalog = ModelCatalog("/tmp/nanobanana_models.json", ttl_seconds=24 * 3600)
+    async with GeminiClient(catalog=catalog) as client:
+        await catalog.refresh(client)          # no-op while the disk copy is fresh
+        await client.generate_image("...", model="flash", image_size="4K")
+
+A long-running process re-lists once the TTL has passed: callers ask
+claim_refresh() per request, and the one caller it answers True refreshes
+while everyone else keeps validating against the stale copy.
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Dict, FrozenSet, List, Optional
+
+from gemini_client import GeminiClient
+
+
+def _image_options() -> Dict[str, Dict]:
+    options = {}
+    for alias, model_id in GeminiClient.MODELS.items():
+        options[model_id] = {
+            "aspect_ratios": sorted(GeminiClient.ASPECT_RATIOS),
+            "image_sizes": sorted(GeminiClient.IMAGE_SIZES),
+            "max_candidates": GeminiClient.MAX_CANDIDATES.get(alias, 1)
+        }
+    for alias, model_id in GeminiClient.IMAGEN_MODELS.items():
+        options[model_id] = {
+            "aspect_ratios": sorted(GeminiClient.IMAGEN_ASPECT_RATIOS),
+            "image_sizes": sorted(GeminiClient.IMAGEN_IMAGE_SIZES[alias]),
+            "max_candidates": GeminiClient.MAX_IMAGEN_SAMPLES
+        }
+    return options
+
+
+# Image options per model id (not part of the models.list response)
+IMAGE_OPTIONS = _image_options()
+
+# Methods models.list does not report; each is served wherever the mapped one is
+IMPLIED_METHODS = {"streamGenerateContent": "generateContent"}
+
+
+class _ModelEntry:
+    """Frozen view of one catalog entry, for set-lookup validation."""
+
+    __slots__ = ("methods", "aspect_ratios", "image_sizes", "max_candidates")
+
+    def __init__(self, raw: Dict):
+        self.methods: FrozenSet[str] = frozenset(raw.get("methods", []))
+        self.aspect_ratios: Optional[FrozenSet[str]] = (
+            frozenset(raw["aspect_ratios"]) if "aspect_ratios" in raw else None
+        )
+        self.image_sizes: Optional[FrozenSet[str]] = (
+            frozenset(raw["image_sizes"]) if "image_sizes" in raw else None
+        )
+        self.max_candidates: Optional[int] = raw.get("max_candidates")
+
+
+class ModelCatalog:
+    """
+    Discovered models and their options, persisted as JSON with a TTL.
+
+    Until the first discovery (or when none has succeeded) validate() lets
+    everything through, so the client's built-in checks still apply and a
+    failed listing never blocks generation.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        ttl_seconds: float = 24 * 3600,
+        retry_seconds: float = 300.0
+    ):
+        """
+        Initialize catalog.
+
+        Args:
+            path: JSON file shared between workers and restarts (None = memory only)
+            ttl_seconds: Age after which refresh() lists the models again
+            retry_seconds: Wait between claim_refresh() grants (so a failing
+                           listing isn't retried on every request)
+        """
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.retry_seconds = retry_seconds
+        self.fetched_at = 0.0
+        self.validations = 0
+        self.rejections = 0
+
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._claimed_at = 0.0
+        self._raw: Dict[str, Dict] = {}
+        self._entries: Dict[str, _ModelEntry] = {}
+        self._load()
+
+    @classmethod
+    def from_env(cls) -> Optional["ModelCatalog"]:
+        """
+        Build a catalog from GEMINI_MODEL_CATALOG, if set.
+
+        "memory" keeps it in process; anything else is a JSON file path.
+        GEMINI_MODEL_CATALOG_TTL sets ttl_seconds.
+        """
+        setting = os.getenv("GEMINI_MODEL_CATALOG")
+        if not setting:
+            return None
+        return cls(
+            path=None if setting == "memory" else setting,
+            ttl_seconds=float(os.getenv("GEMINI_MODEL_CATALOG_TTL", str(24 * 3600)))
+        )
+
+    def __contains__(self, model_id: str) -> bool:
+        return model_id in self._entries
+
+    @property
+    def models(self) -> List[str]:
+        return sorted(self._entries)
+
+    def fresh(self) -> bool:
+        return bool(self._entries) and time.time() - self.fetched_at < self.ttl_seconds
+
+    def claim_refresh(self) -> bool:
+        """
+        True if the caller should refresh() now: the catalog is stale, no
+        claimed refresh is still running, and the last claim is at least
+        retry_seconds old. Cheap enough to ask on every request.
+        """
+        now = time.time()
+        with self._lock:
+            if self._refreshing or self.fresh() or now - self._claimed_at < self.retry_seconds:
+                return False
+            self._refreshing = True
+            self._claimed_at = now
+            return True
+
+    def get(self, model_id: str) -> Optional[Dict]:
+        """Cached description of a model (methods and image options)."""
+        with self._lock:
+            raw = self._raw.get(model_id)
+            return dict(raw) if raw is not None else None
+
+    async def refresh(self, client: GeminiClient, force: bool = False) -> bool:
+        """
+        List models through client unless the cached copy is still fresh.
+
+        Returns:
+            True if a listing was fetched
+        """
+        if self.fresh() and not force:
+            self._refreshing = False
+            return False
+
+        try:
+            listed = await client.list_models()
+        finally:
+            self._refreshing = False
+        raw = {}
+        for model in listed:
+            model_id = model.get("name", "").rsplit("/", 1)[-1]
+            if not model_id:
+                continue
+            raw[model_id] = {
+                "methods": sorted(model.get("supportedGenerationMethods", [])),
+                **IMAGE_OPTIONS.get(model_id, {})
+            }
+        self._install(raw, time.time())
+        self._save()
+        return True
+
+    def validate(
+        self,
+        model_id: str,
+        method: str,
+        aspect_ratio: Optional[str] = None,
+        image_size: Optional[str] = None,
+        candidate_count: int = 1
+    ):
+        """
+        Reject a call the upstream API would refuse.
+
+        Raises:
+            ValueError: Model not available to this key, method not served,
+                        or an image option the model does not support
+        """
+        entries = self._entries
+        if not entries:
+            return
+        self.validations += 1
+
+        entry = entries.get(model_id)
+        if entry is None:
+            problem = f"Model {model_id} is not available for this API key"
+        elif IMPLIED_METHODS.get(method, method) not in entry.methods:
+            problem = f"Model {model_id} does not support {method}"
+        elif aspect_ratio and entry.aspect_ratios is not None and aspect_ratio not in entry.aspect_ratios:
+            problem = (
+                f"Invalid aspect_ratio: {aspect_ratio}. "
+                f"Model {model_id} supports {sorted(entry.aspect_ratios)}"
+            )
+        elif image_size and entry.image_sizes is not None and image_size not in entry.image_sizes:
+            problem = (
+                f"Invalid image_size: {image_size}. "
+                f"Model {model_id} supports {sorted(entry.image_sizes)}"
+            )
+        elif entry.max_candidates is not None and candidate_count > entry.max_candidates:
+            problem = (
+                f"Invalid candidate_count: {candidate_count}. "
+                f"Model {model_id} supports at most {entry.max_candidates}"
+            )
+        else:
+            return
+
+        self.rejections += 1
+        raise ValueError(problem)
+
+    def stats(self) -> Dict:
+        return {
+            "models": len(self._entries),
+            "age_seconds": round(time.time() - self.fetched_at, 1) if self.fetched_at else None,
+            "fresh": self.fresh(),
+            "validations": self.validations,
+            "rejections": self.rejections
+        }
+
+    def _install(self, raw: Dict[str, Dict], fetched_at: float):
+        entries = {model_id: _ModelEntry(item) for model_id, item in raw.items()}
+        with self._lock:
+            self._raw = raw
+            # One reference swap: validate() never sees a half-built catalog
+            self._entries = entries
+            self.fetched_at = fetched_at
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            self._install(data["models"], float(data["fetched_at"]))
+        except (OSError, ValueError, KeyError, TypeError):
+            # A corrupt catalog is just a cold one
+            return
+
+    def _save(self):
+        if not self.path:
+            return
+        with self._lock:
+            data = {"fetched_at": self.fetched_at, "models": self._raw}
+        # A temp file per writer: workers starting together must not share one
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".models-", suffix=".part")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(data, f, indent=1, sort_keys=True)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
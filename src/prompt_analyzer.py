@@ -0,0 +1,74 @@
+"""
+Prompt Analyzer - Domain and subcategory from one scan of the prompt
+
+Request preparation needs the domain, its confidence, the per-domain scores
+(/classify) and the best template subcategory. Asking DomainClassifier and
+TemplateEngine separately scans the prompt once per question; this compiles
+domain and subcategory keywords into one automaton and answers everything
+from a single pass, with the same decisions as the separate calls.
+
+Example:
+    analyzer = PromptAnalyzer(DomainClassifier(), TemplateEngine())
+    analyzer.analyze("AWS microservices architecture diagram")
+    # {"domain": "diagrams", "confidence": 1.0, "scores": {...},
+    #  "subcategory": "architecture", "subcategory_scores": {...}}
+"""
+
+from typing import Any, Dict, List, Optional
+
+from domain_classifier import DomainClassifier
+from keyword_matcher import KeywordMatcher
+from template_engine import TemplateEngine
+
+
+class PromptAnalyzer:
+    """Single-pass domain + subcategory analysis over a shared keyword automaton."""
+
+    def __init__(self, classifier: DomainClassifier, template_engine: TemplateEngine):
+        self.classifier = classifier
+        self.template_engine = template_engine
+
+        # Groups 0..len(domains)-1 are domains, the rest subcategories
+        self.domains: List[str] = list(classifier.keywords)
+        self.subcategories: List[str] = list(template_engine.subcategory_keywords)
+        groups = [
+            *classifier.keywords.values(),
+            *template_engine.subcategory_keywords.values()
+        ]
+        self.matcher = KeywordMatcher(dict(enumerate(groups)))
+        self._keyword_groups = [group for group, _ in self.matcher.keywords]
+
+    def analyze(self, prompt: str, domain: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Analyze a prompt in one scan.
+
+        Args:
+            prompt: User prompt
+            domain: Pick the subcategory within this domain instead of the
+                    detected one (confidence and scores stay the detected ones)
+
+        Returns:
+            {"domain", "confidence", "scores", "subcategory", "subcategory_scores"}
+            - subcategory_scores covers the chosen domain's subcategories
+        """
+        counts = [0] * (len(self.domains) + len(self.subcategories))
+        keyword_groups = self._keyword_groups
+        for keyword_index in self.matcher.matched(prompt):
+            counts[keyword_groups[keyword_index]] += 1
+
+        split = len(self.domains)
+        domain_scores = dict(zip(self.domains, counts[:split]))
+        subcategory_scores = dict(zip(self.subcategories, counts[split:]))
+
+        detected, confidence = self.classifier.decide_for(prompt, domain_scores)
+        domain = domain or detected
+        return {
+            "domain": domain,
+            "confidence": confidence,
+            "scores": domain_scores,
+            "subcategory": self.template_engine.pick_subcategory(domain, subcategory_scores),
+            "subcategory_scores": {
+                subcategory: subcategory_scores.get(subcategory, 0)
+                for subcategory in self.template_engine.get_available_subcategories(domain)
+            }
+        }
@@ -0,0 +1,117 @@
+"""
+Prompt Cache - Bounded LRU of enhancement results keyed on the normalized prompt
+
+Traffic repeats itself: the same prompt arrives again, often differing only
+in case or whitespace. Classification, subcategory choice, templating and
+brand rules depend on none of that, so the whole result of
+_build_enhanced_prompt is cached per (normalized prompt, quality, brand
+profile) and a repeat skips the CPU path entirely.
+
+Entries hold the enhanced prompt with the SUBJECT placeholder where the
+user's text goes; filling it with the request's own prompt keeps the output
+byte-identical to an uncached build (the user's casing and wording are
+preserved, only the decisions are shared).
+
+Results that can't carry the placeholder - LLM rewrites of the whole
+prompt - go under exact_key() instead, so they are only reused for the
+very same prompt text.
+
+Example:
+    cache = PromptCache(max_entries=4096)
+    key = cache.key("Headshot of a  CEO", "detailed", None)  # same as "headshot of a CEO"
+    entry = cache.get(key)
+    if entry is None:
+        cache.put(key, build(...))
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+# Stands in for the user's prompt inside cached enhanced prompts
+SUBJECT = "\0subject\0"
+
+# key(): (normalized prompt, quality, brand); exact_key(): ("exact", prompt, quality, brand)
+CacheKey = Tuple[Optional[str], ...]
+
+
+def normalize(prompt: str) -> str:
+    """Whitespace-collapsed prompt (what classification sees)."""
+    return " ".join(prompt.split())
+
+
+class PromptCache:
+    """Thread-safe LRU of enhancement results with hit/miss counters."""
+
+    def __init__(self, max_entries: int = 4096):
+        """
+        Initialize cache.
+
+        Args:
+            max_entries: Results kept; the least recently used is evicted first
+        """
+        if max_entries < 1:
+            raise ValueError(f"Invalid max_entries: {max_entries}. Must be >= 1")
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._entries: "OrderedDict[CacheKey, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> Optional["PromptCache"]:
+        """Build from PROMPT_CACHE_SIZE (default 4096); 0 disables."""
+        size = int(os.getenv("PROMPT_CACHE_SIZE", "4096"))
+        if size <= 0:
+            return None
+        return cls(max_entries=size)
+
+    @staticmethod
+    def key(prompt: str, quality: str, brand_profile: Optional[str]) -> CacheKey:
+        return normalize(prompt).casefold(), quality, brand_profile or None
+
+    @staticmethod
+    def exact_key(prompt: str, quality: str, brand_profile: Optional[str]) -> CacheKey:
+        """Key for results built from the literal prompt (never shared with key())."""
+        return "exact", prompt, quality, brand_profile or None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: CacheKey) -> Optional[Dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: CacheKey, entry: Dict):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop every entry (templates or keywords changed); counters are kept."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions
+            }
@@ -7,7 +7,10 @@ This is just string formatting - no fancy category theory needed!
 
 import json
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Dict, List, Optional
+
+from keyword_config import load_keywords
+from keyword_matcher import KeywordMatcher
 
 
 class TemplateEngine:
@@ -25,13 +28,22 @@ class TemplateEngine:
         #           shot on Phase One XF IQ4 150MP, Schneider Kreuznach 110mm..."
     """
 
-    def __init__(self, templates_path: Optional[str] = None):
+    # Subcategory keywords (matched like DomainClassifier keywords), from templates/keywords.json
+    SUBCATEGORY_KEYWORDS: Dict[str, List[str]] = load_keywords()["subcategories"]
+
+    def __init__(
+        self,
+        templates_path: Optional[str] = None,
+        subcategory_keywords: Optional[Dict[str, List[str]]] = None
+    ):
         """
         Initialize template engine with templates from JSON file.
 
         Args:
             templates_path: Path to templates.json file
                            (defaults to ../templates/templates.json)
+            subcategory_keywords: Subcategory -> keywords
+                                  (defaults to SUBCATEGORY_KEYWORDS)
         """
         if templates_path is None:
             # Default to templates directory
@@ -41,6 +53,12 @@ class TemplateEngine:
         with open(templates_path, "r") as f:
             self.templates: Dict = json.load(f)
 
+        # Compiled once; suggest_subcategory is then a single scan
+        self.subcategory_keywords = (
+            subcategory_keywords if subcategory_keywords is not None else self.SUBCATEGORY_KEYWORDS
+        )
+        self.subcategory_matcher = KeywordMatcher(self.subcategory_keywords)
+
     def enhance(
         self,
         user_input: str,
@@ -138,38 +156,25 @@ class TemplateEngine:
             subcat = engine.suggest_subcategory("CEO portrait", "photography")
             # Returns: "portrait"
         """
+        return self.pick_subcategory(domain, self.subcategory_matcher.scores(user_input))
+
+    def pick_subcategory(self, domain: str, subcategory_scores: Dict[str, int]) -> str:
+        """
+        Best subcategory of a domain from precomputed keyword scores.
+
+        Args:
+            domain: Domain name
+            subcategory_scores: Subcategory -> keyword matches (from
+                                subcategory_matcher, e.g. via PromptAnalyzer)
+
+        Returns:
+            Highest-scoring subcategory of the domain, or its first if none matched
+        """
         if domain not in self.templates:
             return list(self.templates[domain].keys())[0]  # Default to first
 
-        user_input_lower = user_input.lower()
         subcategories = self.get_available_subcategories(domain)
-
-        # Simple keyword matching for subcategories
-        subcategory_keywords = {
-            "portrait": ["portrait", "headshot", "face", "person", "people"],
-            "landscape": ["landscape", "scenery", "mountains", "sunset", "nature"],
-            "product": ["product", "item", "package", "merchandise"],
-            "macro": ["macro", "close-up", "detail", "extreme"],
-            "architecture": ["architecture", "system", "infrastructure", "microservices"],
-            "flowchart": ["flow", "process", "workflow", "steps"],
-            "wireframe": ["wireframe", "mockup", "UI", "interface", "screen"],
-            "technical": ["technical", "schematic", "engineering", "blueprint"],
-            "painting": ["painting", "paint", "impressionist", "oil", "watercolor"],
-            "digital_art": ["digital", "illustration", "artwork"],
-            "3d_render": ["3D", "render", "blender", "cinema 4d"],
-            "abstract": ["abstract", "geometric", "shapes"],
-            "ecommerce": ["ecommerce", "amazon", "shopify", "store"],
-            "lifestyle": ["lifestyle", "real-world", "in use"],
-            "editorial": ["editorial", "magazine", "fashion"],
-            "advertising": ["advertising", "commercial", "campaign"]
-        }
-
-        # Score each subcategory
-        scores = {}
-        for subcat in subcategories:
-            keywords = subcategory_keywords.get(subcat, [])
-            score = sum(1 for kw in keywords if kw in user_input_lower)
-            scores[subcat] = score
+        scores = {subcat: subcategory_scores.get(subcat, 0) for subcat in subcategories}
 
         # Return subcategory with highest score, or first if no matches
         max_score = max(scores.values())
@@ -13,6 +13,9 @@ class FakeGeminiClient:
     ASPECT_RATIOS = RealGeminiClient.ASPECT_RATIOS
     IMAGE_SIZES = RealGeminiClient.IMAGE_SIZES
 
+    def __init__(self, **kwargs):
+        self.options = kwargs
+
     async def __aenter__(self):
         return self
 
@@ -25,13 +28,17 @@ class FakeGeminiClient:
         model="flash",
         aspect_ratio=None,
         image_size=None,
-        max_retries=3
+        max_retries=3,
+        reference_images=None
     ):
         if aspect_ratio and aspect_ratio not in self.ASPECT_RATIOS:
             raise ValueError("Invalid aspect_ratio")
         if image_size and image_size not in self.IMAGE_SIZES:
             raise ValueError("Invalid image_size")
 
+        FakeGeminiClient.last_reference_images = [
+            (image.mime_type, image.size) for image in reference_images or []
+        ]
         return {
             "image_data": b"fake-image-bytes",
             "mime_type": "image/png",
@@ -39,6 +46,52 @@ class FakeGeminiClient:
             "prompt": prompt
         }
 
+    async def predict_images(
+        self,
+        prompt,
+        model="imagen",
+        n=1,
+        aspect_ratio=None,
+        image_size=None,
+        max_retries=3
+    ):
+        return [{
+            "image_data": b"fake-imagen-bytes",
+            "mime_type": "image/png",
+            "model": model,
+            "prompt": prompt
+        }]
+
+    async def generate_images(
+        self,
+        prompt,
+        n=4,
+        model="flash",
+        aspect_ratio=None,
+        image_size=None,
+        max_concurrent=4,
+        max_retries=3,
+        reference_images=None
+    ):
+        return [
+            await self.generate_image(prompt, model, aspect_ratio, image_size)
+            for _ in range(n)
+        ]
+
+    async def stream_image(
+        self,
+        prompt,
+        model="flash",
+        aspect_ratio=None,
+        image_size=None,
+        max_retries=3,
+        reference_images=None
+    ):
+        yield {"type": "text", "text": "Here you go."}
+        yield {"type": "image_chunk", "index": 0, "data": b"fake-"}
+        yield {"type": "image_chunk", "index": 0, "data": b"image-bytes"}
+        yield {"type": "image_end", "index": 0, "mime_type": "image/png", "bytes": 16}
+
 
 @pytest.fixture
 def client(monkeypatch):
@@ -128,3 +181,253 @@ def test_enhance_applies_brand_profile(client):
     assert "brand tone:" in body["enhanced_prompt"]
     expected_tone = api_main.brand_profile_manager.get_profile("luxury_editorial")["tone"]
     assert f"brand tone: {expected_tone}" in body["enhanced_prompt"]
+
+
+def test_generate_stream_emits_server_sent_events(client):
+    import base64
+    import json
+
+    response = client.post(
+        "/generate",
+        json={"prompt": "sunset over mountains", "stream": True}
+    )
+
+    assert response.status_code == 200
+    assert response.mimetype == "text/event-stream"
+
+    events = []
+    for block in response.get_data(as_text=True).strip().split("\n\n"):
+        name, data = block.split("\n", 1)
+        events.append((name[len("event: "):], json.loads(data[len("data: "):])))
+
+    names = [name for name, _ in events]
+    assert names == ["prompt", "text", "image_chunk", "image_chunk", "image_end", "done"]
+    image = b"".join(base64.b64decode(data["data"]) for name, data in events if name == "image_chunk")
+    assert image == b"fake-image-bytes"
+    assert events[-1][1]["metadata"]["image_size_bytes"] == len(image)
+
+
+def test_generate_stream_rejects_non_boolean(client):
+    response = client.post("/generate", json={"prompt": "sunset", "stream": "yes"})
+    assert response.status_code == 400
+
+
+def test_generate_returns_all_variations(client):
+    response = client.post("/generate", json={"prompt": "bakery logo", "n": 3})
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert len(body["images"]) == 3
+    assert body["image"] == body["images"][0]
+    assert body["metadata"]["variations"] == 3
+
+
+def test_generate_rejects_invalid_variation_count(client):
+    for n in (0, 9, "4", True):
+        response = client.post("/generate", json={"prompt": "bakery logo", "n": n})
+        assert response.status_code == 400
+
+
+def test_prompt_size_limit_is_enforced_before_processing(client, monkeypatch):
+    monkeypatch.setattr(api_main, "MAX_PROMPT_CHARS", 100)
+    long_prompt = "sunset over mountains " * 5
+
+    assert client.post("/generate", json={"prompt": long_prompt[:100]}).status_code == 200
+    assert client.post("/generate", json={"prompt": long_prompt}).status_code == 400
+    message = "'prompt' must be a non-empty string of at most 100 characters"
+    for path in ("/classify", "/enhance"):
+        for prompt in (long_prompt, 42, "   "):
+            response = client.post(path, json={"prompt": prompt})
+            assert response.status_code == 400
+            assert response.get_json()["error"] == message
+
+    response = client.post("/generate/batch", json={"requests": [{"prompt": long_prompt}]})
+    assert response.get_json()["results"][0]["error"] == message
+
+
+def test_generate_accepts_multipart_reference_images(client):
+    import io
+
+    png = b"\x89PNG\r\n\x1a\n" + b"\x00" * 2048
+    response = client.post(
+        "/generate",
+        data={
+            "prompt": "same logo, embossed on leather",
+            "n": "1",
+            "reference_images": [(io.BytesIO(png), "logo.png"), (io.BytesIO(b"\xff\xd8\xff" + b"\x01" * 10), "ref.jpg")]
+        },
+        content_type="multipart/form-data"
+    )
+
+    assert response.status_code == 200
+    assert response.get_json()["metadata"]["reference_images"] == 2
+    assert FakeGeminiClient.last_reference_images == [("image/png", len(png)), ("image/jpeg", 13)]
+
+
+def test_generate_rejects_unknown_reference_image_type(client):
+    import io
+
+    response = client.post(
+        "/generate",
+        data={"prompt": "edit this", "reference_images": [(io.BytesIO(b"not an image"), "notes.txt")]},
+        content_type="multipart/form-data"
+    )
+    assert response.status_code == 400
+
+
+def test_generate_metadata_includes_probed_dimensions(client, monkeypatch):
+    from fake_gemini_server import build_png
+
+    png = build_png(1024, 576, 4_000)
+
+    async def generate_png(self, prompt, **kwargs):
+        return {"image_data": png, "mime_type": "image/png", "model": "flash", "prompt": prompt}
+
+    monkeypatch.setattr(FakeGeminiClient, "generate_image", generate_png)
+    response = client.post("/generate", json={"prompt": "wide banner", "aspect_ratio": "16:9"})
+
+    metadata = response.get_json()["metadata"]
+    assert (metadata["width"], metadata["height"]) == (1024, 576)
+    assert metadata["bit_depth"] == 8
+    assert metadata["color_type"] == "rgb"
+
+
+def test_generate_routes_tier_across_backends(client, monkeypatch):
+    router = api_main.LatencyRouter(api_main.BackendRegistry.default())
+    monkeypatch.setattr(api_main, "backend_router", router)
+
+    first = client.post("/generate", json={"prompt": "red bicycle", "tier": "fast"}).get_json()
+    second = client.post("/generate", json={"prompt": "red bicycle", "tier": "fast"}).get_json()
+
+    # Each unmeasured candidate is tried once before latency decides
+    assert {first["model"], second["model"]} == {"imagen-fast", "flash"}
+    assert first["metadata"]["tier"] == "fast"
+    assert first["metadata"]["cost_usd"] > 0
+    assert {route["backend"] for route in router.stats()} == {"imagen-fast", "flash"}
+
+
+def test_generate_rejects_unknown_tier_or_variations(client):
+    assert client.post("/generate", json={"prompt": "x", "tier": "turbo"}).status_code == 400
+    response = client.post("/generate", json={"prompt": "x", "tier": "fast", "n": 2})
+    assert response.status_code == 400
+
+
+def test_generate_reuses_cached_enhancement_for_normalized_prompt(client, monkeypatch):
+    cache = api_main.PromptCache(max_entries=8)
+    monkeypatch.setattr(api_main, "prompt_cache", cache)
+
+    first = client.post("/generate", json={"prompt": "Headshot of a CEO"}).get_json()
+    second = client.post("/generate", json={"prompt": "  headshot   of a ceo "}).get_json()
+
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+    assert second["domain"] == first["domain"] == "photography"
+    # Decisions are shared, the request's own wording is kept
+    assert "Headshot of a CEO" in first["enhanced_prompt"]
+    assert second["enhanced_prompt"] == first["enhanced_prompt"].replace(
+        "Headshot of a CEO", "headshot   of a ceo"
+    )
+    assert client.get("/health").get_json()["prompt_cache"]["hits"] == 1
+
+
+class FakeLLMEnhancer:
+    calls = []
+    keys = []
+
+    def __init__(self, api_key=None, http_client=None):
+        FakeLLMEnhancer.keys.append(api_key)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+    async def enhance_prompt(self, user_prompt, max_retries=3):
+        FakeLLMEnhancer.calls.append(user_prompt)
+        if "fail" in user_prompt:
+            raise ValueError("LLM enhancement failed")
+        return {
+            "domain": "art",
+            "style": "abstract",
+            "confidence": 0.9,
+            "enhanced_prompt": f"LLM: {user_prompt}",
+            "original_prompt": user_prompt
+        }
+
+
+def test_hybrid_routing_escalates_only_low_confidence_prompts(client, monkeypatch):
+    hybrid = api_main.HybridEnhancer(threshold=0.6, enhancer_factory=FakeLLMEnhancer)
+    monkeypatch.setattr(api_main, "hybrid_enhancer", hybrid)
+    monkeypatch.setattr(api_main, "prompt_cache", api_main.PromptCache(max_entries=8))
+    FakeLLMEnhancer.calls = []
+
+    clear = client.post("/generate", json={"prompt": "AWS architecture diagram"}).get_json()
+    vague = client.post("/generate", json={"prompt": "something vague"}).get_json()
+    again = client.post("/generate", json={"prompt": "something vague"}).get_json()
+    variant = client.post("/generate", json={"prompt": "Something  vague"}).get_json()
+    failed = client.post("/generate", json={"prompt": "please fail"}).get_json()
+
+    assert clear["metadata"]["enhancer"] == "keyword" and clear["domain"] == "diagrams"
+    assert vague["metadata"]["enhancer"] == "llm" and vague["enhanced_prompt"] == "LLM: something vague"
+    assert again["enhanced_prompt"] == vague["enhanced_prompt"]  # cached, no second call
+    # LLM rewrites carry no SUBJECT placeholder: a variant gets its own text
+    assert variant["enhanced_prompt"] == "LLM: Something  vague"
+    assert failed["metadata"]["enhancer"] == "keyword"
+    assert FakeLLMEnhancer.calls == ["something vague", "Something  vague", "please fail"]
+
+    # The keyword entry for the normalized prompt was not overwritten
+    key = api_main.PromptCache.key("something vague", "detailed", None)
+    assert api_main.prompt_cache.get(key)["enhancer"] == "keyword"
+
+    stats = client.get("/health").get_json()["prompt_routing"]
+    assert (stats["prompts"], stats["escalated"], stats["llm_cached"], stats["llm_failures"]) == (5, 4, 1, 1)
+
+
+def test_hybrid_routing_leases_llm_keys_from_the_pool(monkeypatch):
+    pool = api_main.KeyPool(["key-a", "key-b"])
+    hybrid = api_main.HybridEnhancer(enhancer_factory=FakeLLMEnhancer, key_pool=pool)
+    FakeLLMEnhancer.keys = []
+
+    for prompt in ("something vague", "another vague one"):
+        assert api_main.run_async(hybrid.escalate(prompt))["domain"] == "art"
+    assert sorted(FakeLLMEnhancer.keys) == ["key-a", "key-b"]
+    assert [(key["requests"], key["in_flight"]) for key in pool.stats()] == [(1, 0), (1, 0)]
+
+    # Pool-only deployments need no GOOGLE_API_KEY; with neither, startup fails
+    monkeypatch.setenv("PROMPT_ROUTING", "hybrid")
+    monkeypatch.delenv("GOOGLE_API_KEY", raising=False)
+    assert api_main.HybridEnhancer.from_env(key_pool=pool).key_pool is pool
+    with pytest.raises(ValueError, match="GOOGLE_API_KEYS"):
+        api_main.HybridEnhancer.from_env()
+
+
+def test_admin_reload_swaps_keyword_configuration(client, monkeypatch, tmp_path):
+    import json
+    from keyword_config import load_keywords
+
+    keywords = load_keywords()
+    path = tmp_path / "keywords.json"
+    path.write_text(json.dumps(keywords))
+    config = api_main.KeywordReloader(keywords_path=path, on_reload=api_main.prompt_cache.clear)
+    monkeypatch.setattr(api_main, "keyword_config", config)
+
+    assert client.post("/admin/reload-keywords").status_code == 404
+    monkeypatch.setenv("ADMIN_TOKEN", "secret")
+    assert client.post("/admin/reload-keywords", headers={"X-Admin-Token": "nope"}).status_code == 403
+
+    before = config.analyzer
+    assert client.post("/classify", json={"prompt": "zorblax render"}).get_json()["domain"] == "photography"
+
+    keywords["domains"]["art"].append("zorblax")
+    path.write_text(json.dumps(keywords))
+    response = client.post("/admin/reload-keywords", headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 200 and response.get_json()["version"] == 2
+    assert config.analyzer is not before
+    assert client.post("/classify", json={"prompt": "zorblax render"}).get_json()["domain"] == "art"
+
+    # A broken file keeps the current configuration
+    path.write_text("{not json")
+    response = client.post("/admin/reload-keywords", headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 400
+    assert client.post("/classify", json={"prompt": "zorblax render"}).get_json()["domain"] == "art"
+    assert client.get("/health").get_json()["keywords"]["failures"] == 1
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "src"))
+from domain_classifier import DomainClassifier  # noqa: E402
+from keyword_matcher import KeywordMatcher  # noqa: E402
+
+
+def reference_scores(text, keywords):
+    """The old per-keyword substring loop, for lowercase keywords."""
+    lowered = text.lower()
+    return {domain: sum(1 for kw in kws if kw in lowered) for domain, kws in keywords.items()}
+
+
+def test_matcher_agrees_with_substring_loop_for_lowercase_keywords():
+    keywords = {
+        group: [kw for kw in kws if kw == kw.lower()]
+        for group, kws in DomainClassifier.DOMAIN_KEYWORDS.items()
+    }
+    matcher = KeywordMatcher(keywords)
+    prompts = [
+        "headshot of a CEO",
+        "photorealistic oil painting of a golden hour cityscape",
+        "shotshotshot",  # overlapping repeats count once
+        "product packaging on white background for e-commerce catalog",
+        "",
+    ]
+    for prompt in prompts:
+        assert matcher.scores(prompt) == reference_scores(prompt, keywords)
+
+
+def test_mixed_case_keywords_match_case_insensitively_as_whole_words():
+    classifier = DomainClassifier()
+
+    assert classifier.get_all_scores("aws and uml diagram")["diagrams"] == 3
+    assert classifier.get_all_scores("shot on a canon at iso 100")["photography"] == 3
+    # Acronyms inside other words are not hits
+    assert classifier.get_all_scores("she draws an isometric city")["diagrams"] == 0
+    assert KeywordMatcher({"ui": ["UI"]}).scores("build a UI, not a build") == {"ui": 1}
+
+
+def test_classify_keeps_default_and_tie_order():
+    classifier = DomainClassifier()
+
+    assert classifier.classify("something unrelated") == "photography"
+    assert classifier.classify_with_confidence("something unrelated") == ("photography", 0.5)
+    assert classifier.classify_with_confidence("AWS architecture diagram") == ("diagrams", 1.0)
+    assert KeywordMatcher({"a": ["x"], "b": ["x"]}).matches("x") == {"a": ["x"], "b": ["x"]}
+
+
+def test_prompt_analyzer_matches_separate_calls():
+    from prompt_analyzer import PromptAnalyzer
+    from template_engine import TemplateEngine
+
+    classifier = DomainClassifier()
+    engine = TemplateEngine()
+    analyzer = PromptAnalyzer(classifier, engine)
+    prompts = [
+        "headshot of a CEO",
+        "AWS microservices architecture diagram",
+        "login screen wireframe with a clean UI",
+        "impressionist oil painting of a sunset",
+        "product photo for Amazon store listing",
+        "something unrelated",
+    ]
+    for prompt in prompts:
+        analysis = analyzer.analyze(prompt)
+        domain, confidence = classifier.classify_with_confidence(prompt)
+        assert (analysis["domain"], analysis["confidence"]) == (domain, confidence)
+        assert analysis["scores"] == classifier.get_all_scores(prompt)
+        assert analysis["subcategory"] == engine.suggest_subcategory(prompt, domain)
+        assert list(analysis["subcategory_scores"]) == engine.get_available_subcategories(domain)
+
+    assert analyzer.analyze("wireframe of a UI", domain="diagrams")["subcategory"] == "wireframe"
+
+
+def test_classify_many_matches_single_prompt_path(monkeypatch):
+    pytest.importorskip("numpy")
+    import keyword_matcher
+
+    classifier = DomainClassifier()
+    # Small batches and long prompts loop; force the lockstep path too
+    assert not classifier.matcher.prefers_batch(["AWS diagram"] * 10)
+    assert not classifier.matcher.prefers_batch(["x" * 4096] * 1000)
+    assert classifier.matcher.prefers_batch(["AWS diagram"] * 1000)
+    monkeypatch.setattr(keyword_matcher, "BATCH_MIN_TEXTS", 1)
+    monkeypatch.setattr(keyword_matcher, "BATCH_MAX_MEAN_CHARS", 1 << 20)
+    prompts = [
+        "",
+        "something unrelated",
+        "AWS architecture diagram",
+        "headshot photo of a CEO, shot on a Canon",
+        "watercolor painting à la française",
+        "写真 portrait with \0 inside",
+        "UI build",
+        "x" * 5000 + " diagram",
+    ] * 3
+    assert classifier.classify_many(prompts) == [
+        classifier.classify_with_confidence(prompt) for prompt in prompts
+    ]
+    assert classifier.classify_many([]) == []
+
+
+LABELED = [
+    ("headshot of a CEO in soft window light", "photography"),
+    ("portrait photo with shallow depth of field", "photography"),
+    ("golden hour landscape shot on a 35mm lens", "photography"),
+    ("street photograph of a rainy city at night", "photography"),
+    ("AWS architecture diagram with three microservices", "diagrams"),
+    ("UI screenshot of the login flow", "diagrams"),
+    ("flowchart of the checkout process", "diagrams"),
+    ("network topology of the data center", "diagrams"),
+    ("impressionist oil painting of a harbor", "art"),
+    ("watercolor illustration of a fox", "art"),
+    ("surreal digital artwork of floating islands", "art"),
+    ("charcoal sketch of an old man", "art"),
+    ("white background studio shot of a sneaker", "products"),
+    ("e-commerce listing image for a coffee mug", "products"),
+    ("lifestyle packaging photo for a skincare bottle", "products"),
+    ("Amazon catalog image of headphones", "products"),
+]
+
+
+def test_hashed_classifier_round_trip_and_plugs_into_classifier(tmp_path):
+    pytest.importorskip("numpy")
+    from hashed_classifier import HashedClassifier
+    from prompt_analyzer import PromptAnalyzer
+    from template_engine import TemplateEngine
+
+    prompts = [prompt for prompt, _ in LABELED]
+    model = HashedClassifier.train(prompts, [domain for _, domain in LABELED])
+    path = str(tmp_path / "domain.npz")
+    model.save(path)
+    loaded = HashedClassifier.load(path)
+
+    assert [d for d, _ in loaded.classify_many(prompts)] == [d for _, d in LABELED]
+    for prompt in prompts:
+        domain, confidence = loaded.classify_with_confidence(prompt)
+        assert (domain, pytest.approx(confidence, abs=1e-6)) == model.classify_with_confidence(prompt)
+
+    # Keyword matching reads "shot" inside "screenshot" as photography
+    prompt = "screenshot of the settings page UI"
+    assert DomainClassifier().classify(prompt) == "photography"
+    classifier = DomainClassifier(model=loaded)
+    assert classifier.classify(prompt) == "diagrams"
+    analysis = PromptAnalyzer(classifier, TemplateEngine()).analyze(prompt)
+    assert (analysis["domain"], analysis["confidence"]) == classifier.classify_with_confidence(prompt)
+
+
+def test_keyword_reloader_watcher_picks_up_file_changes(tmp_path):
+    import json
+    import os
+    import time
+    from keyword_config import load_keywords
+    from keyword_reloader import KeywordReloader
+
+    keywords = load_keywords()
+    path = tmp_path / "keywords.json"
+    path.write_text(json.dumps(keywords))
+    reloads = []
+    config = KeywordReloader(keywords_path=path, on_reload=lambda: reloads.append(1))
+    config.start(interval=0.02)
+    try:
+        keywords["subcategories"]["wireframe"].append("zorblax")
+        path.write_text(json.dumps(keywords))
+        os.utime(path, (time.time() + 5, time.time() + 5))  # mtime granularity
+        deadline = time.time() + 5
+        while config.version < 2 and time.time() < deadline:
+            time.sleep(0.01)
+    finally:
+        config.stop()
+
+    assert config.version == 2 and reloads == [1]
+    assert config.analyzer.analyze("zorblax", domain="diagrams")["subcategory"] == "wireframe"
+
+
+def test_keyword_reloader_rejects_domains_and_subcategories_without_templates(tmp_path):
+    import json
+    from keyword_config import load_keywords
+    from keyword_reloader import KeywordReloader
+
+    keywords = load_keywords()
+    path = tmp_path / "keywords.json"
+    path.write_text(json.dumps(keywords))
+    config = KeywordReloader(keywords_path=path)
+
+    for section, group in (("domains", "fashion"), ("subcategories", "couture")):
+        broken = json.loads(json.dumps(keywords))
+        broken[section][group] = ["runway", "couture"]
+        path.write_text(json.dumps(broken))
+        with pytest.raises(ValueError, match="without templates"):
+            config.reload()
+        assert config.version == 1
+    assert config.analyzer.analyze("runway couture look")["domain"] in config.template_engine.templates
+
+    with pytest.raises(ValueError, match="without templates"):
+        KeywordReloader(keywords_path=path)
+
+
+def test_benchmark_corpus_labels_match_example_libraries():
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), "benchmarks"))
+    from classifier_corpus import load_corpus, synthetic_prompts
+    from template_engine import TemplateEngine
+
+    templates = TemplateEngine().templates
+    corpus = load_corpus()
+    assert len(corpus) >= 40
+    for item in corpus:
+        assert item["domain"] in templates
+        assert item["subcategory"] is None or item["subcategory"] in templates[item["domain"]]
+    long_prompts = synthetic_prompts(corpus, 4096, 5)
+    assert all(len(item["prompt"]) == 4096 for item in long_prompts)
+
+
+def test_spanish_keywords_fold_accents_and_leave_english_prompts_alone():
+    import json
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), "benchmarks"))
+    from classifier_corpus import load_corpus
+    from keyword_config import KEYWORDS_PATH, load_keywords
+
+    matcher = KeywordMatcher({"photography": ["fotografía"]})
+    for text in ["FOTOGRAFÍA", "fotografia", "fotografía", "写真 Fotografía"]:
+        assert matcher.scores(text) == {"photography": 1}
+
+    classifier = DomainClassifier()
+    assert classifier.classify("Retrato de una mujer al atardecer, iluminación suave") == "photography"
+    assert classifier.classify("Diagrama de flujo del proceso de pago") == "diagrams"
+    # Generic words are whole-word keywords: no hits inside longer words
+    scores = classifier.get_all_scores("Retrato fotográfico de una mujer al atardecer")
+    assert scores["diagrams"] == 0 and scores["photography"] > 0
+    assert classifier.get_all_scores("Botella de agua, estilo de vida, fondo blanco")["art"] == 0
+    assert classifier.classify_with_confidence("Foto de una red de pesca") == ("photography", 1.0)
+    assert classifier.get_all_scores("Gráficos de fotones y fotosíntesis")["photography"] == 0
+
+    # The Spanish set alone finds nothing in the English examples
+    spanish = json.loads(KEYWORDS_PATH.read_text(encoding="utf-8"))["languages"]["es"]
+    base = load_keywords(languages=())
+    assert all(
+        keyword not in base[section][group]
+        for section in ("domains", "subcategories")
+        for group, keywords in spanish[section].items()
+        for keyword in keywords
+    )
+    spanish_only = KeywordMatcher(
+        {f"{section}/{group}": kws for section in spanish for group, kws in spanish[section].items()}
+    )
+    english = [item["prompt"] for item in load_corpus() if not item["source"].startswith("Conceptos")]
+    assert english and all(not any(spanish_only.scores(prompt).values()) for prompt in english)
+
+
+def test_only_the_scan_window_of_a_long_prompt_is_classified():
+    from keyword_matcher import MAX_SCAN_CHARS, scan_window
+
+    head = "architecture diagram of the checkout flow, "
+    filler = "calm and balanced " * (MAX_SCAN_CHARS // 18)
+    prompt = head + filler + "portrait photo headshot " * 1000
+    assert len(scan_window(prompt)) <= MAX_SCAN_CHARS
+    assert scan_window(head) == head
+
+    # Cut at whitespace: a truncated "UIX" must not match "UI" as a whole word
+    window = scan_window("x " * (MAX_SCAN_CHARS // 2 - 1) + "UIX")
+    assert not window.endswith("UI")
+
+    classifier = DomainClassifier()
+    assert classifier.classify_with_confidence(prompt) == ("diagrams", 1.0)
+    pytest.importorskip("numpy")
+    assert classifier.classify_many([prompt]) == [("diagrams", 1.0)]
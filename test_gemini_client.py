@@ -0,0 +1,684 @@
+#!/usr/bin/env python3
+import asyncio
+import os
+import sys
+import time
+
+import httpx
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "src"))
+from fake_gemini_server import FakeGeminiServer, parse_latency  # noqa: E402
+from gemini_client import GeminiClient, SyncGeminiClient  # noqa: E402
+from image_backends import BackendRegistry, LatencyRouter  # noqa: E402
+from model_catalog import ModelCatalog  # noqa: E402
+from adaptive_timeouts import AdaptiveTimeouts  # noqa: E402
+
+SMALL_IMAGES = {"1K": 4_000, "2K": 16_000, "4K": 64_000}
+
+
+@pytest.fixture
+def fake_api():
+    def start(**options):
+        options.setdefault("image_bytes", SMALL_IMAGES)
+        fake = FakeGeminiServer(seed=7, **options)
+        server, base_url = fake.start_in_thread()
+        servers.append(server)
+        return fake, base_url
+
+    servers = []
+    yield start
+    for server in servers:
+        server.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_generate_image_against_fake_server(fake_api):
+    fake, base_url = fake_api()
+
+    async with GeminiClient(api_key="fake", base_url=base_url) as client:
+        result = await client.generate_image("a red ball", image_size="2K", aspect_ratio="16:9")
+
+    assert result["mime_type"] == "image/png"
+    assert result["image_data"].startswith(b"\x89PNG\r\n\x1a\n")
+    assert abs(len(result["image_data"]) - SMALL_IMAGES["2K"]) < 64
+    assert fake.stats["images"] == 1
+
+
+@pytest.mark.asyncio
+async def test_empty_image_response_raises(fake_api):
+    _, base_url = fake_api(empty_image_rate=1.0)
+
+    async with GeminiClient(api_key="fake", base_url=base_url) as client:
+        with pytest.raises(ValueError, match="No image data"):
+            await client.generate_image("a red ball")
+
+
+@pytest.mark.asyncio
+async def test_injected_errors_surface_as_http_errors(fake_api):
+    fake, base_url = fake_api(error_rate_429=1.0)
+
+    async with GeminiClient(api_key="fake", base_url=base_url) as client:
+        with pytest.raises(httpx.HTTPStatusError) as err:
+            await client.generate_image("a red ball", max_retries=1)
+
+    assert err.value.response.status_code == 429
+    assert fake.stats["status_429"] == 1
+
+
+def test_latency_specs():
+    import random
+
+    rng = random.Random(1)
+    assert parse_latency("fixed:1.5")(rng) == 1.5
+    assert 1.0 <= parse_latency("uniform:1,2")(rng) <= 2.0
+    assert parse_latency("lognormal:3,0.4")(rng) > 0
+    with pytest.raises(ValueError):
+        parse_latency("gamma:1")
+
+
+def test_inline_data_extractor_decodes_across_chunk_boundaries():
+    import base64
+    import json
+
+    from gemini_client import _InlineDataExtractor
+
+    image = bytes(range(256)) * 40
+    body = json.dumps({
+        "candidates": [{"content": {"parts": [
+            {"text": 'commentary with "data": "not-an-image"'},
+            {"inlineData": {"mimeType": "image/png", "data": base64.b64encode(image).decode()}}
+        ]}}]
+    }).replace("/", "\\/").encode()
+
+    for chunk_size in (1, 3, 7, 64, 4096):
+        out = bytearray()
+        extractor = _InlineDataExtractor(lambda index: out.extend)
+        for i in range(0, len(body), chunk_size):
+            extractor.feed(body[i:i + chunk_size])
+        data = extractor.finish()
+
+        assert bytes(out) == image
+        parts = data["candidates"][0]["content"]["parts"]
+        assert parts[0]["text"] == 'commentary with "data": "not-an-image"'
+        assert parts[1]["inlineData"] == {"mimeType": "image/png", "data": ""}
+
+
+@pytest.mark.asyncio
+async def test_generate_and_save_streams_to_disk(fake_api, tmp_path):
+    _, base_url = fake_api()
+    output = tmp_path / "out.png"
+
+    async with GeminiClient(api_key="fake", base_url=base_url) as client:
+        path = await client.generate_and_save("a red ball", str(output), image_size="4K")
+        sink = bytearray(b"prefix")
+        result = await client.generate_image_into("a red ball", sink, image_size="4K")
+
+    assert path == str(output)
+    assert output.read_bytes() == bytes(sink[len(b"prefix"):])
+    assert result["bytes_written"] == output.stat().st_size
+    assert result["text"] == "Here is the image you requested."
+    assert not (tmp_path / "out.png.part").exists()
+
+
+@pytest.mark.asyncio
+async def test_stream_image_yields_text_then_image_chunks(fake_api):
+    _, base_url = fake_api(image_bytes={"2K": 400_000})
+
+    async with GeminiClient(api_key="fake", base_url=base_url) as client:
+        events = [event async for event in client.stream_image("a red ball", image_size="2K")]
+        expected = await client.generate_image("a red ball", image_size="2K")
+
+    assert events[0] == {"type": "text", "text": "Here is the image you requested."}
+    chunks = [e["data"] for e in events if e["type"] == "image_chunk"]
+    assert len(chunks) > 1
+    assert b"".join(chunks) == expected["image_data"]
+    assert events[-1]["type"] == "image_end"
+    assert events[-1]["mime_type"] == "image/png"
+    assert events[-1]["bytes"] == len(expected["image_data"])
+
+
+@pytest.mark.asyncio
+async def test_generate_images_falls_back_to_parallel_calls(fake_api):
+    fake, base_url = fake_api()
+
+    async with GeminiClient(api_key="fake", base_url=base_url) as client:
+        images = await client.generate_images("a red ball", n=3, max_concurrent=2)
+
+    assert len(images) == 3
+    assert all(image["image_data"].startswith(b"\x89PNG") for image in images)
+    assert fake.stats["requests"] == 3
+
+
+@pytest.mark.asyncio
+async def test_generate_images_uses_multiple_candidates_per_call(fake_api):
+    fake, base_url = fake_api(max_candidates=4)
+
+    async with GeminiClient(api_key="fake", base_url=base_url) as client:
+        client.MAX_CANDIDATES = {"flash": 4, "pro": 1}
+        images = await client.generate_images("a red ball", n=6)
+
+    assert len(images) == 6
+    assert fake.stats["requests"] == 2
+
+
+@pytest.mark.asyncio
+async def test_batch_lifecycle_demultiplexes_to_input_order(fake_api):
+    fake, base_url = fake_api(batch_pending_seconds=0.05, batch_run_seconds=0.1, batch_error_rate=0.3)
+    prompts = [f"catalog item {i}" for i in range(12)]
+
+    async with GeminiClient(api_key="fake", base_url=base_url) as client:
+        batch = await client.submit_batch(prompts, image_size="1K")
+        assert GeminiClient.batch_state(batch) == "PENDING"
+
+        batch = await client.wait_for_batch(batch["name"], poll_interval=0.05, backoff=1.2)
+        assert GeminiClient.batch_state(batch) == "SUCCEEDED"
+
+        results = await client.fetch_batch_results(batch, len(prompts))
+
+    assert len(results) == len(prompts)
+    succeeded = [r for r in results if "image_data" in r]
+    failed = [r for r in results if "error" in r]
+    assert succeeded and failed
+    assert all(r["image_data"].startswith(b"\x89PNG") for r in succeeded)
+    assert len(succeeded) + len(failed) == len(prompts)
+    assert fake.stats["batches"] == 1
+
+
+def test_batch_results_parser_streams_long_lines_in_small_chunks():
+    import base64
+    import json
+    from gemini_client import _BatchResultsParser
+
+    image = b"\x89PNG" + os.urandom(3_000_000)
+    line = json.dumps({
+        "key": "request-1",
+        "response": {"candidates": [{"content": {"parts": [
+            {"inlineData": {"mimeType": "image/png", "data": base64.b64encode(image).decode()}}
+        ]}}]}
+    }).encode()
+    error = json.dumps({"key": "request-0", "error": {"message": "blocked"}}).encode()
+    body = error + b"\n\n  \n" + line + b"\r\n" + line
+
+    parser = _BatchResultsParser()
+    results = []
+    start = time.perf_counter()
+    for offset in range(0, len(body), 4096):
+        results.extend(parser.feed(body[offset:offset + 4096]))
+    results.extend(parser.finish())
+
+    assert results == [
+        (0, {"error": "blocked"}),
+        (1, {"image_data": image, "mime_type": "image/png"}),
+        (1, {"image_data": image, "mime_type": "image/png"}),
+    ]
+    assert time.perf_counter() - start < 5  # re-scanning each partial line took minutes
+
+
+@pytest.mark.asyncio
+async def test_key_pool_routes_around_exhausted_and_revoked_keys(fake_api):
+    from key_pool import KeyPool
+
+    fake, base_url = fake_api(key_requests_per_minute=2, revoked_keys=["key-revoked"])
+    pool = KeyPool(["key-a", "key-b", "key-revoked"])
+
+    async with GeminiClient(key_pool=pool, base_url=base_url) as client:
+        for i in range(4):
+            result = await client.generate_image(f"item {i}", max_retries=3)
+            assert result["image_data"].startswith(b"\x89PNG")
+
+    assert fake.stats["images"] == 4
+    assert fake.key_requests["key-a"] == 2
+    assert fake.key_requests["key-b"] == 2
+    stats = {entry["key"]: entry for entry in pool.stats()}
+    assert stats["...oked"]["last_status"] == 403
+    assert stats["...oked"]["cooldown_seconds"] > 0
+
+
+def test_key_pool_benches_rate_limited_keys():
+    from key_pool import KeyPool
+
+    pool = KeyPool(["key-a", "key-b"], requests_per_minute=1)
+    first, wait = pool.acquire()
+    assert wait == 0
+    pool.release(first, 429, retry_after=90)
+
+    second, wait = pool.acquire()
+    assert second != first and wait == 0
+    pool.release(second, 200)
+
+    # Both keys now blocked: the one that frees up first is returned with a wait
+    third, wait = pool.acquire()
+    assert third == second and 0 < wait <= 60
+    pool.release(third, 200)
+    assert pool.available() == 0
+
+
+def test_sync_client_shares_one_loop_across_threads(fake_api):
+    from concurrent.futures import ThreadPoolExecutor
+
+    fake, base_url = fake_api(latency="fixed:0.05")
+
+    with SyncGeminiClient(api_key="fake", base_url=base_url, max_connections=4) as client:
+        single = client.generate_image("a red ball", image_size="2K")
+        many = client.generate_many([f"item {i}" for i in range(6)], max_concurrent=3)
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            threaded = list(pool.map(lambda i: client.generate_image(f"thread {i}"), range(8)))
+
+    assert single["image_data"].startswith(b"\x89PNG")
+    assert [r["prompt"] for r in many] == [f"item {i}" for i in range(6)]
+    assert len(threaded) == 8
+    assert fake.stats["images"] == 15
+
+
+def test_sync_client_generate_many_can_collect_errors(fake_api):
+    _, base_url = fake_api(error_rate_429=1.0)
+
+    with SyncGeminiClient(api_key="fake", base_url=base_url) as client:
+        results = client.generate_many(["a", "b"], return_exceptions=True, max_retries=1)
+
+    assert all(isinstance(r, httpx.HTTPStatusError) for r in results)
+
+
+@pytest.mark.asyncio
+async def test_reference_images_stream_from_disk_bytes_and_memoryview(fake_api, tmp_path):
+    from fake_gemini_server import build_png
+    from gemini_client import ReferenceImage
+
+    fake, base_url = fake_api()
+    on_disk = build_png(64, 64, 700_001)
+    path = tmp_path / "style.png"
+    path.write_bytes(on_disk)
+    jpeg = b"\xff\xd8\xff" + bytes(range(256)) * 100
+
+    async with GeminiClient(api_key="fake", base_url=base_url) as client:
+        result = await client.generate_image(
+            "same style, new subject",
+            reference_images=[str(path), jpeg, memoryview(bytearray(on_disk[:1000])),
+                              ReferenceImage(b"\x00\x01\x02", "image/png")]
+        )
+
+    assert result["image_data"].startswith(b"\x89PNG")
+    assert fake.input_images == [
+        ("image/png", len(on_disk)), ("image/jpeg", len(jpeg)), ("image/png", 1000), ("image/png", 3)
+    ]
+
+
+def test_reference_image_requires_known_format():
+    from gemini_client import ReferenceImage
+
+    with pytest.raises(ValueError, match="Unrecognized"):
+        ReferenceImage(b"plain text")
+    with pytest.raises(ValueError, match="empty"):
+        ReferenceImage(b"", "image/png")
+
+
+@pytest.mark.asyncio
+async def test_file_cache_uploads_each_reference_once(fake_api, tmp_path):
+    from fake_gemini_server import build_png
+    from gemini_client import UploadedFileCache
+
+    fake, base_url = fake_api()
+    logo = build_png(64, 64, 300_000)
+    cache_path = tmp_path / "files.json"
+    cache = UploadedFileCache(path=str(cache_path), min_bytes=100_000)
+
+    async with GeminiClient(api_key="fake", base_url=base_url, file_cache=cache) as client:
+        for i in range(3):
+            await client.generate_image(f"logo on item {i}", reference_images=[logo, b"\xff\xd8\xff tiny"])
+        await client.generate_images("logo variations", n=2, reference_images=[logo])
+
+    assert fake.stats["files_uploaded"] == 1
+    assert fake.stats["file_references"] == 5
+    assert fake.stats["input_images"] == 3  # the tiny JPEG stays inline
+    assert cache.stats() == {"entries": 1, "hits": 4, "misses": 1, "uploads": 1}
+
+    # A second process picks the upload up from disk
+    reloaded = UploadedFileCache(path=str(cache_path), min_bytes=100_000)
+    async with GeminiClient(api_key="fake", base_url=base_url, file_cache=reloaded) as client:
+        await client.generate_image("logo again", reference_images=[logo])
+    assert fake.stats["files_uploaded"] == 1
+
+
+def test_file_cache_processes_sharing_a_file_keep_each_others_uploads(tmp_path):
+    from gemini_client import UploadedFileCache
+
+    path = str(tmp_path / "files.json")
+    service = UploadedFileCache(path=path)
+    cli = UploadedFileCache(path=path)  # loaded before the service saved anything
+
+    service.put("a", {"uri": "files/a"})
+    cli.put("b", {"uri": "files/b"})
+    assert cli.get("a") == {"uri": "files/a"}
+    assert UploadedFileCache(path=path).get("a") == {"uri": "files/a"}
+
+    # A discarded entry stays gone even though the file still had it
+    service.discard("a")
+    reloaded = UploadedFileCache(path=path)
+    assert reloaded.get("a") is None and reloaded.get("b") == {"uri": "files/b"}
+    assert [p.name for p in tmp_path.iterdir()] == ["files.json"]  # no temp files left
+
+
+@pytest.mark.asyncio
+async def test_file_cache_uploads_once_across_concurrent_clients(fake_api):
+    from gemini_client import UploadedFileCache
+
+    fake, base_url = fake_api(latency="fixed:0.05")
+    logo = b"\x89PNG\r\n\x1a\n" + bytes(200_000)
+    cache = UploadedFileCache(min_bytes=1)
+
+    async def request(i):
+        # One client per request, as the service builds them
+        async with GeminiClient(api_key="fake", base_url=base_url, file_cache=cache) as client:
+            await client.generate_image(f"logo on item {i}", reference_images=[logo])
+
+    await asyncio.gather(*(request(i) for i in range(4)))
+
+    assert fake.stats["files_uploaded"] == 1
+    assert fake.stats["file_references"] == 4
+    assert cache._uploading == {}
+
+
+@pytest.mark.asyncio
+async def test_file_cache_reuploads_expired_or_missing_files(fake_api):
+    from gemini_client import UploadedFileCache
+
+    fake, base_url = fake_api(file_ttl_seconds=600)
+    logo = b"\x89PNG\r\n\x1a\n" + bytes(200_000)
+    cache = UploadedFileCache(min_bytes=1, refresh_margin_seconds=0)
+
+    async with GeminiClient(api_key="fake", base_url=base_url, file_cache=cache) as client:
+        await client.generate_image("first", reference_images=[logo])
+        await client.generate_image("cached", reference_images=[logo])
+        assert fake.stats["files_uploaded"] == 1
+
+        # Within the refresh margin of expirationTime: re-upload up front
+        cache.refresh_margin_seconds = 900
+        await client.generate_image("second", reference_images=[logo])
+        assert fake.stats["files_uploaded"] == 2
+
+        # The server dropped the file before the cache expected: 403, then re-upload
+        cache.refresh_margin_seconds = 0
+        fake._files.clear()
+        await client.generate_image("third", reference_images=[logo], max_retries=2)
+
+    assert fake.stats["files_uploaded"] == 3
+    assert fake.stats["status_403"] == 1
+
+
+@pytest.mark.asyncio
+async def test_hooks_observe_requests_retries_and_errors(fake_api, monkeypatch):
+    import asyncio
+
+    from gemini_client import ClientHooks
+
+    class Recorder(ClientHooks):
+        def __init__(self):
+            self.events = []
+
+        def on_request(self, event):
+            self.events.append(("request", event))
+
+        def on_response(self, event):
+            self.events.append(("response", event))
+
+        def on_retry(self, event):
+            self.events.append(("retry", event))
+
+        def on_error(self, event):
+            self.events.append(("error", event))
+
+    async def no_sleep(seconds):
+        return None
+
+    fake, base_url = fake_api(error_rate_503=0.5)
+    recorder = Recorder()
+    monkeypatch.setattr(asyncio, "sleep", no_sleep)
+
+    async with GeminiClient(api_key="fake", base_url=base_url, hooks=[recorder]) as client:
+        for i in range(6):
+            await client.generate_image(f"item {i}", max_retries=10)
+
+    kinds = [kind for kind, _ in recorder.events]
+    assert kinds.count("response") == 6
+    assert kinds.count("error") == kinds.count("retry") == fake.stats["status_503"] > 0
+    assert kinds.count("request") == fake.stats["requests"]
+
+    response = next(event for kind, event in recorder.events if kind == "response")
+    assert response["model"] == "gemini-2.5-flash-image"
+    assert response["status"] == 200
+    assert response["payload_bytes"] > 0
+    assert response["response_bytes"] > SMALL_IMAGES["1K"]
+    error = next(event for kind, event in recorder.events if kind == "error")
+    assert error["status"] == 503
+    retry = next(event for kind, event in recorder.events if kind == "retry")
+    assert retry["model"] == "gemini-2.5-flash-image" and retry["wait"] >= 1
+
+
+@pytest.mark.asyncio
+async def test_failing_hook_does_not_break_generation(fake_api):
+    class Broken:
+        def on_response(self, event):
+            raise RuntimeError("metrics backend down")
+
+    _, base_url = fake_api()
+    async with GeminiClient(api_key="fake", base_url=base_url, hooks=[Broken()]) as client:
+        result = await client.generate_image("a red ball")
+
+    assert result["image_data"].startswith(b"\x89PNG")
+
+
+@pytest.mark.asyncio
+async def test_cassette_records_then_replays_offline(fake_api, tmp_path):
+    import time
+    import zipfile
+
+    from cassette import Cassette, CassetteMiss
+
+    fake, base_url = fake_api(latency="fixed:0.2")
+    path = str(tmp_path / "bench.cassette")
+
+    async with GeminiClient(api_key="secret-key", base_url=base_url,
+                            cassette=Cassette(path, mode="record")) as client:
+        recorded = [await client.generate_image(f"item {i % 2}") for i in range(3)]
+        streamed = [e async for e in client.stream_image("streamed", image_size="2K")]
+    assert fake.stats["requests"] == 4
+
+    archive = zipfile.ZipFile(path)
+    assert len([n for n in archive.namelist() if n.startswith("interactions/")]) == 4
+    assert not any(b"secret-key" in archive.read(n) for n in archive.namelist())
+
+    replay = Cassette(path, mode="replay", latency_scale=1.0)
+    async with GeminiClient(api_key="other-key", base_url=base_url, cassette=replay) as client:
+        start = time.perf_counter()
+        replayed = await client.generate_image("item 0")
+        assert time.perf_counter() - start >= 0.15
+        fast = Cassette(path, latency_scale=0)
+    async with GeminiClient(api_key="other-key", base_url=base_url, cassette=fast) as client:
+        again = [await client.generate_image(f"item {i % 2}") for i in range(3)]
+        restreamed = [e async for e in client.stream_image("streamed", image_size="2K")]
+        with pytest.raises(CassetteMiss):
+            await client.generate_image("never recorded")
+
+    assert fake.stats["requests"] == 4  # replay never reached the server
+    assert replayed["image_data"] == recorded[0]["image_data"]
+    assert [r["image_data"] for r in again] == [r["image_data"] for r in recorded]
+    assert restreamed == streamed
+    assert fast.stats()["misses"] == 1
+
+
+@pytest.mark.asyncio
+async def test_predict_images_against_fake_imagen(fake_api):
+    fake, base_url = fake_api()
+
+    async with GeminiClient(api_key="fake", base_url=base_url) as client:
+        results = await client.predict_images("a red ball", model="imagen", n=2, image_size="2K")
+        with pytest.raises(ValueError, match="image_size"):
+            await client.predict_images("a red ball", model="imagen-fast", image_size="2K")
+
+    assert len(results) == 2
+    assert all(r["image_data"].startswith(b"\x89PNG") for r in results)
+    assert abs(len(results[0]["image_data"]) - SMALL_IMAGES["2K"]) < 64
+    assert fake.stats["images"] == 2
+
+
+@pytest.mark.asyncio
+async def test_router_prefers_faster_backend_and_falls_back(fake_api):
+    _, base_url = fake_api(latency_overrides={
+        "imagen-4.0-fast-generate-001": "fixed:0.2",
+        "gemini-2.5-flash-image": "fixed:0"
+    })
+    router = LatencyRouter(BackendRegistry.default())
+
+    async with GeminiClient(api_key="fake", base_url=base_url) as client:
+        for _ in range(3):
+            result = await router.generate(client, "fast", "a red ball")
+        assert result["backend"] == "flash"
+
+        # Reference images rule Imagen out entirely
+        assert [b.name for b in router.rank("quality", reference_images=[b"x"])] == ["pro"]
+
+    _, dead_url = fake_api(error_rate_503=1.0)
+    async with GeminiClient(api_key="fake", base_url=dead_url) as client:
+        with pytest.raises(httpx.HTTPStatusError):
+            await router.generate(client, "fast", "a red ball", max_retries=1)
+    assert all(route["failures"] == 1 for route in router.stats())
+
+
+def test_backend_without_generate_fails_when_created():
+    from image_backends import ImageBackend
+
+    class Incomplete(ImageBackend):
+        name = "incomplete"
+
+    with pytest.raises(TypeError, match="generate"):
+        Incomplete()
+
+
+@pytest.mark.asyncio
+async def test_model_catalog_discovers_caches_and_rejects_locally(fake_api, tmp_path):
+    fake, base_url = fake_api(hidden_models=["gemini-3-pro-image-preview"])
+    path = str(tmp_path / "models.json")
+    catalog = ModelCatalog(path, ttl_seconds=3600)
+
+    async with GeminiClient(api_key="fake", base_url=base_url, catalog=catalog) as client:
+        assert await catalog.refresh(client)
+        listed = await client.list_models(page_size=2)  # follows nextPageToken
+        assert len(listed) == len(catalog.models) == 4
+
+        requests_before = fake.stats["requests"]
+        with pytest.raises(ValueError, match="not available"):
+            await client.generate_image("a red ball", model="pro")
+        assert fake.stats["requests"] == requests_before
+        await client.generate_image("a red ball", model="flash")
+        # models.list never reports streamGenerateContent; generateContent covers it
+        assert "streamGenerateContent" not in catalog.get("gemini-2.5-flash-image")["methods"]
+        streamed = [e async for e in client.stream_image("a red ball", model="flash")]
+        assert streamed[-1]["type"] == "image_end"
+
+    assert catalog.rejections == 1
+    assert catalog.get("imagen-4.0-fast-generate-001")["image_sizes"] == ["1K"]
+
+    # A second worker reuses the fresh copy on disk without listing again
+    reloaded = ModelCatalog(path, ttl_seconds=3600)
+    async with GeminiClient(api_key="fake", base_url=base_url) as client:
+        assert not await reloaded.refresh(client)
+    assert fake.stats["list_models"] == 3
+    assert ModelCatalog(path, ttl_seconds=0).fresh() is False
+
+    # A long-running process: one caller refreshes a stale catalog, then
+    # nobody is asked again until retry_seconds have passed
+    stale = ModelCatalog(path, ttl_seconds=0, retry_seconds=3600)
+    assert stale.claim_refresh() and not stale.claim_refresh()
+    async with GeminiClient(api_key="fake", base_url=base_url) as client:
+        assert await stale.refresh(client)
+    assert not stale.claim_refresh()
+    assert [p.name for p in tmp_path.iterdir()] == ["models.json"]  # no temp files left
+
+
+def test_adaptive_timeouts_clamp_percentile_between_median_multiples():
+    timeouts = AdaptiveTimeouts(floor_multiplier=2.0, ceiling_multiplier=5.0,
+                                min_seconds=0.0, min_samples=5)
+    flash = ("gemini-2.5-flash-image", "1K", "1:1")
+    pro = ("gemini-3-pro-image-preview", "4K", "16:9")
+
+    assert timeouts.timeout_for(flash) is None  # cold: client default
+    for seconds in [4, 5, 5, 5, 6]:
+        timeouts.observe(flash, seconds)
+    for seconds in [30, 40, 40, 45, 400]:
+        timeouts.observe(pro, seconds)
+
+    assert timeouts.timeout_for(flash) == 10.0   # p99 6s, floored at 2 x median
+    assert timeouts.timeout_for(pro) == 200.0    # p99 400s, capped at 5 x median
+    # Other aspect ratios borrow the (model, size) pool until they have samples
+    assert timeouts.timeout_for(("gemini-2.5-flash-image", "1K", "16:9")) == 10.0
+
+
+def test_adaptive_timeouts_recover_when_latency_shifts_upward():
+    timeouts = AdaptiveTimeouts(min_seconds=0.0, min_samples=5)
+    key = ("gemini-3-pro-image-preview", "4K", "1:1")
+    for _ in range(100):
+        timeouts.observe(key, 1.0)
+    assert timeouts.timeout_for(key) == 2.0
+
+    def call(latency):
+        limit = timeouts.timeout_for(key)
+        if latency > limit:
+            timeouts.observe(key, limit, timed_out=True)
+            return False
+        timeouts.observe(key, latency)
+        return True
+
+    # Latency jumps to 6s, beyond 5 x the warm median: a couple of calls
+    # time out, then the backoff holds until the window catches up
+    results = [call(6.0) for _ in range(20)]
+    assert results.count(False) <= 3 and all(results[-15:])
+
+    # Fast again: the boost steps back down
+    for _ in range(10):
+        assert call(1.0)
+    assert timeouts.stats()[0]["backoff"] == 1.0
+
+
+def test_adaptive_timeouts_warm_a_cold_class_that_outlasts_the_default():
+    timeouts = AdaptiveTimeouts(min_seconds=0.0, min_samples=10)
+    key = ("gemini-3-pro-image-preview", "4K", "16:9")
+    client_default = 30.0
+
+    def call(latency):
+        limit = timeouts.timeout_for(key) or client_default
+        if latency > limit:
+            timeouts.observe(key, limit, timed_out=True)
+            return False
+        timeouts.observe(key, latency)
+        return True
+
+    # Always ~70s: timed out at 30s and 60s, then it fits - long before
+    # min_samples successes have been collected
+    results = [call(70.0) for _ in range(20)]
+    assert results[:3] == [False, False, True] and all(results[2:])
+    assert timeouts.timeout_for(key) >= 70.0
+    assert timeouts.stats()[0]["timeouts"] == 2
+
+
+@pytest.mark.asyncio
+async def test_adaptive_timeout_abandons_stuck_calls_quickly(fake_api):
+    _, fast_url = fake_api(latency="fixed:0.05")
+    _, stuck_url = fake_api(latency="fixed:2")
+    timeouts = AdaptiveTimeouts(min_seconds=0.3, min_samples=3)
+
+    async with GeminiClient(api_key="fake", base_url=fast_url, timeouts=timeouts) as client:
+        for _ in range(3):
+            await client.generate_image("a red ball", image_size="1K")
+    key = ("gemini-2.5-flash-image", "1K", None)
+    assert timeouts.timeout_for(key) == 0.3
+
+    async with GeminiClient(api_key="fake", base_url=stuck_url, timeouts=timeouts) as client:
+        start = time.perf_counter()
+        with pytest.raises(httpx.ReadTimeout):
+            await client.generate_image("a red ball", image_size="1K", max_retries=1)
+        assert time.perf_counter() - start < 1.5
+
+    # The timeout counts as a sample (at backoff x the limit it hit)
+    assert timeouts.stats()[0]["timeouts"] == 1
+    assert timeouts.stats()[0]["samples"] == 4
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+import os
+import struct
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "src"))
+from fake_gemini_server import build_png  # noqa: E402
+from image_probe import probe_image  # noqa: E402
+
+
+def test_probe_png_reads_ihdr_only():
+    png = build_png(1376, 768, 50_000)
+    assert probe_image(png) == {
+        "format": "png", "width": 1376, "height": 768, "bit_depth": 8, "color_type": "rgb"
+    }
+    # Only the first 26 bytes are needed
+    assert probe_image(png[:26])["width"] == 1376
+
+
+def test_probe_jpeg_skips_app_segments():
+    exif = b"\xff\xe1" + struct.pack(">H", 2 + 5000) + b"\x00" * 5000
+    sof = b"\xff\xc2" + struct.pack(">HBHHB", 17, 8, 600, 800, 3) + b"\x00" * 9
+    jpeg = b"\xff\xd8" + exif + sof + b"\xff\xda\x00\x08" + b"\x00" * 100
+
+    assert probe_image(jpeg) == {
+        "format": "jpeg", "width": 800, "height": 600, "bit_depth": 8, "color_type": "rgb"
+    }
+
+
+def test_probe_webp_variants():
+    lossy = b"RIFF\x00\x00\x00\x00WEBPVP8 " + b"\x00" * 4 + b"\x00\x00\x00\x9d\x01\x2a" + struct.pack("<HH", 640, 480)
+    lossless_bits = (320 - 1) | ((200 - 1) << 14) | (1 << 28)
+    lossless = b"RIFF\x00\x00\x00\x00WEBPVP8L" + b"\x00" * 4 + b"\x2f" + struct.pack("<I", lossless_bits)
+    extended = (b"RIFF\x00\x00\x00\x00WEBPVP8X" + b"\x00" * 4 + b"\x10\x00\x00\x00"
+                + (1023).to_bytes(3, "little") + (767).to_bytes(3, "little"))
+
+    assert probe_image(lossy) == {
+        "format": "webp", "width": 640, "height": 480, "bit_depth": 8, "color_type": "rgb"
+    }
+    assert probe_image(lossless) == {
+        "format": "webp", "width": 320, "height": 200, "bit_depth": 8, "color_type": "rgba"
+    }
+    assert (probe_image(extended)["width"], probe_image(extended)["height"]) == (1024, 768)
+
+
+def test_probe_unknown_or_truncated_returns_none():
+    assert probe_image(b"fake-image-bytes") is None
+    assert probe_image(b"\x89PNG\r\n\x1a\n\x00\x00") is None
+    assert probe_image(b"\xff\xd8\xff\xe0\x00") is None